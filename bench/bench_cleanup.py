@@ -0,0 +1,97 @@
+"""Benchmark ``strip_page_markers`` against the legacy backreferencing regexes.
+
+The adversarial inputs make the old ``<(tag) class=oldaltores>.*?</\\1>`` pattern
+rescan the rest of the document once per marker, so its cost grows
+quadratically while ``strip_page_markers`` stays linear.
+
+Run from the project root::
+
+    python -m bench.bench_cleanup --max-markers 16000
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import Callable
+
+from bench.bench_extract import book_html
+from src.dget import strip_page_markers
+
+
+def legacy_strip_page_markers(html: str) -> str:
+    """The regex pair ``dget`` used before ``strip_page_markers``."""
+    cleaned_html = re.sub(
+        r"<([a-z0-9]+)\b[^>]*\bclass\s*=\s*['\"][^'\"]*\boldaltores\b[^'\"]*['\"][^>]*>.*?</\1>",
+        "",
+        html,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+    return re.sub(
+        r"<a\b[^>]*\bname\s*=\s*['\"]DIAPage[^'\"]*['\"][^>]*>\s*</a>",
+        "",
+        cleaned_html,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+
+
+def unclosed_markers(count: int) -> str:
+    """Page-number spans that are never closed: every marker rescans to the end."""
+    return "<p>" + "".join(f'<span class="oldaltores">{n} szöveg ' for n in range(count)) + "</p>"
+
+
+def mismatched_markers(count: int) -> str:
+    """Block markers whose closing tag never comes, wrapped around inline chapter markup."""
+    return "<section>" + "".join(
+        f'<div class="oldaltores">{n}<span>szöveg</span><i>{n}</i></p>' for n in range(count)
+    ) + "</section>"
+
+
+ADVERSARIAL_INPUTS: dict[str, Callable[[int], str]] = {
+    "unclosed span markers": unclosed_markers,
+    "mismatched block markers": mismatched_markers,
+}
+
+
+def timed(function: Callable[[str], str], html: str) -> float:
+    started = time.perf_counter()
+    function(html)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-markers", type=int, default=16000, help="Largest adversarial input")
+    parser.add_argument("--legacy-budget", type=float, default=5.0, help="Stop timing the legacy regex after this many seconds")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Size of the regular book-shaped input")
+    args = parser.parse_args()
+
+    html = book_html(int(args.size_mb * 1024 * 1024))
+    legacy_seconds = timed(legacy_strip_page_markers, html)
+    new_seconds = timed(strip_page_markers, html)
+    same = legacy_strip_page_markers(html) == strip_page_markers(html)
+    print(
+        f"book {len(html) / 1024 / 1024:.1f} MiB: legacy {legacy_seconds * 1000:.1f} ms, "
+        f"strip_page_markers {new_seconds * 1000:.1f} ms, outputs {'match' if same else 'DIFFER'}"
+    )
+
+    for name, build in ADVERSARIAL_INPUTS.items():
+        print(f"\n{name}:")
+        legacy_enabled = True
+        count = 1000
+        while count <= args.max_markers:
+            source = build(count)
+            new_seconds = timed(strip_page_markers, source)
+            if legacy_enabled:
+                legacy_seconds = timed(legacy_strip_page_markers, source)
+                legacy_enabled = legacy_seconds < args.legacy_budget
+                legacy_report = f"{legacy_seconds * 1000:10.1f} ms"
+            else:
+                legacy_report = "   skipped"
+            print(f"  {count:>7} markers: legacy {legacy_report}   strip_page_markers {new_seconds * 1000:8.1f} ms")
+            count *= 2
+
+
+if __name__ == "__main__":
+    main()
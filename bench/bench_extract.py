@@ -0,0 +1,105 @@
+"""Micro-benchmark: single-pass ``extract_text`` against the legacy regex chain.
+
+Run from the project root::
+
+    python -m bench.bench_extract --size-mb 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+import tracemalloc
+from typing import Callable
+
+from src.dget import extract_text
+
+
+WORDS = (
+    "Minthogy a fagyba dermedt dél-alföldi településeket Tiszától majdnem Kárpátok lábáig "
+    "összekötő személyvonat sínek mentén tanácstalanul őgyelgő vasutas zavaros magyarázatai"
+).split()
+
+
+def legacy_extract_text(html: str) -> str:
+    """The regex chain ``dget`` used before ``extract_text``."""
+    body_match = re.search(r"<body[^>]*>(.*)</body>", html, flags=re.IGNORECASE | re.DOTALL)
+    source = body_match.group(1) if body_match else html
+    source = re.sub(r"<script\b[^>]*>.*?</script>", "", source, flags=re.IGNORECASE | re.DOTALL)
+    source = re.sub(r"<style\b[^>]*>.*?</style>", "", source, flags=re.IGNORECASE | re.DOTALL)
+    source = re.sub(r"<br\s*/?>", "\n", source, flags=re.IGNORECASE)
+    source = re.sub(r"</(p|div|h1|h2|h3|h4|h5|h6|li|tr|section|article|header|footer)>", "\n", source, flags=re.IGNORECASE)
+    source = re.sub(r"<[^>]+>", "", source)
+    source = re.sub(r"&nbsp;", " ", source, flags=re.IGNORECASE)
+    source = re.sub(r"\s+\n", "\n", source)
+    source = re.sub(r"\n\s+", "\n", source)
+    source = re.sub(r"(?m)^\s*\d{1,4}\s*$\n?", "", source)
+    source = re.sub(r"\n{3,}", "\n\n", source)
+    source = re.sub(r"[ \t]{2,}", " ", source)
+    return source.strip()
+
+
+def book_html(size_bytes: int, seed: int = 1083) -> str:
+    """Build a single reader-like HTML document of roughly ``size_bytes``."""
+    rng = random.Random(seed)
+    chunks = [
+        "<html><head><title>Az ellenállás melankóliája</title>",
+        "<style>.oldaltores { display: none; }</style></head><body>\n",
+    ]
+    size = sum(len(chunk) for chunk in chunks)
+    page = 1
+    chapter = 1
+    while size < size_bytes:
+        if rng.random() < 0.02:
+            chunk = f"<section><h2>Fejezet {chapter}</h2>\n<script>window.chapter = {chapter};</script>\n"
+            chapter += 1
+        elif rng.random() < 0.1:
+            chunk = (
+                f'<span class="oldaltores">{page}</span><a name="DIAPage{page}"></a>\n'
+                f"<div class=\"page\">\n  {page}\n</div>\n"
+            )
+            page += 1
+        else:
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+            chunk = f"<p class=\"p\">  {words},&nbsp;<i>{rng.choice(WORDS)}</i>  <br/>{words}.</p>\n"
+        chunks.append(chunk)
+        size += len(chunk)
+    chunks.append("</body></html>")
+    return "".join(chunks)
+
+
+def measure(function: Callable[[str], str], html: str, repeat: int) -> tuple[float, int, str]:
+    best = float("inf")
+    result = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(html)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    function(html)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Approximate input size")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per extractor")
+    args = parser.parse_args()
+
+    html = book_html(int(args.size_mb * 1024 * 1024))
+    print(f"input: {len(html) / 1024 / 1024:.1f} MiB")
+    rows = []
+    for name, function in (("legacy regex chain", legacy_extract_text), ("extract_text", extract_text)):
+        seconds, peak, text = measure(function, html, args.repeat)
+        rows.append((name, seconds, peak, text))
+        print(f"{name:>20}: {seconds * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.1f} MiB  {len(text)} chars")
+    legacy_text, new_text = rows[0][3], rows[1][3]
+    print("outputs match" if legacy_text == new_text else "OUTPUTS DIFFER")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark building and querying the ``dget index`` full-text index.
+
+Generates synthetic books, indexes them from scratch, re-indexes them unchanged
+(every book should be skipped), re-indexes them with one chapter changed in
+some books, then times a mix of queries. Run from the project root::
+
+    python -m bench.bench_index --books 200 --chapters 20 --chapter-kb 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bench.bench_extract import WORDS, book_html
+from src.dget import BookIndex, extract_text
+
+
+QUERIES = (
+    "vasutas",
+    "fagyba dermedt",
+    '"dél-alföldi településeket"',
+    "telep*",
+    "tanacstalanul NEAR(vasutas, 5)",
+    "jelzes{book}",
+)
+
+
+def make_books(count: int, chapters: int, chapter_bytes: int) -> list[list[str]]:
+    """Chapter texts per book; each book also carries one unique marker word."""
+    books = []
+    for book in range(count):
+        texts = [extract_text(book_html(chapter_bytes, seed=book * 1000 + chapter)) for chapter in range(chapters)]
+        texts[-1] += f"\njelzes{book}"
+        books.append(texts)
+    return books
+
+
+def index_all(index: BookIndex, books: list[list[str]]) -> tuple[float, dict[str, int]]:
+    counts: dict[str, int] = {}
+    started = time.perf_counter()
+    for number, chapters in enumerate(books):
+        status = index.add(f"https://reader.example/document/Konyv_{number}-{number}", chapters, context="bench")
+        counts[status] = counts.get(status, 0) + 1
+    return time.perf_counter() - started, counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--chapter-kb", type=int, default=32)
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of books with one changed chapter")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per query shape")
+    args = parser.parse_args()
+
+    books = make_books(args.books, args.chapters, args.chapter_kb * 1024)
+    text_mib = sum(len(chapter) for chapters in books for chapter in chapters) / 2**20
+    rng = random.Random(1083)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "index.sqlite"
+        with BookIndex(db_path) as index:
+            seconds, counts = index_all(index, books)
+            rate = f"{args.books / seconds:8.1f} books/s  {text_mib / seconds:6.1f} MiB/s"
+            print(f"build:     {seconds:7.2f} s  {rate}  {counts}")
+            seconds, counts = index_all(index, books)
+            print(f"unchanged: {seconds:7.2f} s  {args.books / seconds:8.1f} books/s  {counts}")
+            for chapters in rng.sample(books, max(1, int(args.books * args.changed))):
+                chapters[rng.randrange(len(chapters))] += f"\n{' '.join(rng.choices(WORDS, k=50))}"
+            seconds, counts = index_all(index, books)
+            print(f"changed:   {seconds:7.2f} s  {args.books / seconds:8.1f} books/s  {counts}")
+            print(f"index size: {db_path.stat().st_size / 2**20:.1f} MiB for {text_mib:.1f} MiB of text")
+
+            for query in QUERIES:
+                durations = []
+                hits = 0
+                for _ in range(args.queries):
+                    text = query.format(book=rng.randrange(args.books))
+                    started = time.perf_counter()
+                    hits = len(index.search(text, limit=10))
+                    durations.append(time.perf_counter() - started)
+                durations.sort()
+                print(
+                    f"query {query!r:<36} median {statistics.median(durations) * 1000:7.2f} ms  "
+                    f"p95 {durations[int(len(durations) * 0.95) - 1] * 1000:7.2f} ms  {hits} hit(s)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare page load time and Chrome memory with and without the ``--lean`` profile.
+
+Needs Chrome and network access to the target URL. Run from the project root::
+
+    python -m bench.bench_lean "https://reader.dia.hu/document/..." --runs 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from src.dget import HtmlFetcher, chrome_rss
+
+
+def measure(url: str, lean: bool, timeout: int, min_text_chars: int) -> tuple[float, float, dict[str, int], int]:
+    fetcher = HtmlFetcher(timeout_seconds=timeout, min_text_chars=min_text_chars, lean=lean)
+    started = time.perf_counter()
+    driver = fetcher._start_driver()
+    try:
+        loaded = time.perf_counter()
+        snapshot = fetcher._fetch_with_driver(driver, url)
+        fetched = time.perf_counter()
+        memory = chrome_rss(driver)
+    finally:
+        driver.quit()
+    return loaded - started, fetched - loaded, memory, snapshot.text_length
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url", help="Reader URL to fetch")
+    parser.add_argument("--runs", type=int, default=3, help="Fetches per profile")
+    parser.add_argument("--timeout", type=int, default=45)
+    parser.add_argument("--min-text-chars", type=int, default=300)
+    args = parser.parse_args()
+
+    for lean in (False, True):
+        startups, fetches, renderer, total, chars = [], [], [], [], 0
+        for _ in range(args.runs):
+            startup, fetch, memory, chars = measure(args.url, lean, args.timeout, args.min_text_chars)
+            startups.append(startup)
+            fetches.append(fetch)
+            renderer.append(memory.get("renderer", 0))
+            total.append(memory.get("total", 0))
+        print(
+            f"{'lean' if lean else 'default':>8}: startup {statistics.median(startups):6.2f} s  "
+            f"fetch {statistics.median(fetches):6.2f} s  "
+            f"renderer RSS {statistics.median(renderer) / 2**20:7.1f} MiB  "
+            f"Chrome RSS {statistics.median(total) / 2**20:7.1f} MiB  text {chars} chars"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare chapter post-processing in-process and in the ``--cpu-workers`` process pool.
+
+Cleans and extracts the text of synthetic chapter components with a warm pool
+and with a new pool per book (what a single ``dget <url>`` pays), then fetches
+a batch of books from the local fake reader so that component downloads for
+one book overlap the post-processing of another. Run from the project root::
+
+    python -m bench.bench_postprocess --chapters 80 --chapter-kb 96 --books 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+
+from bench.bench_extract import book_html
+from bench.fake_reader import BookShape, FakeReader
+from src.dget import BookJob, BookScheduler, ComponentPart, ComponentPostProcessor, HtmlFetcher
+
+
+def bench_process(parts: list[ComponentPart], workers: int, runs: int) -> tuple[float, list[tuple[str, str]]]:
+    processor = ComponentPostProcessor(workers, min_parallel_bytes=0)
+    try:
+        results = processor.process(parts)  # warm-up, also starts the pool
+        started = time.perf_counter()
+        for _ in range(runs):
+            results = processor.process(parts)
+        return (time.perf_counter() - started) / runs, results
+    finally:
+        processor.close()
+
+
+def bench_cold(parts: list[ComponentPart], workers: int, runs: int) -> float:
+    """Median seconds to process one book with a new processor, including worker start-up."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        processor = ComponentPostProcessor(workers, min_parallel_bytes=0)
+        try:
+            processor.process(parts)
+        finally:
+            processor.close()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def bench_batch(reader: FakeReader, books: int, workers: int, cpu_workers: int) -> float:
+    fetcher = HtmlFetcher(engine="http", component_concurrency=8, cpu_workers=cpu_workers)
+    jobs = [BookJob(index=index, url=reader.document_url(f"Konyv_{index}-{index}")) for index in range(books)]
+    started = time.perf_counter()
+    try:
+        for result in BookScheduler(fetcher, workers=workers).results(jobs):
+            if result.snapshot is None:
+                raise RuntimeError(f"{result.url}: {result.error}")
+    finally:
+        fetcher.close()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=80)
+    parser.add_argument("--chapter-kb", type=int, default=96)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--books", type=int, default=4, help="Books in the batch benchmark")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Added latency per HTTP response")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    parts = [
+        ComponentPart(index=index, path=f"chapter-{index}.html", html=book_html(args.chapter_kb * 1024, seed=index))
+        for index in range(args.chapters)
+    ]
+    size_mib = sum(len(part.html) for part in parts) / 2**20
+    inline_seconds, inline_results = bench_process(parts, 1, args.runs)
+    pool_seconds, pool_results = bench_process(parts, args.workers, args.runs)
+    if pool_results != inline_results:
+        raise RuntimeError("Process pool results differ from in-process results")
+    print(f"post-process {size_mib:.1f} MiB in {args.chapters} component(s)")
+    print(f"  in-process:           {inline_seconds * 1000:8.1f} ms  {size_mib / inline_seconds:7.1f} MiB/s")
+    print(
+        f"  {args.workers} worker process(es): {pool_seconds * 1000:8.1f} ms  {size_mib / pool_seconds:7.1f} MiB/s  "
+        f"({inline_seconds / pool_seconds:.2f}x)"
+    )
+    cold_inline = bench_cold(parts, 1, args.runs)
+    cold_pool = bench_cold(parts, args.workers, args.runs)
+    print("cold start, one book with a new processor")
+    print(f"  in-process:           {cold_inline * 1000:8.1f} ms")
+    print(f"  {args.workers} worker process(es): {cold_pool * 1000:8.1f} ms  ({cold_inline / cold_pool:.2f}x)")
+
+    shape = BookShape(args.chapters, args.chapter_kb * 1024, args.latency_ms)
+    with FakeReader(shape) as reader:
+        batch_workers = min(args.books, 4)
+        inline_batch = bench_batch(reader, args.books, batch_workers, cpu_workers=1)
+        pool_batch = bench_batch(reader, args.books, batch_workers, cpu_workers=args.workers)
+    print(f"batch of {args.books} book(s), {batch_workers} fetch worker(s)")
+    print(f"  in-process:           {inline_batch:8.2f} s  {args.books / inline_batch * 60:7.1f} books/min")
+    print(f"  {args.workers} worker process(es): {pool_batch:8.2f} s  {args.books / pool_batch * 60:7.1f} books/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Measure CLI startup: module import time, ``dget --help`` and time to the first ``driver.get``.
+
+Each measurement runs in a fresh interpreter, so nothing is warm. The first
+``driver.get`` is timed with the Chrome path cache cold, warm and disabled
+(needs Chrome; pass ``--selenium``). Run from the project root::
+
+    python -m bench.bench_startup --runs 5
+    python -m bench.bench_startup --selenium
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.fake_reader import BookShape, FakeReader
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FIRST_GET = """
+import json, sys, time
+started = time.perf_counter()
+from pathlib import Path
+from src.dget import ChromeResolver, HtmlFetcher
+cache = sys.argv[2]
+fetcher = HtmlFetcher(driver_cache=ChromeResolver(Path(cache)) if cache else None)
+driver = fetcher._start_driver()
+try:
+    driver.get(sys.argv[1])
+    print(json.dumps({"seconds": time.perf_counter() - started}))
+finally:
+    driver.quit()
+"""
+
+
+def run_python(arguments: list[str]) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *arguments], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def wall_time(arguments: list[str], runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_python(arguments)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def import_seconds(runs: int) -> float:
+    """Median cumulative ``-X importtime`` of ``src.dget``, excluding interpreter startup."""
+    samples = []
+    for _ in range(runs):
+        stderr = run_python(["-X", "importtime", "-c", "import src.dget"]).stderr
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| src\.dget$", stderr, re.MULTILINE)
+        if match:
+            samples.append(int(match.group(1)) / 1e6)
+    return statistics.median(samples) if samples else float("nan")
+
+
+def startup_results(runs: int) -> dict[str, dict[str, float]]:
+    """Startup timings in the ``bench_suite`` result format."""
+    heavy = run_python(
+        ["-c", "import sys, src.dget; print(sorted(m for m in ('selenium', 'asyncio') if m in sys.modules))"]
+    ).stdout.strip()
+    if heavy != "[]":
+        print(f"warning: importing src.dget also imported {heavy}")
+    interpreter = wall_time(["-c", "pass"], runs)
+    return {
+        "import_dget": {"seconds": import_seconds(runs)},
+        "cli_help": {"seconds": wall_time(["-m", "src.dget", "--help"], runs) - interpreter},
+    }
+
+
+def first_get(url: str, cache_file: str, cold: bool = False) -> float:
+    """Seconds from interpreter start to the first ``driver.get``; ``cache_file`` empty disables the cache."""
+    if cold:
+        Path(cache_file).unlink(missing_ok=True)
+    output = run_python(["-c", FIRST_GET, url, cache_file]).stdout
+    return float(json.loads(output.strip().splitlines()[-1])["seconds"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (median is reported)")
+    parser.add_argument("--selenium", action="store_true", help="Also time the first driver.get (needs Chrome)")
+    args = parser.parse_args()
+
+    for name, metrics in startup_results(args.runs).items():
+        print(f"{name:>24}: {metrics['seconds'] * 1000:8.1f} ms")
+
+    if not args.selenium:
+        return
+    with FakeReader(BookShape(chapters=1)) as reader, tempfile.TemporaryDirectory() as directory:
+        cache_file = str(Path(directory) / "chrome-paths.json")
+        variants = {
+            "first_get_no_cache": ("", False),
+            "first_get_cold_cache": (cache_file, True),
+            "first_get_warm_cache": (cache_file, False),
+        }
+        for name, (cache, cold) in variants.items():
+            seconds = statistics.median(first_get(reader.document_url(), cache, cold) for _ in range(args.runs))
+            print(f"{name:>24}: {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
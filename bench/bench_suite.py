@@ -0,0 +1,171 @@
+"""Reproducible benchmark suite against the local fake DIA reader.
+
+Times end-to-end ``fetch`` over the HTTP engine (and over Chrome with
+``--selenium``, including each readiness wait), then ``extract_text`` and
+``strip_page_markers`` on their own. Reports throughput and memory and compares
+them with a saved baseline. Run from the project root::
+
+    python -m bench.bench_suite --save-baseline
+    python -m bench.bench_suite --selenium --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from bench.bench_extract import book_html
+from bench.bench_startup import startup_results
+from bench.fake_reader import BookShape, FakeReader
+from src.dget import FetchMetrics, HtmlFetcher, extract_text, strip_page_markers
+
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Lower is better for every metric compared against the baseline.
+COMPARED_METRICS = ("seconds", "peak_mib")
+
+
+def timed_peak(function: Callable[[], object], runs: int) -> tuple[float, float]:
+    """Median wall time over ``runs`` calls, then the tracemalloc peak of one more call."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(durations), peak / 2**20
+
+
+def bench_fetch(reader: FakeReader, engine: str, runs: int, timeout: int) -> dict[str, float]:
+    phases: dict[str, list[float]] = {}
+    sizes: list[int] = []
+    fetcher = HtmlFetcher(timeout_seconds=timeout, engine=engine, component_concurrency=8)
+
+    def fetch_once() -> None:
+        metrics = FetchMetrics(reader.document_url())
+        snapshot = fetcher.fetch(reader.document_url(), metrics=metrics)
+        expected = "component-http" if engine == "http" else "component-api"
+        if snapshot.context != expected:
+            raise RuntimeError(f"{engine} fetch used '{snapshot.context}' instead of '{expected}'")
+        sizes.append(sum(len(chunk) for chunk in snapshot.html_chunks))
+        if tracemalloc.is_tracing():
+            return
+        for phase in metrics.phases:
+            phases.setdefault(str(phase["name"]), []).append(float(phase["duration_ms"]))
+
+    try:
+        seconds, peak = timed_peak(fetch_once, runs)
+    finally:
+        fetcher.close()
+    result = {
+        "seconds": seconds,
+        "peak_mib": peak,
+        "mb_per_s": sizes[-1] / 2**20 / seconds,
+        "books_per_min": 60 / seconds,
+    }
+    for name, durations in phases.items():
+        result[f"{name}_ms"] = statistics.median(durations)
+    return result
+
+
+def bench_function(function: Callable[[str], str], html: str, runs: int) -> dict[str, float]:
+    seconds, peak = timed_peak(lambda: function(html), runs)
+    return {"seconds": seconds, "peak_mib": peak, "mb_per_s": len(html) / 2**20 / seconds}
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    regressions = []
+    print(f"\n{'benchmark':<24}{'metric':<10}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, metrics in results.items():
+        for metric in COMPARED_METRICS:
+            before = baseline.get(name, {}).get(metric)
+            after = metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<24}{metric:<10}{before:>12.4f}{after:>12.4f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=40, help="Chapter components per book")
+    parser.add_argument("--chapter-kb", type=int, default=64, help="Approximate size of each component")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Added latency per HTTP response")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per benchmark (median is reported)")
+    parser.add_argument("--selenium", action="store_true", help="Also fetch through Chrome (needs Chrome)")
+    parser.add_argument("--no-startup", action="store_true", help="Skip the CLI startup benchmarks")
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before flagging")
+    parser.add_argument("--output", type=Path, default=None, help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    shape = BookShape(args.chapters, args.chapter_kb * 1024, args.latency_ms)
+    results: dict[str, dict[str, float]] = {}
+    with FakeReader(shape) as reader:
+        results["fetch_http"] = bench_fetch(reader, "http", args.runs, args.timeout)
+        if args.selenium:
+            results["fetch_selenium"] = bench_fetch(reader, "selenium", args.runs, args.timeout)
+
+    html = book_html(args.chapters * args.chapter_kb * 1024)
+    results["extract_text"] = bench_function(extract_text, html, args.runs)
+    results["strip_page_markers"] = bench_function(strip_page_markers, html, args.runs)
+    if not args.no_startup:
+        results.update(startup_results(args.runs))
+
+    for name, metrics in results.items():
+        if "mb_per_s" not in metrics:
+            print(f"{name:>20}: {metrics['seconds'] * 1000:8.1f} ms")
+            continue
+        details = "  ".join(
+            f"{key} {value:.1f}" for key, value in metrics.items() if key not in {"seconds", "peak_mib", "mb_per_s"}
+        )
+        print(
+            f"{name:>20}: {metrics['seconds'] * 1000:8.1f} ms  {metrics['mb_per_s']:7.1f} MiB/s  "
+            f"peak {metrics['peak_mib']:6.1f} MiB  {details}"
+        )
+
+    document = {
+        "shape": {"chapters": args.chapters, "chapter_kb": args.chapter_kb, "latency_ms": args.latency_ms},
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+    regressions: list[str] = []
+    if args.baseline.exists():
+        saved = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if saved.get("shape") != document["shape"]:
+            print(f"\nBaseline {args.baseline} used a different book shape {saved.get('shape')}, not comparing")
+        else:
+            regressions = compare(results, saved.get("results", {}), args.tolerance)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2), encoding="utf-8")
+        print(f"\nSaved baseline to {args.baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Local stand-in for the DIA reader, so benchmarks never touch reader.dia.hu.
+
+Serves ``/document/<slug>`` pages with a ``window.EpubReader`` stub, a
+``#reader iframe.monelem_component`` and a ``#toc-view li[data-chapter]`` TOC,
+plus ``/rest/<slug>/<chapter>.html`` components full of ``.oldaltores`` and
+``DIAPage`` artifacts. Book size and response latency are configurable. For
+tests, ``/book/<slug>`` redirects to the document, the document sets
+path-scoped cookies, and chosen chapters can fail with HTTP 500.
+Run from the project root::
+
+    python -m bench.fake_reader --chapters 40 --chapter-kb 64 --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from bench.bench_extract import book_html
+
+
+LAST_MODIFIED = "Mon, 05 Jan 2026 10:00:00 GMT"
+
+
+@dataclass(frozen=True)
+class BookShape:
+    chapters: int = 40
+    chapter_bytes: int = 64 * 1024
+    latency_ms: float = 0.0
+    runtime_delay_ms: int = 200
+    failing_chapters: tuple[int, ...] = ()
+
+
+def document_page(slug: str, shape: BookShape) -> str:
+    items = [f'<li data-chapter="rest/{slug}/szerzoseg.html"><span>Szerzőség</span></li>']
+    items.extend(
+        f'<li data-chapter="rest/{slug}/chapter-{index:05d}.html"><span>Fejezet {index}</span></li>'
+        for index in range(1, shape.chapters + 1)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{slug}</title></head>
+<body>
+<nav id="toc-nav">Tartalom</nav>
+<div id="toc-view" style="display: none"><ul>
+{chr(10).join(items)}
+</ul></div>
+<div id="reader"></div>
+<script>
+setTimeout(() => {{
+    window.EpubReader = {{ version: "fake" }};
+    const frame = document.createElement("iframe");
+    frame.className = "monelem_component";
+    frame.src = "/rest/{slug}/chapter-00001.html";
+    document.getElementById("reader").appendChild(frame);
+}}, {shape.runtime_delay_ms});
+document.querySelectorAll("#toc-view li[data-chapter]").forEach((item) => {{
+    item.addEventListener("click", () => {{
+        const frame = document.querySelector("#reader iframe.monelem_component");
+        if (frame) frame.src = "/" + item.getAttribute("data-chapter");
+    }});
+}});
+</script>
+</body></html>
+"""
+
+
+@lru_cache(maxsize=4096)
+def chapter_page(slug: str, name: str, chapter_bytes: int) -> bytes:
+    if name == "szerzoseg":
+        return "<html><body><p>© Digitális Irodalmi Akadémia</p></body></html>".encode("utf-8")
+    seed = int(hashlib.sha256(f"{slug}/{name}".encode("utf-8")).hexdigest()[:8], 16)
+    return book_html(chapter_bytes, seed=seed).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _ReaderServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        shape = self.server.shape
+        if shape.latency_ms:
+            time.sleep(shape.latency_ms / 1000)
+        path = self.path.split("?", 1)[0]
+        self.server.record_cookies(path, self.headers.get("Cookie"))
+        parts = path.strip("/").split("/")
+        if "rest" in parts:
+            # TOC paths are relative, so they resolve under /document/ as well as at the root.
+            parts = parts[parts.index("rest") :]
+        if len(parts) == 2 and parts[0] == "book":
+            self._send(b"", cacheable=False, status=302, headers={"Location": f"/document/{parts[1]}"})
+        elif len(parts) == 2 and parts[0] == "document":
+            cookies = (
+                f"reader_session={parts[1]}; Path=/",
+                "component_token=t1; Path=/document/rest",
+                "other_book=x; Path=/elsewhere",
+                "foreign=x; Domain=example.org; Path=/",
+            )
+            self._send(document_page(parts[1], shape).encode("utf-8"), cacheable=False, cookies=cookies)
+        elif len(parts) == 3 and parts[0] == "rest" and parts[2].endswith(".html"):
+            name = parts[2][: -len(".html")]
+            if name.startswith("chapter-") and int(name[len("chapter-") :]) in shape.failing_chapters:
+                self._send(b"server error", status=500, cacheable=False)
+                return
+            self._send(chapter_page(parts[1], name, shape.chapter_bytes), cacheable=True)
+        else:
+            self._send(b"not found", status=404, cacheable=False)
+
+    def _send(
+        self,
+        body: bytes,
+        cacheable: bool,
+        status: int = 200,
+        headers: Optional[dict[str, str]] = None,
+        cookies: tuple[str, ...] = (),
+    ) -> None:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if cacheable and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            self.server.count(0, 304)
+            return
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            encoding: Optional[str] = "gzip"
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if cacheable:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(len(body), status)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class _ReaderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], shape: BookShape) -> None:
+        super().__init__(address, _Handler)
+        self.shape = shape
+        self.requests = 0
+        self.bytes_sent = 0
+        self.statuses: dict[int, int] = {}
+        self.cookies: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, size: int, status: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def record_cookies(self, path: str, header: Optional[str]) -> None:
+        with self._lock:
+            self.cookies[path] = header
+
+
+class FakeReader:
+    """Run the fake reader on a background thread for the duration of a ``with`` block."""
+
+    def __init__(self, shape: BookShape = BookShape(), host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = _ReaderServer((host, port), shape)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-reader", daemon=True)
+
+    def __enter__(self) -> FakeReader:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._server.bytes_sent
+
+    @property
+    def statuses(self) -> dict[int, int]:
+        """How many responses were sent with each HTTP status."""
+        return dict(self._server.statuses)
+
+    @property
+    def cookies(self) -> dict[str, Optional[str]]:
+        """The ``Cookie`` header of the last request to each path (``None`` if it sent none)."""
+        return dict(self._server.cookies)
+
+    def document_url(self, slug: str = "Fake_Konyv-1083") -> str:
+        return f"{self.base_url}/document/{slug}"
+
+    def redirect_url(self, slug: str = "Fake_Konyv-1083") -> str:
+        """A URL that answers with a 302 to ``document_url(slug)``."""
+        return f"{self.base_url}/book/{slug}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--chapter-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--runtime-delay-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    shape = BookShape(args.chapters, args.chapter_kb * 1024, args.latency_ms, args.runtime_delay_ms)
+    with FakeReader(shape, port=args.port) as reader:
+        print(f"Serving {reader.document_url()} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
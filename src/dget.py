@@ -4,21 +4,112 @@
 from __future__ import annotations
 
 import argparse
+import base64
+import copy
+import gzip
+import hashlib
+import html as html_lib
+import http.client
+import io
+import itertools
+import json
 import logging
+import lzma
+import os
+import queue
+import random
 import re
-from dataclasses import dataclass
+import signal
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from bisect import insort
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import asdict, dataclass, replace
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+from urllib.parse import parse_qs, unquote, urldefrag, urljoin, urlparse, urlsplit
 
-from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    from compression import zstd
+except ImportError:  # pragma: no cover - Python < 3.14
+    zstd = None
+
+# selenium, asyncio, multiprocessing and sqlite3 are imported where they are used, so
+# --help, the HTTP engine and cache hits do not pay for them at startup.
+if TYPE_CHECKING:
+    import sqlite3
+    from concurrent.futures import ProcessPoolExecutor
+    from http.cookiejar import CookieJar
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
 
 
 LOG = logging.getLogger("dget")
 
+_T = TypeVar("_T")
+
+_METADATA_KEYWORDS = ("tartalomjegyzék", "szerző további művei")
+_PROSE_KEYWORDS = ("bevezetés", "rendkívüli állapotok")
+
+# First-party stylesheets and scripts are never blocked: EpubReader lives in the
+# reader's own JavaScript and monelem pagination measures the styled layout.
+_LEAN_CHROME_ARGUMENTS = (
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-gpu-compositing",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions",
+    "--mute-audio",
+    "--no-first-run",
+)
+_LEAN_BLOCKED_URL_PATTERNS = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    "*.mp3",
+    "*.mp4",
+    "*.webm",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*connect.facebook.net*",
+    "*hotjar.com*",
+)
+
 
 @dataclass(frozen=True)
 class FetchConfig:
@@ -28,438 +119,3913 @@ class FetchConfig:
     user_agent: Optional[str] = None
     min_text_chars: int = 300
     output_format: str = "html"
+    max_components: Optional[int] = None
+    component_concurrency: int = 4
+    component_retries: int = 2
+    engine: str = "selenium"
+    clean_in_browser: bool = False
+    component_min_chars: Optional[int] = None
+    capture_network: bool = False
+    lean: bool = False
+    cache_dir: Optional[Path] = None
+    cache_ttl_hours: float = 168.0
+    cache_max_mb: int = 1024
+    resume: bool = False
+    compression: Optional[str] = None
+    profile: Optional[str] = None
+    profile_trace: Optional[Path] = None
+    index: Optional[Path] = None
+    max_rps: float = 0.0
+    cpu_workers: Optional[int] = None
+    driver_cache: Optional[Path] = None
+
+
+@dataclass(frozen=True)
+class BatchConfig:
+    input_source: str
+    output_dir: Path
+    timeout_seconds: int = 20
+    user_agent: Optional[str] = None
+    min_text_chars: int = 300
+    output_format: str = "html"
+    max_components: Optional[int] = None
+    component_concurrency: int = 4
+    component_retries: int = 2
+    engine: str = "selenium"
+    clean_in_browser: bool = False
+    component_min_chars: Optional[int] = None
+    capture_network: bool = False
+    lean: bool = False
+    cache_dir: Optional[Path] = None
+    cache_ttl_hours: float = 168.0
+    cache_max_mb: int = 1024
+    resume: bool = False
+    compression: Optional[str] = None
+    profile: Optional[str] = None
+    profile_trace: Optional[Path] = None
+    index: Optional[Path] = None
+    max_rps: float = 0.0
+    cpu_workers: Optional[int] = None
+    driver_cache: Optional[Path] = None
+    workers: int = 1
+    restart_after: int = 50
+    per_host: Optional[int] = None
+    book_retries: int = 1
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    action: str
+    db_path: Path
+    paths: tuple[Path, ...] = ()
+    query: str = ""
+    limit: int = 10
+    json_output: bool = False
+
+
+@dataclass(frozen=True)
+class ServeConfig:
+    host: str = "127.0.0.1"
+    port: int = 8765
+    socket_path: Optional[Path] = None
+    timeout_seconds: int = 20
+    user_agent: Optional[str] = None
+    min_text_chars: int = 300
+    output_format: str = "html"
+    max_components: Optional[int] = None
+    component_concurrency: int = 4
+    component_retries: int = 2
+    engine: str = "selenium"
+    clean_in_browser: bool = False
+    component_min_chars: Optional[int] = None
+    capture_network: bool = False
+    lean: bool = False
+    cache_dir: Optional[Path] = None
+    cache_ttl_hours: float = 168.0
+    cache_max_mb: int = 1024
+    profile: Optional[str] = None
+    max_rps: float = 0.0
+    cpu_workers: Optional[int] = None
+    driver_cache: Optional[Path] = None
+    workers: int = 2
+    restart_after: int = 50
+
+
+class ChunkSpool(Sequence[str]):
+    """Append-only sequence of strings kept in an anonymous temporary file instead of in memory.
+
+    Appends and reads may come from several threads. The file is deleted when
+    the spool is closed or garbage collected.
+    """
+
+    def __init__(self) -> None:
+        import tempfile
+        import weakref
+
+        self._file = tempfile.TemporaryFile(prefix="dget-")
+        self._finalizer = weakref.finalize(self, self._file.close)
+        self._lock = threading.Lock()
+        self._spans: list[tuple[int, int]] = []
+        self.nbytes = 0
+
+    def append(self, text: str) -> int:
+        """Store ``text`` and return its position."""
+        data = text.encode("utf-8")
+        with self._lock:
+            self._file.seek(self.nbytes)
+            self._file.write(data)
+            self._spans.append((self.nbytes, len(data)))
+            self.nbytes += len(data)
+            return len(self._spans) - 1
+
+    def size(self, index: int) -> int:
+        """Encoded size of the string at ``index``, without reading it back."""
+        return self._spans[index][1]
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __getitem__(self, index: int) -> str:  # type: ignore[override]
+        with self._lock:
+            offset, length = self._spans[index]
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return data.decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self._spans)):
+            yield self[index]
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __enter__(self) -> ChunkSpool:
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
 
 
 @dataclass(frozen=True)
 class DocumentSnapshot:
-    html: str
-    text: str
+    """Rendered content as ordered chunks: one per chapter component, or a single page chunk.
+
+    Component snapshots keep their chunks in a ``ChunkSpool`` and writers read
+    them back one at a time. A snapshot may carry only the chunks of the
+    formats that will be written; ``text_chars`` then keeps ``text_length``
+    right when the text was dropped. ``titles`` holds the TOC label of each
+    chunk, or ``""`` where the TOC has none.
+    """
+
+    html_chunks: Sequence[str]
+    text_chunks: Sequence[str]
     context: str
+    cleaned: bool = False
+    text_chars: Optional[int] = None
+    titles: tuple[str, ...] = ()
 
+    @classmethod
+    def single(cls, html: str, text: str, context: str, cleaned: bool = False) -> DocumentSnapshot:
+        return cls(html_chunks=(html,), text_chunks=(text,), context=context, cleaned=cleaned)
 
-class HtmlFetcher:
-    """Fetch rendered HTML using a headless Chrome browser."""
+    @property
+    def html(self) -> str:
+        return "\n".join(self.html_chunks)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.text_chunks)
+
+    @property
+    def text_length(self) -> int:
+        if self.text_chars is not None:
+            return self.text_chars
+        return sum(len(chunk) for chunk in self.text_chunks) + max(0, len(self.text_chunks) - 1)
+
+    def keeping(self, formats: frozenset[str]) -> DocumentSnapshot:
+        """Return a copy without the chunks that none of ``formats`` (``html``, ``text``) needs."""
+        return replace(
+            self,
+            html_chunks=self.html_chunks if "html" in formats else (),
+            text_chunks=self.text_chunks if "text" in formats else (),
+            text_chars=self.text_length,
+        )
+
+    def chunks(self, output_format: str) -> Iterator[str]:
+        """Yield the HTML or text output piece by piece, without joining it into one string."""
+        source = self.html_chunks if output_format == "html" else self.text_chunks
+        for index, chunk in enumerate(source):
+            if index:
+                yield "\n"
+            yield chunk
+
+
+@dataclass(frozen=True)
+class SnapshotCandidate:
+    context: str
+    text_length: int
+    has_metadata: bool
+    has_prose: bool
+    frame_path: tuple[int, ...] = ()
+    same_origin: bool = True
+
+
+@dataclass(frozen=True)
+class ComponentPart:
+    index: int
+    path: str
+    html: str
+    cleaned: bool = False
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+    cached: bool = False
+    resumed: bool = False
+    # (spool, HTML position, text position) once ``spilled`` moved ``html`` and ``text`` out of memory.
+    spooled: Optional[tuple[ChunkSpool, int, Optional[int]]] = None
+
+    def content(self) -> str:
+        """The component HTML, read back from its spool if it was spilled."""
+        if self.spooled is None:
+            return self.html
+        spool, position, _text_position = self.spooled
+        return spool[position]
+
+    def extracted_text(self) -> Optional[str]:
+        """The already extracted text, if any, read back from its spool if it was spilled."""
+        if self.spooled is None:
+            return self.text
+        spool, _position, text_position = self.spooled
+        return None if text_position is None else spool[text_position]
+
+    @property
+    def has_text(self) -> bool:
+        return self.text is not None if self.spooled is None else self.spooled[2] is not None
+
+    @property
+    def size(self) -> int:
+        """Encoded size of the component HTML."""
+        if self.spooled is None:
+            return len(self.html.encode("utf-8"))
+        spool, position, _text_position = self.spooled
+        return spool.size(position)
+
+    def spilled(self, spool: Optional[ChunkSpool]) -> ComponentPart:
+        """Return this part with its HTML and text moved into ``spool``, so they no longer stay in memory."""
+        if spool is None or self.spooled is not None:
+            return self
+        text_position = None if self.text is None else spool.append(self.text)
+        return replace(self, html="", text=None, spooled=(spool, spool.append(self.html), text_position))
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    index: int
+    url: str
+    snapshot: Optional[DocumentSnapshot]
+    error: Optional[str]
+    elapsed_seconds: float
+    metrics: Optional[FetchMetrics] = None
+
+
+class _PooledDriver:
+    def __init__(self, driver: webdriver.Chrome) -> None:
+        self.driver = driver
+        self.pages = 0
+
+
+# Origins of the page and of its frames (the DIA reader iframe may be served from another host).
+_PAGE_ORIGINS_SCRIPT = """
+const origins = new Set([location.origin]);
+for (const frame of document.querySelectorAll('iframe[src], frame[src]')) {
+  try { origins.add(new URL(frame.getAttribute('src'), location.href).origin); } catch (_err) {}
+}
+return Array.from(origins).filter((origin) => origin.startsWith('http'));
+"""
+
+
+class DriverPool:
+    """Bounded pool of warm Chrome drivers shared across fetches."""
 
     def __init__(
         self,
-        timeout_seconds: int = 20,
-        user_agent: Optional[str] = None,
-        min_text_chars: int = 300,
+        start_driver: Callable[[], webdriver.Chrome],
+        size: int = 1,
+        max_pages_per_driver: int = 50,
     ) -> None:
-        self._timeout_seconds = timeout_seconds
-        self._user_agent = user_agent
-        self._min_text_chars = min_text_chars
+        self._start_driver = start_driver
+        self._size = max(1, size)
+        self._max_pages_per_driver = max(1, max_pages_per_driver)
+        self._slots = threading.BoundedSemaphore(self._size)
+        self._idle: queue.LifoQueue[_PooledDriver] = queue.LifoQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._waiting = 0
+        self._started = 0
+        self._retired = 0
+        self._pages = 0
 
-    def fetch(self, url: str) -> DocumentSnapshot:
-        options = self._build_options()
-        try:
-            driver = webdriver.Chrome(options=options)
-        except WebDriverException as exc:
-            raise RuntimeError("Failed to start Chrome WebDriver") from exc
+    def __enter__(self) -> DriverPool:
+        return self
 
-        try:
-            driver.get(url)
-            WebDriverWait(driver, self._timeout_seconds).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            self._wait_for_epub_runtime(driver)
-            self._activate_book_content_view(driver)
-            self._wait_for_reader_iframe_content(driver)
-            self._wait_for_rendered_text(driver)
-            component_snapshot = self._snapshot_from_component_endpoints(driver)
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
 
-            top_level = self._snapshot_current_document(driver, "top")
-            frame_snapshots = self._collect_frame_snapshots(driver)
-            candidates = [top_level, *frame_snapshots]
-            if component_snapshot:
-                candidates.append(component_snapshot)
-            best_snapshot = max(
-                candidates,
-                key=self._snapshot_score,
-            )
-            best_snapshot = self._without_page_number_spans(best_snapshot)
-            LOG.info(
-                "Selected rendered context '%s' with %d text chars",
-                best_snapshot.context,
-                len(best_snapshot.text),
-            )
-            return best_snapshot
+    @contextmanager
+    def driver(self) -> Iterator[webdriver.Chrome]:
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        self._adjust("_waiting", 1)
+        self._slots.acquire()
+        self._adjust("_waiting", -1)
+        self._adjust("_busy", 1)
+        try:
+            pooled = self._take_idle() or self._new_driver()
+            healthy = False
+            try:
+                yield pooled.driver
+                healthy = True
+            finally:
+                pooled.pages += 1
+                self._adjust("_pages", 1)
+                self._release(pooled, healthy)
         finally:
-            driver.quit()
+            self._adjust("_busy", -1)
+            self._slots.release()
 
-    def _wait_for_rendered_text(self, driver: webdriver.Chrome) -> None:
-        def max_text_length(current_driver: webdriver.Chrome) -> int:
-            return int(
-                current_driver.execute_script(
-                    """
-                    const textLengthForDoc = (doc) => {
-                        if (!doc || !doc.body) return 0;
-                        const selectors = [
-                            '#reader .monelem_component',
-                            '#reader .monelem_page',
-                            '#reader',
-                            '.monelem_page',
-                            '.monelem_sheaf',
-                            '.monelem_component',
-                            'article',
-                            'main',
-                            '#content',
-                            '.content',
-                            '.chapter',
-                            '.text',
-                            'body'
-                        ];
-                        let best = 0;
-                        for (const selector of selectors) {
-                            const nodes = doc.querySelectorAll(selector);
-                            for (const node of nodes) {
-                                const len = (node.innerText || '').trim().length;
-                                if (len > best) best = len;
-                            }
-                        }
-                        return best;
-                    };
+    def warm(self, count: Optional[int] = None) -> None:
+        """Start up to ``count`` drivers (default: the pool size) ahead of the first fetch."""
+        missing = min(self._size, count or self._size) - self._idle.qsize() - self._busy
+        for _ in range(max(0, missing)):
+            self._idle.put(self._new_driver())
 
-                    const maxLen = (doc) => {
-                        if (!doc) return 0;
-                        let best = textLengthForDoc(doc);
-                        const frames = doc.querySelectorAll('iframe');
-                        for (const frame of frames) {
-                            try {
-                                const childDoc = frame.contentDocument;
-                                if (!childDoc) continue;
-                                const childLen = maxLen(childDoc);
-                                if (childLen > best) best = childLen;
-                            } catch (_err) {
-                            }
-                        }
-                        return best;
-                    };
-                    return maxLen(document);
-                    """
-                )
-            )
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": self._idle.qsize(),
+                "busy": self._busy,
+                "waiting": self._waiting,
+                "started": self._started,
+                "retired": self._retired,
+                "pages": self._pages,
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            pooled = self._take_idle()
+            if pooled is None:
+                break
+            self._quit(pooled)
+
+    def _new_driver(self) -> _PooledDriver:
+        pooled = _PooledDriver(self._start_driver())
+        self._adjust("_started", 1)
+        return pooled
 
+    def _adjust(self, name: str, amount: int) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _take_idle(self) -> Optional[_PooledDriver]:
         try:
-            WebDriverWait(driver, self._timeout_seconds).until(
-                lambda current_driver: max_text_length(current_driver) >= self._min_text_chars
-            )
-        except Exception:
-            current_max = max_text_length(driver)
-            LOG.warning(
-                "Timed out waiting for %d rendered text chars (max observed: %d)",
-                self._min_text_chars,
-                current_max,
-            )
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return None
 
-    def _wait_for_epub_runtime(self, driver: webdriver.Chrome) -> None:
-        try:
-            WebDriverWait(driver, self._timeout_seconds).until(
-                lambda current_driver: bool(
-                    current_driver.execute_script(
-                        """
-                        const hasRuntime = typeof window.EpubReader !== 'undefined';
-                        const hasReaderContainer = !!document.querySelector('#reader');
-                        const hasReaderFrame = !!document.querySelector('#reader iframe.monelem_component');
-                        return hasRuntime && hasReaderContainer && hasReaderFrame;
-                        """
-                    )
-                )
-            )
-        except Exception:
-            LOG.warning("Timed out waiting for EpubReader runtime initialization")
+    def _release(self, pooled: _PooledDriver, healthy: bool) -> None:
+        if not healthy:
+            LOG.warning("Restarting Chrome driver after a failed fetch")
+            self._quit(pooled)
+            return
+        if pooled.pages >= self._max_pages_per_driver:
+            LOG.info("Restarting Chrome driver after %d pages", pooled.pages)
+            self._quit(pooled)
+            return
+        if self._closed or not self._reset(pooled.driver):
+            self._quit(pooled)
+            return
+        self._idle.put(pooled)
 
-    def _wait_for_reader_iframe_content(self, driver: webdriver.Chrome) -> None:
-        def reader_iframe_text_length(current_driver: webdriver.Chrome) -> int:
-            return int(
-                current_driver.execute_script(
-                    """
-                    const readers = Array.from(document.querySelectorAll('#reader iframe.monelem_component'));
-                    let best = 0;
-                    for (const iframe of readers) {
-                        try {
-                            const doc = iframe.contentDocument;
-                            if (!doc || !doc.body) continue;
-                            const text = (doc.body.innerText || '').trim();
-                            if (text.length > best) best = text.length;
-                        } catch (_err) {
-                        }
-                    }
-                    return best;
-                    """
-                )
-            )
+    def _reset(self, driver: webdriver.Chrome) -> bool:
+        """Clear cookies and storage of every origin the last book touched, then park on ``about:blank``."""
+        try:
+            handles = driver.window_handles
+            origins: set[str] = set()
+            for handle in reversed(handles):
+                driver.switch_to.window(handle)
+                origins.update(driver.execute_script(_PAGE_ORIGINS_SCRIPT) or ())
+                if handle != handles[0]:
+                    driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in sorted(origins):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            driver.get("about:blank")
+        except Exception as exc:
+            LOG.warning("Failed to reset Chrome driver state: %s", exc)
+            return False
+        return True
 
+    def _quit(self, pooled: _PooledDriver) -> None:
+        self._adjust("_retired", 1)
         try:
-            WebDriverWait(driver, self._timeout_seconds).until(
-                lambda current_driver: reader_iframe_text_length(current_driver) >= self._min_text_chars
-            )
-        except Exception:
-            observed = reader_iframe_text_length(driver)
-            LOG.warning(
-                "Timed out waiting for reader iframe text (min %d, observed %d)",
-                self._min_text_chars,
-                observed,
-            )
+            pooled.driver.quit()
+        except Exception as exc:
+            LOG.debug("Failed to quit Chrome driver: %s", exc)
 
-    def _snapshot_current_document(self, driver: webdriver.Chrome, context: str) -> DocumentSnapshot:
-        html = str(
-            driver.execute_script(
-                """
-                const clonedDoc = document.cloneNode(true);
-                clonedDoc.querySelectorAll('.oldaltores').forEach((node) => node.remove());
-                clonedDoc.querySelectorAll('a[name^="DIAPage"]').forEach((node) => node.remove());
-                return clonedDoc.documentElement.outerHTML || '';
-                """
-            )
-        )
-        text = self._best_text_from_html(html)
-        return DocumentSnapshot(html=html, text=text.strip(), context=context)
-
-    def _snapshot_score(self, snapshot: DocumentSnapshot) -> tuple[int, int]:
-        lowered = snapshot.text.lower()
-        metadata_keywords = (
-            "tartalomjegyzék",
-            "szerző további művei",
-            "metaadatok",
-            "szöveg keresése",
-        )
-        metadata_penalty = 1 if all(keyword in lowered for keyword in metadata_keywords[:2]) else 0
-        iframe_bonus = 1 if "iframe" in snapshot.context else 0
-        component_bonus = 2 if snapshot.context.startswith("component") else 0
-        prose_bonus = 1 if "bevezetés" in lowered or "rendkívüli állapotok" in lowered else 0
-        score = len(snapshot.text) - (2000 if metadata_penalty else 0)
-        return (component_bonus, prose_bonus, iframe_bonus, score)
 
-    def _snapshot_from_component_endpoints(self, driver: webdriver.Chrome) -> Optional[DocumentSnapshot]:
-        chapter_paths = self._chapter_component_paths(driver)
-        if not chapter_paths:
+_VOID_TAGS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr")
+)
+
+
+_TEXT_BLOCK_TAGS = frozenset(
+    ("p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "tr", "section", "article", "header", "footer")
+)
+_TAG_RE = re.compile(r"<(/?)([A-Za-z][A-Za-z0-9]*)?[^>]*>")
+_BODY_RE = re.compile(r"<body\b", re.IGNORECASE)
+_RAW_TEXT_END_RE = {
+    "script": re.compile(r"</script\s*>", re.IGNORECASE),
+    "style": re.compile(r"</style\s*>", re.IGNORECASE),
+}
+_SPACE_RUN_RE = re.compile(r"[ \t]{2,}")
+_NBSP_RE = re.compile(r"&nbsp;", re.IGNORECASE)
+
+
+class _TextLineWriter:
+    """Assemble extracted text line by line, dropping blank and page-number lines."""
+
+    def __init__(self, out: io.StringIO) -> None:
+        self._out = out
+        self._parts: list[str] = []
+        self._empty = True
+
+    def text(self, data: str) -> None:
+        if "\n" not in data:
+            self._parts.append(data)
+            return
+        first, *rest = data.split("\n")
+        self._parts.append(first)
+        for piece in rest:
+            self.newline()
+            self._parts.append(piece)
+
+    def newline(self) -> None:
+        line = "".join(self._parts).strip()
+        self._parts.clear()
+        if not line or (len(line) <= 4 and line.isdecimal()):
+            return
+        if "  " in line or "\t" in line:
+            line = _SPACE_RUN_RE.sub(" ", line)
+        if not self._empty:
+            self._out.write("\n")
+        self._out.write(line)
+        self._empty = False
+
+
+def extract_text(html: str) -> str:
+    """Convert HTML to plain text in a single linear scan.
+
+    Only ``<body>`` content is kept when the document has one. Script and style
+    bodies are dropped, ``<br>`` and closing block tags start a new line, entities
+    are decoded, and blank or standalone page-number lines are skipped.
+    """
+    out = io.StringIO()
+    writer = _TextLineWriter(out)
+    in_body = _BODY_RE.search(html) is None
+    position = 0
+    length = len(html)
+    last_tag_end = html.rfind(">")
+    while position < length:
+        tag_start = html.find("<", position)
+        if tag_start < 0 or tag_start > last_tag_end:
+            tag_start = length
+        if in_body and tag_start > position:
+            data = html[position:tag_start]
+            if "&" in data:
+                data = html_lib.unescape(_NBSP_RE.sub(" ", data))
+            writer.text(data)
+        if tag_start >= length:
+            break
+
+        if html.startswith("<!--", tag_start):
+            comment_end = html.find("-->", tag_start + 4)
+            position = length if comment_end < 0 else comment_end + 3
+            continue
+        match = _TAG_RE.match(html, tag_start)
+        if match is None:
+            position = tag_start + 1
+            continue
+        position = match.end()
+        name = (match.group(2) or "").lower()
+        if match.group(1):
+            if name == "body":
+                in_body = False
+            elif name in _TEXT_BLOCK_TAGS and in_body:
+                writer.newline()
+            continue
+        if name == "body":
+            in_body = True
+        elif name == "br" and in_body:
+            writer.newline()
+        elif name in _RAW_TEXT_END_RE:
+            end_match = _RAW_TEXT_END_RE[name].search(html, position)
+            position = length if end_match is None else end_match.end()
+    writer.newline()
+    return out.getvalue()
+
+
+# One attribute of a start tag, matched from the end of the previous one so quoted values are never searched.
+_ATTRIBUTE_RE = re.compile(r"""[\s/]*([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]*)))?""")
+
+
+def _attribute_value(tag: str, wanted: str) -> Optional[str]:
+    """Return the first value of attribute ``wanted`` in a start tag such as ``<span class=x>``."""
+    name_match = _TAG_RE.match(tag)
+    position = name_match.end(2) if name_match is not None and name_match.group(2) else len(tag)
+    while True:
+        match = _ATTRIBUTE_RE.match(tag, position)
+        if match is None or match.end() == position:
             return None
+        if match.group(1).lower() == wanted:
+            return next((group for group in match.groups()[1:] if group is not None), "")
+        position = match.end()
 
-        selected_paths: list[str] = []
-        for path in chapter_paths:
-            lowered = path.lower()
-            if "szerzoseg" in lowered:
+
+def _is_page_number_element(tag: str) -> bool:
+    if "oldaltores" not in tag:
+        return False
+    classes = _attribute_value(tag, "class")
+    return classes is not None and "oldaltores" in classes.split()
+
+
+def _is_page_anchor(tag: str) -> bool:
+    if "DIAPage" not in tag:
+        return False
+    name = _attribute_value(tag, "name")
+    return name is not None and name.startswith("DIAPage")
+
+
+def strip_page_markers(html: str) -> str:
+    """Remove ``.oldaltores`` elements and ``DIAPage`` anchors in one linear pass.
+
+    A removed element ends at its own closing tag, or at the closing tag of its
+    parent when it is left unclosed; stray closing tags inside it close the
+    elements they match. Anchor content is kept; only the
+    ``<a name="DIAPage...">`` tags themselves are dropped.
+    """
+    out = io.StringIO()
+    position = 0
+    copied_until = 0
+    length = len(html)
+    last_tag_end = html.rfind(">")
+    # Elements open inside the element being removed, with per-name counts for O(1) lookups.
+    skipping: list[str] = []
+    skipping_counts: dict[str, int] = {}
+    open_page_anchors = 0
+    while position < length:
+        tag_start = html.find("<", position)
+        if tag_start < 0 or tag_start > last_tag_end:
+            break
+        if html.startswith("<!--", tag_start):
+            comment_end = html.find("-->", tag_start + 4)
+            position = length if comment_end < 0 else comment_end + 3
+            continue
+        match = _TAG_RE.match(html, tag_start)
+        if match is None:
+            position = tag_start + 1
+            continue
+        position = match.end()
+        name = (match.group(2) or "").lower()
+        is_end = bool(match.group(1))
+        is_container = bool(name) and name not in _VOID_TAGS and not html.startswith("/>", position - 2)
+
+        if skipping:
+            if is_end and name:
+                if skipping_counts.get(name):
+                    while True:
+                        closed = skipping.pop()
+                        skipping_counts[closed] -= 1
+                        if closed == name:
+                            break
+                    if not skipping:
+                        copied_until = position
+                else:
+                    # The closing tag of a parent ends an unclosed element and is kept.
+                    skipping.clear()
+                    skipping_counts.clear()
+                    copied_until = tag_start
+            elif is_container:
+                skipping.append(name)
+                skipping_counts[name] = skipping_counts.get(name, 0) + 1
+            if name in _RAW_TEXT_END_RE and not is_end:
+                end_match = _RAW_TEXT_END_RE[name].search(html, position)
+                position = length if end_match is None else end_match.end()
+            continue
+
+        tag = html[tag_start:position]
+        if not is_end and is_container and _is_page_number_element(tag):
+            out.write(html[copied_until:tag_start])
+            skipping.append(name)
+            skipping_counts[name] = 1
+            continue
+        if name == "a":
+            if not is_end and _is_page_anchor(tag):
+                out.write(html[copied_until:tag_start])
+                copied_until = position
+                if is_container:
+                    open_page_anchors += 1
                 continue
-            selected_paths.append(path)
-            if len(selected_paths) >= 4:
+            if is_end and open_page_anchors:
+                open_page_anchors -= 1
+                out.write(html[copied_until:tag_start])
+                copied_until = position
+                continue
+        if name in _RAW_TEXT_END_RE and not is_end:
+            end_match = _RAW_TEXT_END_RE[name].search(html, position)
+            position = length if end_match is None else end_match.end()
+
+    if not skipping:
+        out.write(html[copied_until:])
+    return out.getvalue()
+
+
+# Elements dropped with their content, and tags dropped while their content is kept.
+_XHTML_SKIPPED_ELEMENTS = frozenset(
+    (
+        "script",
+        "style",
+        "noscript",
+        "template",
+        "head",
+        "title",
+        "iframe",
+        "object",
+        "svg",
+        "math",
+        "canvas",
+        "video",
+        "audio",
+        "select",
+        "textarea",
+        "button",
+    )
+)
+_XHTML_UNWRAPPED_TAGS = frozenset(
+    (
+        "html",
+        "body",
+        "form",
+        "input",
+        "img",
+        "link",
+        "meta",
+        "base",
+        "embed",
+        "source",
+        "track",
+        "picture",
+        "area",
+        "map",
+        "font",
+        "center",
+    )
+)
+# Tags allowed in <head>; any other start tag (or <body>) ends a head whose </head> was omitted.
+_XHTML_HEAD_TAGS = frozenset(("base", "link", "meta", "noscript", "script", "style", "template", "title"))
+_XHTML_VOID_TAGS = frozenset(("br", "hr", "wbr", "col"))
+_XHTML_ATTRIBUTES = frozenset(
+    ("id", "class", "title", "lang", "dir", "colspan", "rowspan", "span", "start", "reversed", "type")
+)
+# Opening the key closes any of these elements still open above it, as HTML parsers do.
+_XHTML_IMPLIED_END = {
+    "p": frozenset(("p",)),
+    "li": frozenset(("li", "p")),
+    "dt": frozenset(("dt", "dd", "p")),
+    "dd": frozenset(("dt", "dd", "p")),
+    "tr": frozenset(("tr", "td", "th")),
+    "td": frozenset(("td", "th")),
+    "th": frozenset(("td", "th")),
+}
+_XHTML_CLOSES_P = frozenset(
+    ("div", "ul", "ol", "dl", "table", "blockquote", "pre", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "section")
+)
+_XML_NAME_RE = re.compile(r"[a-z][a-z0-9]*\Z")
+_XML_INVALID_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_HEADING_TAGS = frozenset(("h1", "h2", "h3"))
+
+
+class _XhtmlSanitizer(HTMLParser):
+    """Rewrite chapter HTML as well-formed XHTML body content for an EPUB."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.out = io.StringIO()
+        self.title: Optional[str] = None
+        self._open: list[str] = []
+        self._skipping: Optional[str] = None
+        self._skip_depth = 0
+        self._head_child: Optional[str] = None
+        self._heading: Optional[list[str]] = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        if self._skipping == "head" and tag not in _XHTML_HEAD_TAGS and tag != "head":
+            self._skipping, self._head_child = None, None
+        elif self._skipping is not None:
+            self._skip_depth += tag == self._skipping
+            if self._skipping == "head" and tag not in _VOID_TAGS:
+                self._head_child = tag
+            return
+        if tag in _XHTML_SKIPPED_ELEMENTS:
+            self._skipping, self._skip_depth = tag, 1
+            return
+        if tag in _XHTML_UNWRAPPED_TAGS or not _XML_NAME_RE.match(tag):
+            return
+        implied = _XHTML_IMPLIED_END.get(tag, frozenset(("p",)) if tag in _XHTML_CLOSES_P else frozenset())
+        while self._open and self._open[-1] in implied:
+            self._close_top()
+        self.out.write(f"<{tag}")
+        written: set[str] = set()
+        for name, value in attrs:
+            if value is None or name in written:
+                continue
+            if name in _XHTML_ATTRIBUTES or (
+                name == "href" and tag == "a" and value.startswith(("#", "http://", "https://", "mailto:"))
+            ):
+                self.out.write(f' {name}="{html_lib.escape(_XML_INVALID_CHARS_RE.sub("", value))}"')
+                written.add(name)
+        if tag in _XHTML_VOID_TAGS:
+            self.out.write("/>")
+            return
+        self.out.write(">")
+        self._open.append(tag)
+        if tag in _HEADING_TAGS and self.title is None and self._heading is None:
+            self._heading = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skipping is not None:
+            if tag == self._head_child:
+                self._head_child = None
+            if tag == self._skipping:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skipping = None
+            return
+        if tag not in self._open:
+            return
+        while self._open:
+            if self._close_top() == tag:
                 break
 
-        if not selected_paths:
-            return None
+    def handle_data(self, data: str) -> None:
+        if self._skipping == "head" and self._head_child is None and data.strip():
+            # Text outside <title>, <style> and the like ends a head whose </head> was omitted.
+            self._skipping = None
+        elif self._skipping is not None:
+            return
+        data = _XML_INVALID_CHARS_RE.sub("", data)
+        self.out.write(html_lib.escape(data, quote=False))
+        if self._heading is not None:
+            self._heading.append(data)
 
-        parts: list[dict[str, str]] = list(
-            driver.execute_async_script(
-                """
-                const paths = arguments[0];
-                const done = arguments[arguments.length - 1];
+    def close(self) -> None:
+        super().close()
+        while self._open:
+            self._close_top()
 
-                Promise.all(paths.map(async (path) => {
-                    try {
-                        const response = await fetch(path, { credentials: 'include' });
-                        if (!response.ok) {
-                            return { path, html: '', text: '' };
-                        }
-                        const markup = await response.text();
-                        const parser = new DOMParser();
-                        const doc = parser.parseFromString(markup, 'text/html');
-                        const text = (doc.body && doc.body.innerText) ? doc.body.innerText.trim() : '';
-                        const html = doc.documentElement ? doc.documentElement.outerHTML : markup;
-                        return { path, html, text };
-                    } catch (_error) {
-                        return { path, html: '', text: '' };
-                    }
-                })).then(done);
-                """,
-                selected_paths,
+    def _close_top(self) -> str:
+        tag = self._open.pop()
+        self.out.write(f"</{tag}>")
+        if tag in _HEADING_TAGS and self._heading is not None:
+            self.title = " ".join("".join(self._heading).split()) or None
+            self._heading = None
+        return tag
+
+
+def chapter_xhtml(html: str) -> tuple[str, Optional[str]]:
+    """Sanitize one chapter into XHTML body content; also return its first heading as the title.
+
+    Scripts, styles, forms, media and ``<head>`` are dropped, only plain
+    attributes are kept, and tags are balanced so the result is well-formed XML.
+    """
+    sanitizer = _XhtmlSanitizer()
+    sanitizer.feed(html)
+    sanitizer.close()
+    return sanitizer.out.getvalue(), sanitizer.title
+
+
+def _postprocess_component(html: str, cleaned: bool) -> tuple[str, str]:
+    """Clean one chapter component and extract its text; runs in worker processes."""
+    if not cleaned:
+        html = strip_page_markers(html)
+    return html, extract_text(html)
+
+
+class ComponentPostProcessor:
+    """Clean chapter components and extract their text, fanning large books out to a process pool.
+
+    Everything runs in-process unless ``workers`` is above one. Books smaller
+    than ``min_parallel_bytes`` are processed inline, where pickling would cost
+    more than it saves. The pool is created on first use and shared by every
+    fetch (and batch worker) that uses this processor.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_parallel_bytes: int = 1024 * 1024) -> None:
+        self._workers = 1 if workers is None else max(1, workers)
+        self._min_parallel_bytes = min_parallel_bytes
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def process(self, parts: list[ComponentPart]) -> list[tuple[str, str]]:
+        """Return ``(cleaned_html, text)`` for each part, in the order given."""
+        return list(
+            self.map(
+                _postprocess_component,
+                _PartHtml(parts),
+                [part.cleaned for part in parts],
+                total_bytes=sum(part.size for part in parts),
             )
         )
 
-        valid_parts = [part for part in parts if part.get("text", "").strip()]
-        if not valid_parts:
+    def map(
+        self,
+        function: Callable[..., _T],
+        chapters: Sequence[str],
+        *arguments: Sequence[object],
+        total_bytes: Optional[int] = None,
+    ) -> Iterator[_T]:
+        """Yield ``function(chapter, *arguments)`` for each chapter in order, as soon as each result is ready.
+
+        Chapters are read one at a time and at most two per worker are in
+        flight, so ``chapters`` may be a lazy sequence such as a ``ChunkSpool``.
+        ``total_bytes`` spares reading lazy chapters just to measure them.
+        """
+        done = 0
+        executor = self._executor_for(chapters, total_bytes)
+        if executor is not None:
+            from concurrent.futures.process import BrokenProcessPool
+
+            pending: deque[Future[_T]] = deque()
+            try:
+                for index in range(len(chapters)):
+                    pending.append(executor.submit(function, chapters[index], *(column[index] for column in arguments)))
+                    if len(pending) >= self._workers * 2:
+                        yield pending.popleft().result()
+                        done += 1
+                while pending:
+                    yield pending.popleft().result()
+                    done += 1
+                return
+            except BrokenProcessPool as exc:
+                LOG.warning("Post-processing pool failed, continuing in-process: %s", exc)
+                with self._lock:
+                    self._executor = None
+                    self._workers = 1
+            finally:
+                for future in pending:
+                    future.cancel()
+        for index in range(done, len(chapters)):
+            yield function(chapters[index], *(column[index] for column in arguments))
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def _executor_for(self, chapters: Sequence[str], total_bytes: Optional[int]) -> Optional[ProcessPoolExecutor]:
+        if self._workers <= 1 or len(chapters) < 2:
+            return None
+        if total_bytes is None:
+            total_bytes = chapters.nbytes if isinstance(chapters, ChunkSpool) else sum(map(len, chapters))
+        if total_bytes < self._min_parallel_bytes:
             return None
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
 
-        combined_html = "\n".join(part["html"] for part in valid_parts)
-        combined_text = self._best_text_from_html(combined_html)
-        LOG.info(
-            "Fetched %d chapter component(s) via /rest endpoint (%d text chars)",
-            len(valid_parts),
-            len(combined_text),
-        )
-        return DocumentSnapshot(
-            html=combined_html,
-            text=combined_text,
-            context="component-api",
-        )
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=context)
+                LOG.debug("Started %d post-processing worker process(es)", self._workers)
+            return self._executor
 
-    def _chapter_component_paths(self, driver: webdriver.Chrome) -> list[str]:
-        paths: list[str] = list(
-            driver.execute_script(
-                """
-                const nodes = Array.from(document.querySelectorAll('#toc-view li[data-chapter]'));
-                const values = [];
-                for (const node of nodes) {
-                    const path = node.getAttribute('data-chapter') || '';
-                    if (path) values.push(path);
-                }
-                return values;
-                """
-            )
-        )
-        return paths
 
-    def _without_page_number_spans(self, snapshot: DocumentSnapshot) -> DocumentSnapshot:
-        cleaned_html = re.sub(
-            r"<([a-z0-9]+)\b[^>]*\bclass\s*=\s*['\"][^'\"]*\boldaltores\b[^'\"]*['\"][^>]*>.*?</\1>",
-            "",
-            snapshot.html,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
-        cleaned_html = re.sub(
-            r"<a\b[^>]*\bname\s*=\s*['\"]DIAPage[^'\"]*['\"][^>]*>\s*</a>",
-            "",
-            cleaned_html,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
-        cleaned_text = self._best_text_from_html(cleaned_html)
-        if not cleaned_text.strip():
-            cleaned_text = re.sub(r"\b\d+\b", "", snapshot.text)
-            cleaned_text = re.sub(r"[ \t]+", " ", cleaned_text)
-            cleaned_text = re.sub(r"\n\s*\n\s*\n+", "\n\n", cleaned_text)
-        return DocumentSnapshot(
-            html=cleaned_html,
-            text=cleaned_text.strip(),
-            context=snapshot.context,
-        )
+class _PartHtml(Sequence[str]):
+    """The HTML of ``parts`` in order, each read from its spool only when it is needed."""
+
+    def __init__(self, parts: list[ComponentPart]) -> None:
+        self._parts = parts
+
+    def __len__(self) -> int:
+        return len(self._parts)
+
+    def __getitem__(self, index: int) -> str:  # type: ignore[override]
+        return self._parts[index].content()
+
+
+class _TocParser(HTMLParser):
+    """Collect ``data-chapter`` paths of ``#toc-view li`` items, and their labels, from server-rendered HTML."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.toc_paths: list[str] = []
+        self.other_paths: list[str] = []
+        self.labels: dict[str, str] = {}
+        self._toc_depth = 0
+        self._label: Optional[tuple[str, list[str]]] = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        values = dict(attrs)
+        if self._toc_depth:
+            if tag not in _VOID_TAGS:
+                self._toc_depth += 1
+        elif values.get("id") == "toc-view" and tag not in _VOID_TAGS:
+            self._toc_depth = 1
+        if tag in ("li", "ol", "ul"):
+            # A nested list ends the label of the item that contains it.
+            self._end_label()
+        path = values.get("data-chapter")
+        if tag == "li" and path:
+            (self.toc_paths if self._toc_depth else self.other_paths).append(path)
+            self._label = (path, [])
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._toc_depth and tag not in _VOID_TAGS:
+            self._toc_depth -= 1
+        if tag == "li":
+            self._end_label()
+
+    def handle_data(self, data: str) -> None:
+        if self._label is not None:
+            self._label[1].append(data)
+
+    def _end_label(self) -> None:
+        if self._label is not None:
+            path, pieces = self._label
+            label = " ".join("".join(pieces).split())
+            if label:
+                self.labels.setdefault(path, label)
+            self._label = None
+
+
+def chapter_toc_from_html(html: str) -> tuple[list[str], dict[str, str]]:
+    """Return the TOC component paths and the label of each ``li`` that has one."""
+    parser = _TocParser()
+    parser.feed(html)
+    parser.close()
+    return parser.toc_paths or parser.other_paths, parser.labels
+
+
+def chapter_paths_from_html(html: str) -> list[str]:
+    return chapter_toc_from_html(html)[0]
+
+
+class _RetryableHttpError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    url: str
+    status: int
+    body: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class HostRateLimiter:
+    """Space requests to each host at least ``1 / requests_per_second`` apart; shared across threads.
+
+    ``acquire(url, requests=n)`` reserves ``n`` consecutive slots, so a batch of
+    concurrent requests starts at once and the next caller waits until the
+    batch's share of the budget has passed.
+    """
+
+    def __init__(self, requests_per_second: float) -> None:
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str, requests: int = 1) -> None:
+        if self._interval <= 0:
+            return
+        host = _host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval * max(1, requests)
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpComponentClient:
+    """Fetch reader pages and chapter components over pooled keep-alive HTTP connections."""
+
+    def __init__(
+        self,
+        timeout_seconds: int = 20,
+        user_agent: Optional[str] = None,
+        concurrency: int = 4,
+        retries: int = 2,
+        rate_limiter: Optional[HostRateLimiter] = None,
+    ) -> None:
+        from http.cookiejar import CookieJar
+
+        self._timeout_seconds = timeout_seconds
+        self._rate_limiter = rate_limiter
+        self._user_agent = user_agent or "Mozilla/5.0 (X11; Linux x86_64) dget"
+        self._concurrency = max(1, concurrency)
+        self._retries = retries
+        self._local = threading.local()
+        # Scopes cookies by Domain and Path, drops expired ones, and locks internally.
+        self._cookies: CookieJar = CookieJar()
+        self._executor = ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="dget-http")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def fetch_document(self, url: str) -> tuple[str, list[str], dict[str, str]]:
+        """Return the final document URL, and the TOC component paths and labels found in its HTML."""
+        response = self.get(url)
+        paths, labels = chapter_toc_from_html(response.body)
+        return response.url, paths, labels
+
+    def fetch_components(
+        self,
+        document_url: str,
+        paths: list[str],
+        validators: Optional[dict[str, tuple[Optional[str], Optional[str]]]] = None,
+        on_part: Optional[Callable[[ComponentPart], None]] = None,
+        spool: Optional[ChunkSpool] = None,
+    ) -> list[ComponentPart]:
+        """Fetch ``paths`` concurrently; ``validators`` maps a path to its cached (ETag, Last-Modified).
+
+        ``on_part`` is called from the worker thread as soon as each component
+        completes, and the component HTML is then moved into ``spool``.
+        """
+        parts: list[Optional[ComponentPart]] = [None] * len(paths)
+        failed: list[str] = []
+        validators = validators or {}
+
+        def fetch_one(index: int) -> None:
+            path = paths[index]
+            etag, last_modified = validators.get(path, (None, None))
+            headers: dict[str, str] = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            try:
+                response = self.get(urljoin(document_url, path), headers)
+            except Exception as exc:
+                LOG.debug("Chapter component %s failed: %s", path, exc)
+                failed.append(path)
+                return
+            part = ComponentPart(
+                index=index,
+                path=path,
+                html=response.body,
+                etag=response.etag,
+                last_modified=response.last_modified,
+                not_modified=response.status == 304,
+            )
+            if on_part is not None:
+                on_part(part)
+            parts[index] = part.spilled(spool)
+
+        list(self._executor.map(fetch_one, range(len(paths))))
+
+        if failed:
+            LOG.warning("Failed to fetch %d of %d chapter component(s) over HTTP", len(failed), len(paths))
+        return [part for part in parts if part is not None]
+
+    def get(self, url: str, headers: Optional[dict[str, str]] = None) -> HttpResponse:
+        """GET ``url`` with retries and redirects; a ``304 Not Modified`` is returned, not raised."""
+        last_error: Optional[Exception] = None
+        for attempt in range(self._retries + 1):
+            if attempt:
+                time.sleep(min(4.0, 0.25 * 2 ** (attempt - 1)) * (0.5 + random.random()))
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(url)
+            try:
+                return self._get_once(url, headers or {})
+            except _RetryableHttpError as exc:
+                last_error = exc
+            except (OSError, http.client.HTTPException) as exc:
+                self._drop_connection(url)
+                last_error = exc
+        raise RuntimeError(f"GET {url} failed: {last_error}")
+
+    def _get_once(self, url: str, extra_headers: dict[str, str], redirects: int = 5) -> HttpResponse:
+        from urllib.request import Request
+
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        connection = self._connection(url)
+        headers = {
+            "User-Agent": self._user_agent,
+            "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+            **extra_headers,
+        }
+        request = Request(url, headers=headers)
+        self._cookies.add_cookie_header(request)
+        connection.request("GET", target, headers=dict(request.header_items()))
+        response = connection.getresponse()
+        body = response.read()
+        self._cookies.extract_cookies(response, request)
+        if response.will_close:
+            self._drop_connection(url)
+
+        location = response.getheader("Location")
+        if response.status in (301, 302, 303, 307, 308) and location and redirects > 0:
+            return self._get_once(urljoin(url, location), extra_headers, redirects - 1)
+        if response.status == 429 or response.status >= 500:
+            raise _RetryableHttpError(f"HTTP {response.status}")
+        if response.status >= 400:
+            raise RuntimeError(f"GET {url} returned HTTP {response.status}")
+
+        if response.getheader("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        charset = response.headers.get_content_charset() or "utf-8"
+        return HttpResponse(
+            url=url,
+            status=response.status,
+            body=body.decode(charset, errors="replace"),
+            etag=response.getheader("ETag"),
+            last_modified=response.getheader("Last-Modified"),
+        )
+
+    def _connection(self, url: str) -> http.client.HTTPConnection:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        connections: dict[tuple[str, str], http.client.HTTPConnection] = self._local.__dict__.setdefault(
+            "connections", {}
+        )
+        connection = connections.get(key)
+        if connection is None:
+            if parts.scheme == "https":
+                connection = http.client.HTTPSConnection(parts.netloc, timeout=self._timeout_seconds)
+            elif parts.scheme == "http":
+                connection = http.client.HTTPConnection(parts.netloc, timeout=self._timeout_seconds)
+            else:
+                raise RuntimeError(f"Unsupported URL scheme for HTTP engine: {url}")
+            connections[key] = connection
+        return connection
+
+    def _drop_connection(self, url: str) -> None:
+        parts = urlsplit(url)
+        connections = self._local.__dict__.get("connections", {})
+        connection = connections.pop((parts.scheme, parts.netloc), None)
+        if connection is not None:
+            connection.close()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    value: str
+    fresh: bool
+    digest: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    cleaned: bool = False
+    source: str = ""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    revalidated: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+class ComponentCache:
+    """Content-addressed on-disk cache of reader TOCs, chapter components and extracted text.
+
+    Each entry is a data file plus a JSON metadata file under
+    ``objects/<prefix>/<sha256>``, addressed by kind, document URL and
+    ``data-chapter`` path. Both files are replaced atomically and the data is
+    checked against the recorded hash on read, so several worker processes can
+    share one directory. Metadata mtimes track recent use for LRU eviction.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_bytes: int = 1024 * 1024 * 1024,
+    ) -> None:
+        self._root = root
+        self._objects = root / "objects"
+        self._ttl_seconds = ttl_seconds
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self.stats = CacheStats()
+
+    def get(self, kind: str, document_url: str, path: str = "") -> Optional[CacheEntry]:
+        data_path, meta_path = self._paths(kind, document_url, path)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            value = data_path.read_text(encoding="utf-8")
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        digest = hashlib.sha256(value.encode("utf-8")).hexdigest()
+        if digest != meta.get("sha256"):
+            self._count("misses")
+            return None
+
+        fresh = time.time() - float(meta.get("stored_at", 0)) < self._ttl_seconds
+        self._count("hits" if fresh else "stale")
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return CacheEntry(
+            value=value,
+            fresh=fresh,
+            digest=digest,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            cleaned=bool(meta.get("cleaned")),
+            source=str(meta.get("source", "")),
+        )
+
+    def put(
+        self,
+        kind: str,
+        document_url: str,
+        value: str,
+        path: str = "",
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        cleaned: bool = False,
+        source: str = "",
+    ) -> str:
+        """Store ``value`` and return its content hash."""
+        data_path, meta_path = self._paths(kind, document_url, path)
+        data = value.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        meta = {
+            "kind": kind,
+            "url": document_url,
+            "path": path,
+            "sha256": digest,
+            "stored_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "cleaned": cleaned,
+            "source": source,
+        }
+        try:
+            data_path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write_bytes(data_path, data)
+            _atomic_write_bytes(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as exc:
+            LOG.warning("Failed to write cache entry for %s %s: %s", document_url, path, exc)
+            return digest
+        self._count("stores")
+        self._account(len(data))
+        return digest
+
+    def mark_revalidated(self, kind: str, document_url: str, path: str = "") -> None:
+        """Restart the TTL of an entry the origin confirmed with ``304 Not Modified``."""
+        _data_path, meta_path = self._paths(kind, document_url, path)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            meta["stored_at"] = time.time()
+            _atomic_write_bytes(meta_path, json.dumps(meta).encode("utf-8"))
+        except (OSError, ValueError) as exc:
+            LOG.debug("Failed to refresh cache entry for %s %s: %s", document_url, path, exc)
+            return
+        self._count("revalidated")
+
+    def summary(self) -> str:
+        stats = self.stats
+        lookups = stats.hits + stats.misses + stats.stale
+        ratio = stats.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"{stats.hits} hit(s), {stats.misses} miss(es), {stats.stale} stale, "
+            f"{stats.revalidated} revalidated, {stats.stores} stored, {stats.evictions} evicted "
+            f"({ratio:.0f}% hit rate)"
+        )
+
+    def _paths(self, kind: str, document_url: str, path: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(f"{kind}\0{document_url}\0{path}".encode("utf-8")).hexdigest()
+        directory = self._objects / key[:2]
+        return directory / f"{key}.data", directory / f"{key}.json"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def _account(self, size: int) -> None:
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._disk_usage()
+            else:
+                self._approx_bytes += size
+            over_budget = self._approx_bytes > self._max_bytes
+        if over_budget:
+            self._evict()
+
+    def _disk_usage(self) -> int:
+        total = 0
+        for entry in self._objects.glob("*/*"):
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _evict(self) -> None:
+        with self._exclusive_lock():
+            entries: list[tuple[float, int, Path]] = []
+            total = 0
+            for meta_path in self._objects.glob("*/*.json"):
+                data_path = meta_path.with_suffix(".data")
+                try:
+                    meta_stat = meta_path.stat()
+                    size = meta_stat.st_size + data_path.stat().st_size
+                except OSError:
+                    continue
+                entries.append((meta_stat.st_mtime, size, meta_path))
+                total += size
+
+            target = int(self._max_bytes * 0.9)
+            evicted = 0
+            for _mtime, size, meta_path in sorted(entries):
+                if total <= target:
+                    break
+                meta_path.unlink(missing_ok=True)
+                meta_path.with_suffix(".data").unlink(missing_ok=True)
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._approx_bytes = total
+            self.stats.evictions += evicted
+        if evicted:
+            LOG.info("Evicted %d cache entries to stay under %d bytes", evicted, self._max_bytes)
+
+    @contextmanager
+    def _exclusive_lock(self) -> Iterator[None]:
+        self._root.mkdir(parents=True, exist_ok=True)
+        with open(self._root / ".lock", "a+b") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+class BookCheckpoint:
+    """Resumable per-book download state kept next to the output file.
+
+    ``<output>.parts/manifest.json`` records the book URL, the selected TOC
+    paths and, for every finished component, its file name, SHA-256, ETag,
+    Last-Modified and whether it was already cleaned. Component files and the manifest are
+    written atomically as each component completes, so an interrupted run
+    loses at most the components that were in flight.
+    """
+
+    def __init__(self, output_file: Path, url: str) -> None:
+        self.directory = output_file.with_name(f"{output_file.name}.parts")
+        self._manifest_path = self.directory / "manifest.json"
+        self._url = url
+        self._lock = threading.Lock()
+        self._manifest: dict[str, object] = {"url": url, "toc": [], "components": {}, "complete": False}
+        try:
+            manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            LOG.warning("Ignoring unreadable manifest %s: %s", self._manifest_path, exc)
+            return
+        if manifest.get("url") == url:
+            self._manifest = manifest
+        else:
+            LOG.info("Manifest %s belongs to %s, starting over", self._manifest_path, manifest.get("url"))
+
+    @property
+    def components(self) -> dict[str, dict[str, object]]:
+        return self._manifest["components"]  # type: ignore[return-value]
+
+    @property
+    def complete(self) -> bool:
+        """Whether a previous run finished the book and wrote its output."""
+        return bool(self._manifest.get("complete"))
+
+    def set_toc(self, paths: list[str]) -> None:
+        """Record the current TOC, dropping finished components that are no longer part of it."""
+        with self._lock:
+            wanted = set(paths)
+            for path in [path for path in self.components if path not in wanted]:
+                del self.components[path]
+            if self._manifest.get("toc") != paths:
+                self._manifest["complete"] = False
+            self._manifest["toc"] = list(paths)
+            self._save_manifest()
+        done = sum(1 for path in paths if path in self.components)
+        if done:
+            LOG.info("Resuming %s: %d of %d component(s) already downloaded", self._url, done, len(paths))
+
+    def completed(self, path: str) -> Optional[ComponentPart]:
+        """Return the finished component for ``path`` if its file is intact."""
+        with self._lock:
+            record = self.components.get(path)
+        if record is None:
+            return None
+        try:
+            html = (self.directory / str(record["file"])).read_text(encoding="utf-8")
+        except OSError:
+            return None
+        if hashlib.sha256(html.encode("utf-8")).hexdigest() != record.get("sha256"):
+            LOG.warning("Checkpointed component %s is damaged, fetching it again", path)
+            return None
+        return ComponentPart(
+            index=0,
+            path=path,
+            html=html,
+            cleaned=bool(record.get("cleaned")),
+            etag=record.get("etag"),  # type: ignore[arg-type]
+            last_modified=record.get("last_modified"),  # type: ignore[arg-type]
+            resumed=True,
+        )
+
+    def record(self, part: ComponentPart) -> None:
+        """Write one finished component and its manifest entry atomically."""
+        if part.not_modified:
+            return
+        data = part.content().encode("utf-8")
+        name = hashlib.sha256(part.path.encode("utf-8")).hexdigest()[:20] + ".html"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _atomic_write_bytes(self.directory / name, data)
+            self.components[part.path] = {
+                "status": "done",
+                "file": name,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "cleaned": part.cleaned,
+                "etag": part.etag,
+                "last_modified": part.last_modified,
+            }
+            self._save_manifest()
+
+    def finish(self) -> None:
+        with self._lock:
+            self._manifest["complete"] = True
+            self._save_manifest()
+
+    def _save_manifest(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write_bytes(self._manifest_path, json.dumps(self._manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+
+
+class FetchMetrics:
+    """Phase timings, counters and resource samples for one fetch.
+
+    Phases are recorded when they finish, with their offset from the start of
+    the fetch, their duration and the thread that ran them, so one fetch can
+    be written as a JSON line or as Chrome trace events.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self.phases: list[dict[str, object]] = []
+        self.counters: dict[str, int] = {}
+        self.values: dict[str, object] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[dict[str, object]]:
+        """Time the ``with`` block; fields set on the yielded dict are stored with the phase."""
+        fields: dict[str, object] = {}
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            finished = time.perf_counter()
+            record: dict[str, object] = {
+                "name": name,
+                "start_ms": round((started - self._origin) * 1000, 3),
+                "duration_ms": round((finished - started) * 1000, 3),
+                "thread": threading.get_native_id(),
+            }
+            record.update(fields)
+            with self._lock:
+                self.phases.append(record)
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name: str, value: object) -> None:
+        with self._lock:
+            self.values[name] = value
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self._finished = time.perf_counter()
+        self.set("python_rss", python_rss())
+        if error is not None:
+            self.set("error", error)
+
+    def record(self) -> dict[str, object]:
+        finished = self._finished if self._finished is not None else time.perf_counter()
+        with self._lock:
+            return {
+                "url": self.url,
+                "started_at": round(self.started_at, 3),
+                "total_ms": round((finished - self._origin) * 1000, 3),
+                "phases": list(self.phases),
+                "counters": dict(self.counters),
+                **self.values,
+            }
+
+    def trace_events(self, pid: int = 1) -> list[dict[str, object]]:
+        """Complete ("X") events for chrome://tracing and Perfetto, in microseconds since the epoch."""
+        origin_us = self.started_at * 1_000_000
+        with self._lock:
+            phases = list(self.phases)
+        events: list[dict[str, object]] = []
+        for phase in phases:
+            args = {key: value for key, value in phase.items() if key not in {"name", "start_ms", "duration_ms", "thread"}}
+            args["url"] = self.url
+            events.append(
+                {
+                    "name": phase["name"],
+                    "cat": "dget",
+                    "ph": "X",
+                    "ts": round(origin_us + float(phase["start_ms"]) * 1000),
+                    "dur": round(float(phase["duration_ms"]) * 1000),
+                    "pid": pid,
+                    "tid": phase["thread"],
+                    "args": args,
+                }
+            )
+        return events
+
+
+_METRICS_LOCK = threading.Lock()
+
+
+def write_metrics_line(target: str, metrics: FetchMetrics) -> None:
+    """Append one fetch as a JSON line to ``target`` (``-`` for stderr)."""
+    line = json.dumps(metrics.record(), ensure_ascii=False, default=str) + "\n"
+    with _METRICS_LOCK:
+        if target == "-":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            return
+        path = Path(target)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(line)
+
+
+def write_trace_file(path: Path, metrics: Iterable[FetchMetrics]) -> None:
+    """Write fetch phases as a Chrome trace-event file."""
+    events: list[dict[str, object]] = []
+    for pid, item in enumerate(metrics, start=1):
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": item.url}})
+        events.extend(item.trace_events(pid))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write_bytes(path, json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}).encode("utf-8"))
+
+
+def default_driver_cache_file() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "dget" / "chrome-paths.json"
+
+
+def _file_stamp(path: str) -> Optional[list[int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _binary_version(path: str) -> Optional[str]:
+    try:
+        completed = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10, check=False)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"\d+(?:\.\d+){1,3}", completed.stdout)
+    return match.group(0) if match else None
+
+
+@dataclass(frozen=True)
+class ChromePaths:
+    driver_path: str
+    browser_path: str
+    driver_version: Optional[str]
+    browser_version: Optional[str]
+    selenium_version: str
+    driver_stamp: Optional[list[int]]
+    browser_stamp: Optional[list[int]]
+
+    def valid(self, selenium_version: str) -> bool:
+        """Both binaries are unchanged since they were resolved, under the same selenium release."""
+        return (
+            self.selenium_version == selenium_version
+            and self.driver_stamp is not None
+            and _file_stamp(self.driver_path) == self.driver_stamp
+            and _file_stamp(self.browser_path) == self.browser_stamp
+        )
+
+
+class ChromeResolver:
+    """Resolve chromedriver and Chrome with Selenium Manager once, and cache the result on disk.
+
+    Every ``webdriver.Chrome()`` otherwise runs Selenium Manager, a subprocess
+    that may also check for driver updates online. The cached paths are reused
+    while both binaries keep their size and mtime, so a Chrome or driver update
+    triggers a fresh resolution.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None) -> None:
+        self._cache_file = cache_file or default_driver_cache_file()
+        self._lock = threading.Lock()
+        self._paths: Optional[ChromePaths] = None
+        self._unresolvable = False
+
+    def paths(self) -> Optional[ChromePaths]:
+        """Return validated paths, or ``None`` to let Selenium resolve them itself."""
+        import selenium
+
+        with self._lock:
+            if self._paths is not None and self._paths.valid(selenium.__version__):
+                return self._paths
+            if self._unresolvable:
+                return None
+            self._paths = self._load(selenium.__version__) or self._resolve(selenium.__version__)
+            self._unresolvable = self._paths is None
+            return self._paths
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._paths = None
+            self._cache_file.unlink(missing_ok=True)
+
+    def _load(self, selenium_version: str) -> Optional[ChromePaths]:
+        try:
+            paths = ChromePaths(**json.loads(self._cache_file.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not paths.valid(selenium_version):
+            LOG.debug("Cached Chrome paths in %s are stale", self._cache_file)
+            return None
+        return paths
+
+    def _resolve(self, selenium_version: str) -> Optional[ChromePaths]:
+        from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+        try:
+            output = SeleniumManager().binary_paths(["--browser", "chrome"])
+        except Exception as exc:
+            LOG.debug("Selenium Manager could not resolve Chrome: %s", exc)
+            return None
+        driver_path, browser_path = output.get("driver_path"), output.get("browser_path")
+        if not driver_path or not browser_path:
+            return None
+        paths = ChromePaths(
+            driver_path=driver_path,
+            browser_path=browser_path,
+            driver_version=_binary_version(driver_path),
+            browser_version=_binary_version(browser_path),
+            selenium_version=selenium_version,
+            driver_stamp=_file_stamp(driver_path),
+            browser_stamp=_file_stamp(browser_path),
+        )
+        LOG.info(
+            "Resolved chromedriver %s and Chrome %s, cached in %s",
+            paths.driver_version or "(unknown version)",
+            paths.browser_version or "(unknown version)",
+            self._cache_file,
+        )
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write_bytes(self._cache_file, json.dumps(asdict(paths), indent=2).encode("utf-8"))
+        except OSError as exc:
+            LOG.warning("Failed to write Chrome path cache %s: %s", self._cache_file, exc)
+        return paths
+
+
+class HtmlFetcher:
+    """Fetch rendered HTML using a headless Chrome browser."""
+
+    def __init__(
+        self,
+        timeout_seconds: int = 20,
+        user_agent: Optional[str] = None,
+        min_text_chars: int = 300,
+        max_components: Optional[int] = None,
+        component_concurrency: int = 4,
+        component_retries: int = 2,
+        engine: str = "selenium",
+        clean_in_browser: bool = False,
+        component_min_chars: Optional[int] = None,
+        capture_network: bool = False,
+        lean: bool = False,
+        cache: Optional[ComponentCache] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        cpu_workers: Optional[int] = None,
+        driver_cache: Optional[ChromeResolver] = None,
+        keep_formats: Iterable[str] = ("html", "text"),
+    ) -> None:
+        self._timeout_seconds = timeout_seconds
+        self._user_agent = user_agent
+        self._min_text_chars = min_text_chars
+        self._max_components = max_components
+        self._component_concurrency = component_concurrency
+        self._component_retries = component_retries
+        self._engine = engine
+        self._clean_in_browser = clean_in_browser
+        self._component_min_chars = min_text_chars if component_min_chars is None else component_min_chars
+        self._component_min_chars_explicit = component_min_chars is not None
+        self._capture_network = capture_network
+        self._lean = lean
+        self._cache = cache
+        self._rate_limiter = rate_limiter
+        self._postprocessor = ComponentPostProcessor(cpu_workers)
+        self._chrome = driver_cache
+        self._keep_formats = frozenset(keep_formats)
+        self._local = threading.local()
+        self._http_client = HttpComponentClient(
+            timeout_seconds=timeout_seconds,
+            user_agent=user_agent,
+            concurrency=component_concurrency,
+            retries=component_retries,
+            rate_limiter=rate_limiter,
+        )
+
+    @property
+    def cache(self) -> Optional[ComponentCache]:
+        return self._cache
+
+    @property
+    def postprocessor(self) -> ComponentPostProcessor:
+        return self._postprocessor
+
+    def close(self) -> None:
+        """Stop the post-processing worker processes and the HTTP client threads."""
+        self._postprocessor.close()
+        self._http_client.close()
+
+    def with_overrides(
+        self,
+        timeout_seconds: Optional[int] = None,
+        min_text_chars: Optional[int] = None,
+    ) -> HtmlFetcher:
+        """Return a copy with per-request limits that shares the HTTP client, cache and driver settings."""
+        fetcher = copy.copy(self)
+        if timeout_seconds is not None:
+            fetcher._timeout_seconds = timeout_seconds
+        if min_text_chars is not None:
+            fetcher._min_text_chars = min_text_chars
+            if not self._component_min_chars_explicit:
+                fetcher._component_min_chars = min_text_chars
+        return fetcher
+
+    def fetch(
+        self,
+        url: str,
+        pool: Optional[DriverPool] = None,
+        checkpoint: Optional[BookCheckpoint] = None,
+        metrics: Optional[FetchMetrics] = None,
+    ) -> DocumentSnapshot:
+        """Fetch ``url``; when ``metrics`` is given, every phase of the fetch is recorded in it."""
+        self._local.metrics = metrics
+        try:
+            snapshot = self._fetch(url, pool, checkpoint).keeping(self._keep_formats)
+        finally:
+            self._local.metrics = None
+        if metrics is not None:
+            metrics.set("context", snapshot.context)
+            metrics.set("chunks", max(len(snapshot.html_chunks), len(snapshot.text_chunks)))
+            if "html" in self._keep_formats:
+                metrics.set("html_chars", sum(len(chunk) for chunk in snapshot.html_chunks))
+            metrics.set("text_chars", snapshot.text_length)
+        return snapshot
+
+    def _fetch(
+        self,
+        url: str,
+        pool: Optional[DriverPool],
+        checkpoint: Optional[BookCheckpoint],
+    ) -> DocumentSnapshot:
+        if self._cache is not None:
+            with self._phase("cache_lookup") as phase:
+                snapshot = self._snapshot_from_cache(url, checkpoint)
+                phase["hit"] = snapshot is not None
+            if snapshot is not None:
+                return snapshot
+
+        if self._engine == "http":
+            with self._phase("http_engine") as phase:
+                snapshot = self._fetch_over_http(url, checkpoint)
+                phase["succeeded"] = snapshot is not None
+            if snapshot is not None:
+                return snapshot
+            LOG.info("HTTP engine could not fetch the book, falling back to Selenium")
+
+        if pool is not None:
+            with ExitStack() as stack:
+                with self._phase("driver_acquire"):
+                    driver = stack.enter_context(pool.driver())
+                return self._fetch_with_driver(driver, url, checkpoint)
+
+        with self._phase("driver_start"):
+            driver = self._start_driver()
+        try:
+            return self._fetch_with_driver(driver, url, checkpoint)
+        finally:
+            with self._phase("driver_quit"):
+                driver.quit()
+
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[dict[str, object]]:
+        metrics: Optional[FetchMetrics] = getattr(self._local, "metrics", None)
+        if metrics is None:
+            yield {}
+            return
+        with metrics.phase(name) as fields:
+            yield fields
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        metrics: Optional[FetchMetrics] = getattr(self._local, "metrics", None)
+        if metrics is not None:
+            metrics.add(name, amount)
+
+    def driver_pool(self, size: int = 1, max_pages_per_driver: int = 50) -> DriverPool:
+        return DriverPool(
+            self._start_driver,
+            size=size,
+            max_pages_per_driver=max_pages_per_driver,
+        )
+
+    def fetch_many(
+        self,
+        urls: Iterable[str],
+        workers: int = 1,
+        restart_after: int = 50,
+        checkpoints: Optional[dict[int, BookCheckpoint]] = None,
+        profile: bool = False,
+        per_host: Optional[int] = None,
+        retries: int = 1,
+    ) -> Iterator[BatchResult]:
+        """Fetch many URLs through a ``BookScheduler``, yielding results as they finish.
+
+        With ``profile``, each result carries the unfinished ``FetchMetrics`` of its fetch.
+        """
+        scheduler = BookScheduler(
+            self,
+            workers=workers,
+            restart_after=restart_after,
+            per_host=per_host,
+            retries=retries,
+            checkpoints=checkpoints,
+            profile=profile,
+        )
+        return scheduler.results(BookJob(index, url) for index, url in enumerate(urls))
+
+    def _fetch_result(
+        self,
+        index: int,
+        url: str,
+        pool: DriverPool,
+        checkpoint: Optional[BookCheckpoint] = None,
+        metrics: Optional[FetchMetrics] = None,
+    ) -> BatchResult:
+        started = time.monotonic()
+        try:
+            snapshot = self.fetch(url, pool=pool, checkpoint=checkpoint, metrics=metrics)
+        except Exception as exc:
+            LOG.error("Failed to fetch %s: %s", url, exc)
+            error = str(exc) or type(exc).__name__
+            if metrics is not None:
+                metrics.set("error", error)
+            return BatchResult(index, url, None, error, time.monotonic() - started, metrics)
+        return BatchResult(index, url, snapshot, None, time.monotonic() - started, metrics)
+
+    def _snapshot_from_cache(
+        self,
+        url: str,
+        checkpoint: Optional[BookCheckpoint] = None,
+    ) -> Optional[DocumentSnapshot]:
+        """Build the book from fresh cache entries alone, without any network access."""
+        toc = self._cached_toc(url)
+        if toc is None:
+            return None
+        chapter_paths, labels = toc
+        selected_paths = self._selected_component_paths(chapter_paths)
+        if not selected_paths:
+            return None
+        with ChunkSpool() as spool:
+            parts: list[ComponentPart] = []
+            for index, path in enumerate(selected_paths):
+                entry = self._cache.get("component", url, path) if self._cache else None
+                if entry is None or not entry.fresh:
+                    return None
+                parts.append(replace(self._part_from_cache(url, path, entry), index=index).spilled(spool))
+            if checkpoint is not None:
+                checkpoint.set_toc(selected_paths)
+                for part in parts:
+                    if part.path not in checkpoint.components:
+                        checkpoint.record(part)
+            snapshot = self._snapshot_from_parts(parts, len(selected_paths), "component-cache", url, labels)
+        if snapshot is not None:
+            LOG.info("Served %s entirely from the cache", url)
+        return snapshot
+
+    def _cached_toc(self, url: str) -> Optional[tuple[list[str], dict[str, str]]]:
+        """Cached TOC paths and labels; entries written before labels were kept are a plain path list."""
+        entry = self._cache.get("toc", url) if self._cache else None
+        if entry is None or not entry.fresh:
+            return None
+        toc = json.loads(entry.value)
+        if isinstance(toc, list):
+            return [str(path) for path in toc], {}
+        return [str(path) for path in toc["paths"]], {str(path): str(label) for path, label in toc["labels"].items()}
+
+    def _remember_toc(self, url: str, chapter_paths: list[str], labels: dict[str, str]) -> None:
+        if self._cache is not None and chapter_paths:
+            toc = {"paths": chapter_paths, "labels": labels}
+            self._cache.put("toc", url, json.dumps(toc, ensure_ascii=False))
+
+    def _part_from_cache(self, url: str, path: str, entry: CacheEntry) -> ComponentPart:
+        text_entry = self._cache.get("text", url, path) if self._cache else None
+        text = text_entry.value if text_entry is not None and text_entry.source == entry.digest else None
+        return ComponentPart(
+            index=0,
+            path=path,
+            html=entry.value,
+            cleaned=entry.cleaned,
+            text=text,
+            etag=entry.etag,
+            last_modified=entry.last_modified,
+            cached=True,
+        )
+
+    def _component_parts(
+        self,
+        url: str,
+        paths: list[str],
+        fetch_missing: Callable[
+            [
+                list[str],
+                dict[str, tuple[Optional[str], Optional[str]]],
+                Optional[Callable[[ComponentPart], None]],
+            ],
+            list[ComponentPart],
+        ],
+        checkpoint: Optional[BookCheckpoint] = None,
+        spool: Optional[ChunkSpool] = None,
+    ) -> list[ComponentPart]:
+        """Reuse checkpointed and fresh cached components, fetch or revalidate the rest, and keep TOC order.
+
+        Checkpointed components of an interrupted run are reused as they are.
+        Once the book was finished, or when the cache entry has gone stale,
+        they are revalidated with a conditional request like stale cache entries.
+        With ``spool``, every returned part has its HTML in the spool, not in memory.
+        """
+        parts_by_path: dict[str, ComponentPart] = {}
+        stale: dict[str, ComponentPart] = {}
+        resumed: dict[str, ComponentPart] = {}
+        finished = checkpoint is not None and checkpoint.complete
+        if checkpoint is not None:
+            checkpoint.set_toc(paths)
+        for path in paths:
+            entry = self._cache.get("component", url, path) if self._cache else None
+            part = checkpoint.completed(path) if checkpoint is not None else None
+            if entry is not None and entry.fresh:
+                parts_by_path[path] = self._part_from_cache(url, path, entry).spilled(spool)
+                if checkpoint is not None and part is None:
+                    checkpoint.record(parts_by_path[path])
+                continue
+            if entry is not None:
+                stale[path] = self._part_from_cache(url, path, entry).spilled(spool)
+            if part is None:
+                continue
+            if not finished and entry is None:
+                parts_by_path[path] = part.spilled(spool)
+            elif part.etag or part.last_modified:
+                resumed[path] = part.spilled(spool)
+
+        missing_paths = [path for path in paths if path not in parts_by_path]
+        self._count("components_reused", len(paths) - len(missing_paths))
+        if missing_paths:
+            validators = {path: (part.etag, part.last_modified) for path, part in stale.items()}
+            validators.update((path, (part.etag, part.last_modified)) for path, part in resumed.items())
+            on_part = checkpoint.record if checkpoint is not None else None
+            with self._phase("component_fetch") as phase:
+                fetched = fetch_missing(missing_paths, validators, on_part)
+                phase["requested"] = len(missing_paths)
+                phase["received"] = len(fetched)
+            self._count("components_fetched", len(fetched))
+            self._count("component_bytes", sum(part.size for part in fetched))
+            for part in fetched:
+                if part.not_modified and part.path in resumed:
+                    previous = resumed[part.path]
+                    part = replace(
+                        previous,
+                        etag=part.etag or previous.etag,
+                        last_modified=part.last_modified or previous.last_modified,
+                        resumed=False,
+                    )
+                elif part.not_modified and part.path in stale and self._cache is not None:
+                    self._cache.mark_revalidated("component", url, part.path)
+                    part = stale[part.path]
+                    if checkpoint is not None:
+                        checkpoint.record(part)
+                parts_by_path[part.path] = part.spilled(spool)
+
+        return [replace(parts_by_path[path], index=index) for index, path in enumerate(paths) if path in parts_by_path]
+
+    def _fetch_over_http(self, url: str, checkpoint: Optional[BookCheckpoint] = None) -> Optional[DocumentSnapshot]:
+        with ChunkSpool() as spool:
+            snapshot = self._snapshot_over_http(url, checkpoint, spool)
+        if snapshot is None:
+            return None
+        with self._phase("cleanup"):
+            snapshot = self._without_page_number_spans(snapshot)
+        if snapshot.text_length < self._min_text_chars:
+            LOG.info("HTTP engine returned only %d text chars", snapshot.text_length)
+            return None
+        return snapshot
+
+    def _snapshot_over_http(
+        self,
+        url: str,
+        checkpoint: Optional[BookCheckpoint],
+        spool: ChunkSpool,
+    ) -> Optional[DocumentSnapshot]:
+        """Fetch the TOC and the components with the HTTP client, raw HTML going to ``spool``."""
+        try:
+            document_url = url
+            toc = self._cached_toc(url)
+            if toc is None:
+                with self._phase("http_document"):
+                    document_url, chapter_paths, labels = self._http_client.fetch_document(url)
+                self._remember_toc(url, chapter_paths, labels)
+            else:
+                chapter_paths, labels = toc
+            selected_paths = self._selected_component_paths(chapter_paths)
+            if not selected_paths:
+                LOG.info("No table of contents found in the server response")
+                return None
+            parts = self._component_parts(
+                url,
+                selected_paths,
+                lambda missing, validators, on_part: self._http_client.fetch_components(
+                    document_url, missing, validators, on_part, spool
+                ),
+                checkpoint,
+                spool,
+            )
+        except Exception as exc:
+            LOG.warning("HTTP engine failed: %s", exc)
+            return None
+        return self._snapshot_from_parts(parts, len(selected_paths), "component-http", url, labels)
+
+    def _start_driver(self) -> webdriver.Chrome:
+        from selenium.common.exceptions import WebDriverException
+
+        paths = self._chrome.paths() if self._chrome is not None else None
+        try:
+            driver = self._launch_chrome(paths)
+        except WebDriverException as exc:
+            if paths is None:
+                raise RuntimeError("Failed to start Chrome WebDriver") from exc
+            LOG.warning("Chrome failed to start from the cached driver paths, resolving again: %s", exc)
+            self._chrome.invalidate()
+            try:
+                driver = self._launch_chrome(None)
+            except WebDriverException as retry_exc:
+                raise RuntimeError("Failed to start Chrome WebDriver") from retry_exc
+        if self._lean:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(_LEAN_BLOCKED_URL_PATTERNS)})
+            except Exception as exc:
+                LOG.warning("Failed to install lean resource blocking: %s", exc)
+        return driver
+
+    def _launch_chrome(self, paths: Optional[ChromePaths]) -> webdriver.Chrome:
+        """Start Chrome; with resolved ``paths`` Selenium Manager is not run."""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        options = self._build_options()
+        if paths is None:
+            return webdriver.Chrome(options=options)
+        options.binary_location = paths.browser_path
+        return webdriver.Chrome(options=options, service=Service(executable_path=paths.driver_path))
+
+    def _fetch_with_driver(
+        self,
+        driver: webdriver.Chrome,
+        url: str,
+        checkpoint: Optional[BookCheckpoint] = None,
+    ) -> DocumentSnapshot:
+        if self._capture_network:
+            self._discard_performance_log(driver)
+        with self._phase("navigate"):
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(url)
+            driver.get(url)
+        deadline = time.monotonic() + self._timeout_seconds
+        self._timed_wait(driver, "runtime", deadline)
+        with self._phase("activate_view"):
+            self._activate_book_content_view(driver)
+        self._timed_wait(driver, "text", deadline)
+        with self._phase("components"):
+            component_snapshot = self._snapshot_from_component_endpoints(driver, url, checkpoint)
+        if component_snapshot and component_snapshot.text_length >= self._component_min_chars:
+            LOG.info("Component snapshot is long enough, skipping frame collection")
+            best_snapshot = component_snapshot
+        else:
+            with self._phase("collect_candidates") as phase:
+                candidates = self._collect_candidates(driver)
+                phase["candidates"] = len(candidates)
+            self._count("candidates", len(candidates))
+            component_candidate = None
+            if component_snapshot:
+                component_candidate = self._candidate_for_snapshot(component_snapshot)
+                candidates.append(component_candidate)
+            best_candidate = max(candidates, key=self._snapshot_score)
+            LOG.debug("Scored %d candidate(s), best is %s", len(candidates), best_candidate.context)
+            if component_snapshot and best_candidate is component_candidate:
+                best_snapshot = component_snapshot
+            else:
+                with self._phase("materialize") as phase:
+                    best_snapshot = self._materialize_candidate(driver, best_candidate)
+                    phase["context"] = best_candidate.context
+        with self._phase("cleanup"):
+            best_snapshot = self._without_page_number_spans(best_snapshot)
+        self._record_browser_usage(driver)
+        LOG.info(
+            "Selected rendered context '%s' with %d text chars",
+            best_snapshot.context,
+            best_snapshot.text_length,
+        )
+        return best_snapshot
+
+    def _timed_wait(self, driver: webdriver.Chrome, stage: str, deadline: float) -> str:
+        with self._phase(f"wait_{stage}") as phase:
+            condition = self._wait_until_ready(driver, stage, deadline)
+            phase["condition"] = condition
+        if condition in {"timeout", "error"}:
+            self._count("wait_timeouts")
+        return condition
+
+    def _record_browser_usage(self, driver: webdriver.Chrome) -> None:
+        """Store bytes the page transferred (Resource Timing) and Chrome's RSS when profiling."""
+        metrics: Optional[FetchMetrics] = getattr(self._local, "metrics", None)
+        if metrics is None:
+            return
+        try:
+            usage = driver.execute_script(
+                """
+                const entries = performance.getEntriesByType('navigation')
+                    .concat(performance.getEntriesByType('resource'));
+                let transferred = 0;
+                for (const entry of entries) transferred += entry.transferSize || 0;
+                return { transferred, requests: entries.length };
+                """
+            )
+            metrics.add("page_transfer_bytes", int(usage.get("transferred", 0)))
+            metrics.add("page_requests", int(usage.get("requests", 0)))
+        except Exception as exc:
+            LOG.debug("Failed to read resource timing: %s", exc)
+        metrics.set("chrome_rss", chrome_rss(driver))
+
+    def _discard_performance_log(self, driver: webdriver.Chrome) -> None:
+        try:
+            driver.get_log("performance")
+        except Exception as exc:
+            LOG.debug("Failed to drain the performance log: %s", exc)
+
+    def _wait_until_ready(self, driver: webdriver.Chrome, stage: str, deadline: float) -> str:
+        """Wait for a readiness condition driven by DOM mutations and frame load events.
+
+        ``stage`` is ``"runtime"`` (EpubReader and its reader iframe exist) or
+        ``"text"`` (a reader iframe or reader container shows ``min_text_chars``
+        visible characters; hidden subtrees such as the TOC do not count).
+        Returns the name of the condition that fired, or ``"timeout"`` once
+        ``deadline`` passes.
+        """
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        driver.set_script_timeout(remaining_ms / 1000 + 5)
+        try:
+            result: dict[str, object] = dict(
+                driver.execute_async_script(
+                    """
+                    const [stage, minChars, timeoutMs] = arguments;
+                    const done = arguments[arguments.length - 1];
+                    const started = performance.now();
+                    const selectors = [
+                        '#reader .monelem_component',
+                        '#reader .monelem_page',
+                        '#reader',
+                        '.monelem_page',
+                        '.monelem_sheaf',
+                        '.monelem_component',
+                        'article',
+                        'main',
+                        '#content',
+                        '.content',
+                        '.chapter',
+                        '.text'
+                    ].join(',');
+                    const observers = [];
+                    const listeners = [];
+                    const watchedDocs = new WeakSet();
+                    const watchedFrames = new WeakSet();
+                    let finished = false;
+                    let pending = null;
+                    let readerText = 0;
+                    let documentText = 0;
+
+                    const skippedTags = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE']);
+                    const isHidden = (element) => {
+                        if (element.hidden || skippedTags.has(element.tagName)) return true;
+                        const view = element.ownerDocument.defaultView;
+                        return !!view && view.getComputedStyle(element).display === 'none';
+                    };
+                    // Visible characters under root, stopping once minChars are found.
+                    const textLength = (root) => {
+                        if (!root || isHidden(root)) return 0;
+                        const walker = root.ownerDocument.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+                            acceptNode: (node) => (node.nodeType === Node.ELEMENT_NODE && isHidden(node)
+                                ? NodeFilter.FILTER_REJECT
+                                : NodeFilter.FILTER_ACCEPT)
+                        });
+                        let length = 0;
+                        while (length < minChars && walker.nextNode()) {
+                            if (walker.currentNode.nodeType === Node.TEXT_NODE) length += walker.currentNode.data.trim().length;
+                        }
+                        return length;
+                    };
+                    const bodyTextLength = (doc) => (doc && doc.body ? textLength(doc.body) : 0);
+                    const frameDocs = (doc) => {
+                        const docs = [];
+                        for (const frame of doc.querySelectorAll('iframe')) {
+                            try {
+                                if (frame.contentDocument) docs.push([frame, frame.contentDocument]);
+                            } catch (_err) {
+                            }
+                        }
+                        return docs;
+                    };
+                    // Reader containers anywhere, and whole bodies of framed documents only.
+                    const documentTextLength = (doc, depth) => {
+                        if (!doc || depth > 4) return 0;
+                        let best = depth > 0 ? bodyTextLength(doc) : 0;
+                        for (const node of doc.querySelectorAll(selectors)) {
+                            best = Math.max(best, textLength(node));
+                        }
+                        for (const [, childDoc] of frameDocs(doc)) {
+                            best = Math.max(best, documentTextLength(childDoc, depth + 1));
+                        }
+                        return best;
+                    };
+                    const readerFrameTextLength = () => {
+                        let best = 0;
+                        for (const frame of document.querySelectorAll('#reader iframe.monelem_component')) {
+                            try {
+                                best = Math.max(best, bodyTextLength(frame.contentDocument));
+                            } catch (_err) {
+                            }
+                        }
+                        return best;
+                    };
+                    const runtimeReady = () => typeof window.EpubReader !== 'undefined'
+                        && !!document.querySelector('#reader')
+                        && !!document.querySelector('#reader iframe.monelem_component');
+
+                    const finish = (condition) => {
+                        if (finished) return;
+                        finished = true;
+                        observers.forEach((observer) => observer.disconnect());
+                        listeners.forEach(([target, listener]) => target.removeEventListener('load', listener));
+                        clearTimeout(pending);
+                        clearTimeout(deadlineTimer);
+                        clearInterval(safetyTimer);
+                        done({
+                            condition,
+                            elapsedMs: Math.round(performance.now() - started),
+                            readerText,
+                            documentText
+                        });
+                    };
+                    const watch = (doc, depth) => {
+                        if (!doc || depth > 4) return;
+                        if (!watchedDocs.has(doc) && doc.documentElement) {
+                            watchedDocs.add(doc);
+                            const observer = new MutationObserver(schedule);
+                            observer.observe(doc.documentElement, { childList: true, subtree: true, characterData: true });
+                            observers.push(observer);
+                        }
+                        for (const [frame, childDoc] of frameDocs(doc)) {
+                            if (!watchedFrames.has(frame)) {
+                                watchedFrames.add(frame);
+                                const listener = () => {
+                                    if (finished) return;
+                                    watch(doc, depth);
+                                    schedule();
+                                };
+                                frame.addEventListener('load', listener);
+                                listeners.push([frame, listener]);
+                            }
+                            watch(childDoc, depth + 1);
+                        }
+                    };
+                    const check = () => {
+                        pending = null;
+                        if (finished) return;
+                        watch(document, 0);
+                        if (stage === 'runtime') {
+                            if (runtimeReady()) finish('epub-runtime');
+                            return;
+                        }
+                        readerText = readerFrameTextLength();
+                        if (readerText >= minChars) return finish('reader-iframe-text');
+                        documentText = Math.max(readerText, documentTextLength(document, 0));
+                        if (documentText >= minChars) return finish('reader-text');
+                    };
+                    function schedule() {
+                        if (!finished && pending === null) pending = setTimeout(check, 50);
+                    }
+
+                    const deadlineTimer = setTimeout(() => finish('timeout'), timeoutMs);
+                    const safetyTimer = setInterval(schedule, 1000);
+                    window.addEventListener('load', schedule);
+                    listeners.push([window, schedule]);
+                    check();
+                    """,
+                    stage,
+                    self._min_text_chars,
+                    remaining_ms,
+                )
+            )
+        except Exception as exc:
+            LOG.warning("Readiness wait for %s failed: %s", stage, exc)
+            return "error"
+
+        condition = str(result.get("condition", "timeout"))
+        if condition == "timeout":
+            if stage == "runtime":
+                LOG.warning("Timed out waiting for EpubReader runtime initialization")
+            else:
+                LOG.warning(
+                    "Timed out waiting for %d rendered text chars (reader iframe %s, max observed %s)",
+                    self._min_text_chars,
+                    result.get("readerText"),
+                    result.get("documentText"),
+                )
+        else:
+            LOG.debug("Readiness stage %s resolved by %s after %s ms", stage, condition, result.get("elapsedMs"))
+        return condition
+
+    def _snapshot_score(self, candidate: SnapshotCandidate) -> tuple[int, int, int, int]:
+        iframe_bonus = 1 if "iframe" in candidate.context else 0
+        component_bonus = (
+            2
+            if candidate.context.startswith("component") and candidate.text_length >= self._component_min_chars
+            else 0
+        )
+        prose_bonus = 1 if candidate.has_prose else 0
+        score = candidate.text_length - (2000 if candidate.has_metadata else 0)
+        return (component_bonus, prose_bonus, iframe_bonus, score)
+
+    def _candidate_for_snapshot(self, snapshot: DocumentSnapshot) -> SnapshotCandidate:
+        text = snapshot.text if snapshot.text_chunks or not snapshot.html_chunks else extract_text(snapshot.html)
+        lowered = text.lower()
+        return SnapshotCandidate(
+            context=snapshot.context,
+            text_length=snapshot.text_length,
+            has_metadata=all(keyword in lowered for keyword in _METADATA_KEYWORDS),
+            has_prose=any(keyword in lowered for keyword in _PROSE_KEYWORDS),
+        )
+
+    def _snapshot_from_component_endpoints(
+        self,
+        driver: webdriver.Chrome,
+        url: str,
+        checkpoint: Optional[BookCheckpoint] = None,
+    ) -> Optional[DocumentSnapshot]:
+        with self._phase("toc") as phase:
+            chapter_paths, labels = self._chapter_component_toc(driver)
+            phase["chapters"] = len(chapter_paths)
+        self._remember_toc(url, chapter_paths, labels)
+        selected_paths = self._selected_component_paths(chapter_paths)
+        if not selected_paths:
+            return None
+
+        with ChunkSpool() as spool:
+            parts = self._component_parts(
+                url,
+                selected_paths,
+                lambda missing, validators, on_part: self._fetch_components_in_browser(
+                    driver, missing, validators, on_part, spool
+                ),
+                checkpoint,
+                spool,
+            )
+            return self._snapshot_from_parts(parts, len(selected_paths), "component-api", url, labels)
+
+    def _fetch_components_in_browser(
+        self,
+        driver: webdriver.Chrome,
+        paths: list[str],
+        validators: dict[str, tuple[Optional[str], Optional[str]]],
+        on_part: Optional[Callable[[ComponentPart], None]] = None,
+        spool: Optional[ChunkSpool] = None,
+    ) -> list[ComponentPart]:
+        parts: list[ComponentPart] = []
+        if self._capture_network:
+            for part in self._captured_component_parts(driver, paths).values():
+                if on_part is not None:
+                    on_part(part)
+                parts.append(part.spilled(spool))
+        captured = {part.path for part in parts}
+        missing_paths = [path for path in paths if path not in captured]
+        if missing_paths:
+            parts.extend(self._fetch_component_parts(driver, missing_paths, validators, on_part, spool))
+        return parts
+
+    def _captured_component_parts(self, driver: webdriver.Chrome, paths: list[str]) -> dict[str, ComponentPart]:
+        """Reuse component responses the reader already downloaded, read from Chrome's performance log."""
+        wanted = {urldefrag(urljoin(driver.current_url, path)).url: path for path in paths}
+        request_ids: dict[str, str] = {}
+        try:
+            entries = driver.get_log("performance")
+        except Exception as exc:
+            LOG.warning("Network capture is unavailable: %s", exc)
+            return {}
+        for entry in entries:
+            message = json.loads(entry["message"]).get("message", {})
+            if message.get("method") != "Network.responseReceived":
+                continue
+            params = message.get("params", {})
+            response = params.get("response", {})
+            path = wanted.get(urldefrag(str(response.get("url", ""))).url)
+            if path and response.get("status") == 200:
+                request_ids[path] = params["requestId"]
+
+        parts: dict[str, ComponentPart] = {}
+        for index, (path, request_id) in enumerate(request_ids.items()):
+            try:
+                result = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except Exception as exc:
+                LOG.debug("Captured body for %s is no longer available: %s", path, exc)
+                continue
+            body = str(result.get("body", ""))
+            if result.get("base64Encoded"):
+                body = base64.b64decode(body).decode("utf-8", errors="replace")
+            if body:
+                parts[path] = ComponentPart(index=index, path=path, html=body)
+        LOG.info("Captured %d of %d chapter component(s) from the network log", len(parts), len(paths))
+        return parts
+
+    def _snapshot_from_parts(
+        self,
+        parts: list[ComponentPart],
+        expected: int,
+        context: str,
+        url: str,
+        labels: Optional[dict[str, str]] = None,
+    ) -> Optional[DocumentSnapshot]:
+        """Clean the parts into a snapshot whose chunks are spooled to disk as each one is ready.
+
+        ``labels`` maps component paths to their TOC labels, kept as chunk titles.
+        """
+        html_spool = ChunkSpool() if "html" in self._keep_formats else None
+        text_spool = ChunkSpool() if "text" in self._keep_formats else None
+        titles: list[str] = []
+        chunks = 0
+        text_chars = 0
+        with self._phase("clean_extract") as phase:
+            for path, html, text in self._clean_and_extract(parts, url):
+                chunks += 1
+                text_chars += len(text)
+                titles.append((labels or {}).get(path, ""))
+                if html_spool is not None:
+                    html_spool.append(html)
+                if text_spool is not None:
+                    text_spool.append(text)
+            phase["components"] = len(parts)
+        if not chunks:
+            return None
+
+        snapshot = DocumentSnapshot(
+            html_chunks=html_spool if html_spool is not None else (),
+            text_chunks=text_spool if text_spool is not None else (),
+            context=context,
+            cleaned=True,
+            text_chars=text_chars + chunks - 1,
+            titles=tuple(titles),
+        )
+        LOG.info(
+            "Fetched %d of %d chapter component(s) via /rest endpoint (%d text chars)",
+            chunks,
+            expected,
+            snapshot.text_length,
+        )
+        return snapshot
+
+    def _clean_and_extract(self, parts: list[ComponentPart], url: str) -> Iterator[tuple[str, str, str]]:
+        """Clean and extract every part (in worker processes for big books) and yield ``(path, html, text)``.
+
+        Parts come out in TOC order, and parts without text are skipped. Parts
+        are read and results consumed one at a time, so only a few chapters are
+        in memory at once.
+        """
+        unprocessed = [part for part in parts if not part.has_text or not part.cleaned]
+        processed = self._postprocessor.map(
+            _postprocess_component,
+            _PartHtml(unprocessed),
+            [part.cleaned for part in unprocessed],
+            total_bytes=sum(part.size for part in unprocessed),
+        )
+        for part in parts:
+            if not part.has_text or not part.cleaned:
+                html, text = next(processed)
+                known_text = part.extracted_text()
+                text = known_text if known_text is not None else text
+            else:
+                html, text = part.content(), part.extracted_text() or ""
+            if self._cache is not None and not part.cached and not part.resumed:
+                digest = self._cache.put(
+                    "component",
+                    url,
+                    html,
+                    path=part.path,
+                    etag=part.etag,
+                    last_modified=part.last_modified,
+                    cleaned=True,
+                )
+                self._cache.put("text", url, text, path=part.path, source=digest)
+            if text:
+                yield part.path, html, text
+
+    def _selected_component_paths(self, chapter_paths: list[str]) -> list[str]:
+        selected_paths: list[str] = []
+        for path in dict.fromkeys(chapter_paths):
+            if "szerzoseg" in path.lower():
+                continue
+            selected_paths.append(path)
+            if self._max_components is not None and len(selected_paths) >= self._max_components:
+                break
+        return selected_paths
+
+    def _fetch_component_parts(
+        self,
+        driver: webdriver.Chrome,
+        paths: list[str],
+        validators: Optional[dict[str, tuple[Optional[str], Optional[str]]]] = None,
+        on_part: Optional[Callable[[ComponentPart], None]] = None,
+        spool: Optional[ChunkSpool] = None,
+    ) -> list[ComponentPart]:
+        """Fetch components in bounded chunks so neither the tab nor Python holds more than one chunk of HTML.
+
+        ``on_part`` is called for each component as its chunk completes, and
+        the component HTML is then moved into ``spool``.
+        """
+        concurrency = max(1, self._component_concurrency)
+        rounds_per_chunk = 4
+        chunk_size = concurrency * rounds_per_chunk
+        attempt_seconds = self._timeout_seconds + 4
+        driver.set_script_timeout(rounds_per_chunk * (self._component_retries + 1) * attempt_seconds + 5)
+
+        parts: list[ComponentPart] = []
+        failed: list[str] = []
+        for start in range(0, len(paths), chunk_size):
+            chunk = paths[start : start + chunk_size]
+            chunk_validators = [
+                list(validators[path]) if validators and path in validators else None for path in chunk
+            ]
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(driver.current_url, len(chunk))
+            try:
+                results = self._fetch_component_chunk(driver, chunk, chunk_validators, concurrency)
+            except Exception as exc:
+                LOG.warning("Failed to fetch chapter components %d-%d: %s", start, start + len(chunk) - 1, exc)
+                failed.extend(chunk)
+                continue
+            for offset, result in enumerate(results):
+                path = chunk[offset]
+                if result.get("error"):
+                    LOG.debug("Chapter component %s failed: %s", path, result["error"])
+                    failed.append(path)
+                    continue
+                if not result.get("hasText") and not result.get("notModified"):
+                    continue
+                part = ComponentPart(
+                    index=start + offset,
+                    path=path,
+                    html=str(result["html"]),
+                    cleaned=self._clean_in_browser,
+                    etag=result.get("etag"),
+                    last_modified=result.get("lastModified"),
+                    not_modified=bool(result.get("notModified")),
+                )
+                if on_part is not None:
+                    on_part(part)
+                parts.append(part.spilled(spool))
+
+        if failed:
+            LOG.warning(
+                "Failed to fetch %d of %d chapter component(s): %s",
+                len(failed),
+                len(paths),
+                ", ".join(failed[:5]) + (" ..." if len(failed) > 5 else ""),
+            )
+        return parts
+
+    def _fetch_component_chunk(
+        self,
+        driver: webdriver.Chrome,
+        paths: list[str],
+        validators: list[Optional[list[Optional[str]]]],
+        concurrency: int,
+    ) -> list[dict[str, object]]:
+        return list(
+            driver.execute_async_script(
+                """
+                const [paths, validators, concurrency, retries, timeoutMs, cleanInBrowser] = arguments;
+                const done = arguments[arguments.length - 1];
+                const results = new Array(paths.length);
+                const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+                const fetchOne = async (path, validator) => {
+                    const headers = {};
+                    if (validator && validator[0]) headers['If-None-Match'] = validator[0];
+                    if (validator && validator[1]) headers['If-Modified-Since'] = validator[1];
+                    let error = '';
+                    for (let attempt = 0; attempt <= retries; attempt++) {
+                        if (attempt > 0) {
+                            const backoff = Math.min(4000, 250 * 2 ** (attempt - 1));
+                            await sleep(backoff * (0.5 + Math.random()));
+                        }
+                        try {
+                            const response = await fetch(path, {
+                                credentials: 'include',
+                                headers,
+                                signal: AbortSignal.timeout(timeoutMs),
+                            });
+                            if (response.status === 304) {
+                                return { html: '', hasText: false, notModified: true, error: '' };
+                            }
+                            if (response.ok) {
+                                const markup = await response.text();
+                                const doc = new DOMParser().parseFromString(markup, 'text/html');
+                                if (cleanInBrowser) {
+                                    doc.querySelectorAll('.oldaltores').forEach((node) => node.remove());
+                                    doc.querySelectorAll('a[name^="DIAPage"]').forEach((node) => node.remove());
+                                }
+                                const hasText = !!(doc.body && doc.body.textContent.trim());
+                                const html = doc.documentElement ? doc.documentElement.outerHTML : markup;
+                                return {
+                                    html,
+                                    hasText,
+                                    etag: response.headers.get('ETag'),
+                                    lastModified: response.headers.get('Last-Modified'),
+                                    error: ''
+                                };
+                            }
+                            error = 'HTTP ' + response.status;
+                            if (response.status < 500 && response.status !== 429) break;
+                        } catch (err) {
+                            error = String(err);
+                        }
+                    }
+                    return { html: '', hasText: false, error };
+                };
+
+                let next = 0;
+                const worker = async () => {
+                    while (next < paths.length) {
+                        const index = next++;
+                        results[index] = await fetchOne(paths[index], validators[index]);
+                    }
+                };
+                const workers = Array.from({ length: Math.min(concurrency, paths.length) }, worker);
+                Promise.all(workers).then(() => done(results));
+                """,
+                paths,
+                validators,
+                concurrency,
+                self._component_retries,
+                self._timeout_seconds * 1000,
+                self._clean_in_browser,
+            )
+        )
+
+    def _chapter_component_toc(self, driver: webdriver.Chrome) -> tuple[list[str], dict[str, str]]:
+        """TOC component paths and ``li`` labels; the TOC is usually hidden, so labels use ``textContent``."""
+        entries = driver.execute_script(
+            """
+            const nodes = Array.from(document.querySelectorAll('#toc-view li[data-chapter]'));
+            const values = [];
+            for (const node of nodes) {
+                const path = node.getAttribute('data-chapter') || '';
+                if (!path) continue;
+                const label = Array.from(node.childNodes)
+                    .filter((child) => !(child.nodeType === 1 && /^(UL|OL|LI)$/.test(child.tagName)))
+                    .map((child) => child.textContent)
+                    .join('')
+                    .replace(/\\s+/g, ' ')
+                    .trim();
+                values.push([path, label]);
+            }
+            return values;
+            """
+        )
+        paths = [str(path) for path, _label in entries]
+        labels: dict[str, str] = {}
+        for path, label in entries:
+            if label:
+                labels.setdefault(str(path), str(label))
+        return paths, labels
+
+    def _without_page_number_spans(self, snapshot: DocumentSnapshot) -> DocumentSnapshot:
+        if snapshot.cleaned:
+            return snapshot
+        cleaned_html = strip_page_markers(snapshot.html)
+        cleaned_text = self._best_text_from_html(cleaned_html)
+        if not cleaned_text.strip():
+            cleaned_text = re.sub(r"\b\d+\b", "", snapshot.text)
+            cleaned_text = re.sub(r"[ \t]+", " ", cleaned_text)
+            cleaned_text = re.sub(r"\n\s*\n\s*\n+", "\n\n", cleaned_text)
+        return DocumentSnapshot.single(
+            html=cleaned_html,
+            text=cleaned_text.strip(),
+            context=snapshot.context,
+            cleaned=True,
+        )
+
+    def _best_text_from_html(self, html: str) -> str:
+        return extract_text(html)
+
+    def _activate_book_content_view(self, driver: webdriver.Chrome) -> None:
+        activated = bool(
+            driver.execute_script(
+                """
+                const click = (node) => {
+                    if (!node) return false;
+                    node.dispatchEvent(new MouseEvent('click', { bubbles: true, cancelable: true }));
+                    return true;
+                };
+
+                click(document.querySelector('#toc-nav'));
+
+                const chapterItems = Array.from(document.querySelectorAll('#toc-view li[data-chapter]'));
+                if (chapterItems.length === 0) return false;
+
+                const score = (item) => {
+                    const chapter = (item.getAttribute('data-chapter') || '').toLowerCase();
+                    let value = 0;
+                    if (chapter.includes('szerzoseg')) value -= 100;
+                    if (chapter.includes('krasznahorkai00014')) value += 40;
+                    if (chapter.includes('-00020')) value += 30;
+                    if (item.classList.contains('single-chapter')) value += 10;
+                    const text = (item.innerText || '').toLowerCase();
+                    if (text.includes('rendkívüli állapotok') || text.includes('rendkivuli allapotok')) value += 20;
+                    if (text.includes('bevezetés') || text.includes('bevezetes')) value += 10;
+                    return value;
+                };
+
+                let best = chapterItems[0];
+                let bestScore = score(best);
+                for (const item of chapterItems) {
+                    const currentScore = score(item);
+                    if (currentScore > bestScore) {
+                        bestScore = currentScore;
+                        best = item;
+                    }
+                }
+
+                const clickable = best.querySelector('span') || best;
+                click(best);
+                click(clickable);
+                return true;
+                """
+            )
+        )
+        if activated:
+            LOG.info("Activated book chapter from table of contents")
+
+    def _collect_candidates(
+        self,
+        driver: webdriver.Chrome,
+        context: str = "top",
+        frame_path: tuple[int, ...] = (),
+        max_depth: int = 4,
+    ) -> list[SnapshotCandidate]:
+        """Score the current document and its same-origin frame tree in one script call.
+
+        Only cheap metrics cross the wire; HTML is serialized later for the winner
+        alone. Cross-origin frames cannot be read from the parent, so only those
+        are entered with ``switch_to.frame`` and measured by the same script.
+        """
+        result: dict[str, list[dict[str, object]]] = dict(
+            driver.execute_script(
+                """
+                const [rootContext, maxDepth, metadataKeywords, proseKeywords] = arguments;
+                const documents = [];
+                const crossOrigin = [];
+
+                const measure = (doc) => {
+                    if (!doc.body) return { textLength: 0, hasMetadata: false, hasProse: false };
+                    let hidden = 0;
+                    doc.body.querySelectorAll('script, style, noscript, .oldaltores').forEach((node) => {
+                        hidden += node.textContent.length;
+                    });
+                    const text = doc.body.textContent || '';
+                    const lowered = text.toLowerCase();
+                    return {
+                        textLength: Math.max(0, text.trim().length - hidden),
+                        hasMetadata: metadataKeywords.every((keyword) => lowered.includes(keyword)),
+                        hasProse: proseKeywords.some((keyword) => lowered.includes(keyword))
+                    };
+                };
+
+                const visit = (doc, context, path, depth) => {
+                    documents.push({ context, path, ...measure(doc) });
+                    if (depth >= maxDepth) return;
+                    doc.querySelectorAll('iframe').forEach((frame, index) => {
+                        const frameContext = `${context}/iframe[${index}]`;
+                        const framePath = [...path, index];
+                        let childDoc = null;
+                        try {
+                            childDoc = frame.contentDocument;
+                        } catch (_err) {
+                        }
+                        if (childDoc && childDoc.documentElement) {
+                            visit(childDoc, frameContext, framePath, depth + 1);
+                        } else {
+                            crossOrigin.push({ context: frameContext, path: framePath });
+                        }
+                    });
+                };
+
+                visit(document, rootContext, [], 0);
+                return { documents, crossOrigin };
+                """,
+                context,
+                max_depth - len(frame_path),
+                list(_METADATA_KEYWORDS),
+                list(_PROSE_KEYWORDS),
+            )
+        )
+
+        candidates = [
+            SnapshotCandidate(
+                context=str(entry["context"]),
+                text_length=int(entry["textLength"]),
+                has_metadata=bool(entry["hasMetadata"]),
+                has_prose=bool(entry["hasProse"]),
+                frame_path=(*frame_path, *(int(index) for index in entry["path"])),
+                same_origin=not frame_path,
+            )
+            for entry in result.get("documents", [])
+        ]
+
+        for entry in result.get("crossOrigin", []):
+            child_path = (*frame_path, *(int(index) for index in entry["path"]))
+            child_context = str(entry["context"])
+            try:
+                self._switch_to_frame_path(driver, child_path)
+                candidates.extend(
+                    self._collect_candidates(
+                        driver,
+                        context=child_context,
+                        frame_path=child_path,
+                        max_depth=max_depth,
+                    )
+                )
+            except Exception as exc:
+                LOG.debug("Failed to inspect frame %s: %s", child_context, exc)
+            finally:
+                self._switch_to_frame_path(driver, frame_path)
+        return candidates
+
+    def _materialize_candidate(self, driver: webdriver.Chrome, candidate: SnapshotCandidate) -> DocumentSnapshot:
+        """Serialize and clean the HTML of a single winning document."""
+        script = """
+            const path = arguments[0];
+            let doc = document;
+            for (const index of path) {
+                const frame = doc.querySelectorAll('iframe')[index];
+                doc = frame ? frame.contentDocument : null;
+                if (!doc) return null;
+            }
+            const clonedDoc = doc.cloneNode(true);
+            clonedDoc.querySelectorAll('.oldaltores').forEach((node) => node.remove());
+            clonedDoc.querySelectorAll('a[name^="DIAPage"]').forEach((node) => node.remove());
+            return clonedDoc.documentElement ? clonedDoc.documentElement.outerHTML : '';
+        """
+        html: Optional[str] = None
+        if candidate.same_origin:
+            html = driver.execute_script(script, list(candidate.frame_path))
+        if html is None:
+            try:
+                self._switch_to_frame_path(driver, candidate.frame_path)
+                html = driver.execute_script(script, [])
+            finally:
+                driver.switch_to.default_content()
+        html = str(html or "")
+        text = self._best_text_from_html(html)
+        return DocumentSnapshot.single(html=html, text=text.strip(), context=candidate.context, cleaned=True)
+
+    def _switch_to_frame_path(self, driver: webdriver.Chrome, frame_path: tuple[int, ...]) -> None:
+        from selenium.webdriver.common.by import By
+
+        driver.switch_to.default_content()
+        for index in frame_path:
+            frames = driver.find_elements(By.TAG_NAME, "iframe")
+            driver.switch_to.frame(frames[index])
+
+    def _build_options(self) -> Options:
+        from selenium.webdriver.chrome.options import Options
+
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        if self._user_agent:
+            options.add_argument(f"--user-agent={self._user_agent}")
+        if self._lean:
+            options.page_load_strategy = "eager"
+            for argument in _LEAN_CHROME_ARGUMENTS:
+                options.add_argument(argument)
+        if self._capture_network:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+        return options
+
+
+@dataclass(frozen=True)
+class BookJob:
+    index: int
+    url: str
+    priority: int = 0
+
+
+class BookScheduler:
+    """Asyncio scheduler that keeps a fixed pool of browser workers busy across many books.
+
+    Books wait in a priority queue (higher ``priority`` first, then input
+    order). Each worker coroutine takes the first book whose host has fewer
+    than ``per_host`` fetches in flight, runs the blocking fetch on a thread,
+    and requeues a failed book with jittered exponential backoff until
+    ``retries`` is used up. Workers never retire on failed books: the driver
+    pool already replaces a driver that failed, so every worker stays busy.
+    """
+
+    def __init__(
+        self,
+        fetcher: HtmlFetcher,
+        workers: int = 1,
+        restart_after: int = 50,
+        per_host: Optional[int] = None,
+        retries: int = 1,
+        backoff_seconds: float = 2.0,
+        checkpoints: Optional[dict[int, BookCheckpoint]] = None,
+        profile: bool = False,
+    ) -> None:
+        self._fetcher = fetcher
+        self._workers = max(1, workers)
+        self._restart_after = restart_after
+        self._per_host = max(1, per_host or self._workers)
+        self._retries = max(0, retries)
+        self._backoff_seconds = backoff_seconds
+        self._checkpoints = checkpoints or {}
+        self._profile = profile
+
+    def results(self, jobs: Iterable[BookJob]) -> Iterator[BatchResult]:
+        """Run the scheduler on a background event loop and yield results as books finish.
+
+        When the consumer stops early (``close()``, ``break`` or an exception),
+        the workers are cancelled, books already being fetched are finished, and
+        the driver pool is closed before this generator returns.
+        """
+        finished: queue.Queue[object] = queue.Queue()
+        done = object()
+        stop = threading.Event()
+        running: dict[str, object] = {}
+
+        def run_loop() -> None:
+            import asyncio
+
+            async def main() -> None:
+                running["loop"], running["task"] = asyncio.get_running_loop(), asyncio.current_task()
+                if not stop.is_set():
+                    await self._run(list(jobs), finished.put)
+
+            try:
+                asyncio.run(main())
+            except asyncio.CancelledError:
+                pass
+            except BaseException as exc:  # handed to the consuming thread
+                finished.put(exc)
+            finally:
+                finished.put(done)
+
+        thread = threading.Thread(target=run_loop, name="dget-scheduler", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = finished.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item  # type: ignore[misc]
+        finally:
+            stop.set()
+            loop = running.get("loop")
+            if thread.is_alive() and loop is not None:
+                try:
+                    loop.call_soon_threadsafe(running["task"].cancel)  # type: ignore[attr-defined]
+                except RuntimeError:  # the loop closed on its own in the meantime
+                    pass
+            thread.join()
+
+    async def _run(self, jobs: list[BookJob], emit: Callable[[BatchResult], None]) -> None:
+        import asyncio
+
+        self._queue: list[tuple[int, int, float, int, BookJob]] = []
+        self._sequence = itertools.count()
+        self._in_flight: dict[str, int] = {}
+        self._pending = len(jobs)
+        self._changed = asyncio.Condition()
+        for job in jobs:
+            self._push(job, attempt=0, not_before=0.0)
+
+        with self._fetcher.driver_pool(size=self._workers, max_pages_per_driver=self._restart_after) as pool:
+            with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="dget-book") as executor:
+                await asyncio.gather(
+                    *(self._worker(pool, executor, emit) for _ in range(self._workers))
+                )
+
+    def _push(self, job: BookJob, attempt: int, not_before: float) -> None:
+        insort(self._queue, (-job.priority, next(self._sequence), not_before, attempt, job))
+
+    async def _worker(
+        self,
+        pool: DriverPool,
+        executor: ThreadPoolExecutor,
+        emit: Callable[[BatchResult], None],
+    ) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            claimed = await self._claim()
+            if claimed is None:
+                return
+            attempt, job = claimed
+            try:
+                result = await loop.run_in_executor(
+                    executor,
+                    self._fetcher._fetch_result,
+                    job.index,
+                    job.url,
+                    pool,
+                    self._checkpoints.get(job.index),
+                    FetchMetrics(job.url) if self._profile else None,
+                )
+            finally:
+                async with self._changed:
+                    self._in_flight[_host_of(job.url)] -= 1
+                    self._changed.notify_all()
+
+            if result.snapshot is not None:
+                await self._complete(result, emit)
+                continue
+
+            if attempt < self._retries:
+                delay = self._backoff_seconds * 2**attempt * random.uniform(0.5, 1.5)
+                LOG.info("Retrying %s in %.1fs (attempt %d of %d)", job.url, delay, attempt + 2, self._retries + 1)
+                async with self._changed:
+                    self._push(job, attempt + 1, loop.time() + delay)
+                    self._changed.notify_all()
+            else:
+                await self._complete(result, emit)
+
+    async def _claim(self) -> Optional[tuple[int, BookJob]]:
+        """Take the best runnable book, waiting for backoffs and host capacity; ``None`` when all are done."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        async with self._changed:
+            while self._pending:
+                now = loop.time()
+                wake_at: Optional[float] = None
+                for position, (_priority, _sequence, not_before, attempt, job) in enumerate(self._queue):
+                    if not_before > now:
+                        wake_at = not_before if wake_at is None else min(wake_at, not_before)
+                        continue
+                    host = _host_of(job.url)
+                    if self._in_flight.get(host, 0) >= self._per_host:
+                        continue
+                    del self._queue[position]
+                    self._in_flight[host] = self._in_flight.get(host, 0) + 1
+                    return attempt, job
+                timeout = None if wake_at is None else max(0.0, wake_at - now)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return None
+
+    async def _complete(self, result: BatchResult, emit: Callable[[BatchResult], None]) -> None:
+        emit(result)
+        async with self._changed:
+            self._pending -= 1
+            self._changed.notify_all()
+
+
+class FetchService:
+    """Run fetch jobs on a warm driver pool; concurrent requests for the same job share one fetch."""
+
+    def __init__(self, fetcher: HtmlFetcher, pool: DriverPool, profile: Optional[str] = None) -> None:
+        self._fetcher = fetcher
+        self._pool = pool
+        self._profile = profile
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[str, Optional[int], Optional[int]], Future[DocumentSnapshot]] = {}
+        self._counters = {"requests": 0, "fetches": 0, "coalesced": 0, "failures": 0}
+
+    def fetch(
+        self,
+        url: str,
+        timeout_seconds: Optional[int] = None,
+        min_text_chars: Optional[int] = None,
+    ) -> tuple[DocumentSnapshot, bool]:
+        """Return the snapshot and whether it came from another request's fetch."""
+        key = (url, timeout_seconds, min_text_chars)
+        future: Future[DocumentSnapshot] = Future()
+        with self._lock:
+            self._counters["requests"] += 1
+            shared = self._in_flight.get(key)
+            if shared is None:
+                self._in_flight[key] = future
+            else:
+                self._counters["coalesced"] += 1
+        if shared is not None:
+            return shared.result(), True
+
+        metrics = FetchMetrics(url) if self._profile else None
+        try:
+            fetcher = self._fetcher.with_overrides(timeout_seconds, min_text_chars)
+            snapshot = fetcher.fetch(url, pool=self._pool, metrics=metrics)
+        except Exception as exc:
+            self._count("failures")
+            future.set_exception(exc)
+            if metrics is not None:
+                metrics.finish(error=str(exc) or type(exc).__name__)
+            raise
+        else:
+            future.set_result(snapshot)
+            if metrics is not None:
+                metrics.finish()
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                self._counters["fetches"] += 1
+            if metrics is not None and self._profile is not None:
+                write_metrics_line(self._profile, metrics)
+        return snapshot, False
+
+    def health(self) -> dict[str, object]:
+        return {"status": "ok", "uptime_seconds": round(time.monotonic() - self._started, 3), "pool": self._pool.stats()}
+
+    def metrics(self) -> dict[str, object]:
+        with self._lock:
+            counters: dict[str, object] = dict(self._counters)
+            counters["in_flight"] = len(self._in_flight)
+        counters["uptime_seconds"] = round(time.monotonic() - self._started, 3)
+        counters["pool"] = self._pool.stats()
+        if self._fetcher.cache is not None:
+            counters["cache"] = vars(self._fetcher.cache.stats).copy()
+        return counters
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+
+class _ServeHandler(BaseHTTPRequestHandler):
+    """Local fetch API: ``GET /health``, ``GET /metrics``, and ``GET`` or ``POST /fetch``."""
+
+    server: _TcpServer | _UnixServer
+    protocol_version = "HTTP/1.1"
+    server_version = "dget"
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        parsed = urlsplit(self.path)
+        if parsed.path == "/health":
+            self._send_json(200, self.server.service.health())
+        elif parsed.path == "/metrics":
+            self._send_json(200, self.server.service.metrics())
+        elif parsed.path == "/fetch":
+            params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+            self._fetch(params)
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {parsed.path}"})
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        if urlsplit(self.path).path != "/fetch":
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as exc:
+            self._send_json(400, {"error": f"invalid JSON body: {exc}"})
+            return
+        self._fetch(params)
+
+    def _fetch(self, params: dict[str, object]) -> None:
+        url = str(params.get("url") or "")
+        output_format = str(params.get("format") or self.server.default_format)
+        try:
+            if not url:
+                raise ValueError("'url' is required")
+            if output_format not in {"html", "text"}:
+                raise ValueError("'format' must be 'html' or 'text'")
+            timeout = int(params["timeout"]) if params.get("timeout") is not None else None
+            min_chars = int(params["min_text_chars"]) if params.get("min_text_chars") is not None else None
+        except (TypeError, ValueError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        try:
+            snapshot, coalesced = self.server.service.fetch(url, timeout, min_chars)
+        except Exception as exc:
+            self._send_json(502, {"error": str(exc) or type(exc).__name__})
+            return
+
+        self.send_response(200)
+        content_type = "text/html" if output_format == "html" else "text/plain"
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Dget-Context", snapshot.context)
+        self.send_header("X-Dget-Text-Chars", str(snapshot.text_length))
+        self.send_header("X-Dget-Coalesced", "1" if coalesced else "0")
+        self.end_headers()
+        try:
+            for chunk in snapshot.chunks(output_format):
+                data = chunk.encode("utf-8")
+                if data:
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            LOG.debug("Client went away while streaming %s", url)
+
+    def _send_json(self, status: int, payload: dict[str, object]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        LOG.debug("%s %s", self.address_string(), format % args)
+
+
+class _TcpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    service: FetchService
+    default_format: str
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    service: FetchService
+    default_format: str
+
+    def get_request(self) -> tuple[object, tuple[str, int]]:
+        request, _address = super().get_request()
+        return request, ("unix-socket", 0)
+
+
+def _host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def process_tree_rss(root_pid: int) -> dict[str, int]:
+    """Return resident memory in bytes of ``root_pid`` and its descendants, by process kind.
+
+    Keys are ``total`` and ``renderer`` (Chrome processes started with
+    ``--type=renderer``). Reads ``/proc`` and returns an empty dict elsewhere.
+    """
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return {}
+    children: dict[int, list[int]] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry.name))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    usage = {"total": 0, "renderer": 0}
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            resident_pages = int((proc / str(pid) / "statm").read_text().split()[1])
+            command_line = (proc / str(pid) / "cmdline").read_bytes()
+        except (OSError, IndexError, ValueError):
+            continue
+        usage["total"] += resident_pages * page_size
+        if b"--type=renderer" in command_line:
+            usage["renderer"] += resident_pages * page_size
+    return usage
+
+
+def python_rss() -> dict[str, int]:
+    """Current and peak resident memory in bytes of this Python process alone."""
+    usage: dict[str, int] = {}
+    try:
+        resident_pages = int(Path("/proc/self/statm").read_text().split()[1])
+        usage["current"] = resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["peak"] = peak if sys.platform == "darwin" else peak * 1024
+    return usage
+
+
+def chrome_rss(driver: webdriver.Chrome) -> dict[str, int]:
+    """Resident memory of the chromedriver process tree behind ``driver``."""
+    try:
+        return process_tree_rss(driver.service.process.pid)
+    except Exception:
+        return {}
+
+
+_COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".xz": "xz"}
+
+
+def compression_for(output_file: Path, compression: Optional[str] = None) -> Optional[str]:
+    """Return the requested compression, or the one implied by the output file suffix."""
+    if compression is not None:
+        return None if compression == "none" else compression
+    return _COMPRESSION_SUFFIXES.get(output_file.suffix.lower())
+
+
+class OutputWriter:
+    """Stream text into a temporary file next to ``output_file`` and rename it into place on success.
+
+    The temporary file is removed if the ``with`` block raises, so readers
+    never see a partially written output.
+    """
+
+    def __init__(self, output_file: Path, compression: Optional[str] = None) -> None:
+        self._output_file = output_file
+        self._compression = compression
+        self._temporary = output_file.with_name(f".{output_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._raw: Optional[io.BufferedWriter] = None
+        self._stream: Optional[io.BufferedIOBase] = None
+        self.bytes_written = 0
+
+    def __enter__(self) -> OutputWriter:
+        self._output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self._temporary, "wb")
+        try:
+            self._stream = self._open_compressor(self._raw)
+        except Exception:
+            self._raw.close()
+            self._temporary.unlink(missing_ok=True)
+            raise
+        return self
+
+    def write(self, text: str) -> None:
+        assert self._stream is not None
+        data = text.encode("utf-8")
+        self._stream.write(data)
+        self.bytes_written += len(data)
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        try:
+            if self._stream is not self._raw and self._stream is not None:
+                self._stream.close()
+            if self._raw is not None:
+                if exc_type is None:
+                    self._raw.flush()
+                    os.fsync(self._raw.fileno())
+                self._raw.close()
+            if exc_type is None:
+                os.replace(self._temporary, self._output_file)
+        finally:
+            self._temporary.unlink(missing_ok=True)
+
+    def _open_compressor(self, raw: io.BufferedWriter) -> io.BufferedIOBase:
+        if self._compression is None:
+            return raw
+        if self._compression == "gzip":
+            return gzip.GzipFile(filename=self._output_file.stem, mode="wb", fileobj=raw, mtime=0)
+        if self._compression == "xz":
+            return lzma.LZMAFile(raw, mode="wb")
+        if self._compression == "zstd":
+            if zstd is None:
+                raise RuntimeError("zstd compression needs Python 3.14 or newer")
+            return zstd.ZstdFile(raw, mode="wb")
+        raise RuntimeError(f"Unknown compression: {self._compression}")
+
+
+_EPUB_CONTAINER = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+_EPUB_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def epub_title_for(url: str) -> str:
+    """Book title from a reader URL slug, e.g. ``Szerzo_Neve-A_konyv_cime-1083`` to ``Szerzo Neve – A konyv cime``."""
+    segment = unquote(urlparse(url).path.rstrip("/").rsplit("/", 1)[-1])
+    segment = re.sub(r"-\d+$", "", segment)
+    return segment.replace("_", " ").replace("-", " – ").strip() or url
+
+
+class EpubWriter:
+    """Write an EPUB 3 book chapter by chapter into a temporary zip, renamed into place on success.
+
+    Each chapter is compressed into the container as soon as it is added, so
+    the book is never assembled in memory. The navigation document, NCX and
+    package document are written last, listing chapters in the order added.
+    """
+
+    def __init__(self, output_file: Path, title: str, identifier: str, language: str = "hu") -> None:
+        self._output_file = output_file
+        self._title = title
+        self._identifier = identifier
+        self._language = language
+        self._temporary = output_file.with_name(f".{output_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._chapters: list[tuple[str, str]] = []
+        self.bytes_written = 0
+
+    def __enter__(self) -> EpubWriter:
+        self._output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._zip = zipfile.ZipFile(self._temporary, "w", compression=zipfile.ZIP_DEFLATED)
+        try:
+            # The mimetype entry must come first and be stored uncompressed.
+            self._zip.writestr(self._entry("mimetype", zipfile.ZIP_STORED), "application/epub+zip")
+            self._zip.writestr(self._entry("META-INF/container.xml"), _EPUB_CONTAINER)
+        except Exception:
+            self._zip.close()
+            self._temporary.unlink(missing_ok=True)
+            raise
+        return self
+
+    def add_chapter(self, body: str, title: Optional[str] = None) -> None:
+        """Append one chapter of sanitized XHTML body content (see ``chapter_xhtml``)."""
+        assert self._zip is not None
+        number = len(self._chapters) + 1
+        name = f"chapter-{number:04d}.xhtml"
+        title = title or f"Chapter {number}"
+        with self._zip.open(self._entry(f"OEBPS/{name}"), "w") as handle:
+            for piece in (self._xhtml_head(title), body, "\n</body>\n</html>\n"):
+                data = piece.encode("utf-8")
+                handle.write(data)
+                self.bytes_written += len(data)
+        self._chapters.append((name, title))
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        try:
+            if self._zip is not None:
+                if exc_type is None:
+                    self._zip.writestr(self._entry("OEBPS/nav.xhtml"), self._nav())
+                    self._zip.writestr(self._entry("OEBPS/toc.ncx"), self._ncx())
+                    self._zip.writestr(self._entry("OEBPS/content.opf"), self._package())
+                self._zip.close()
+            if exc_type is None:
+                with open(self._temporary, "rb") as handle:
+                    os.fsync(handle.fileno())
+                os.replace(self._temporary, self._output_file)
+        finally:
+            self._temporary.unlink(missing_ok=True)
+
+    @staticmethod
+    def _entry(name: str, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=_EPUB_DATE)
+        info.compress_type = compress_type
+        return info
+
+    def _xhtml_head(self, title: str) -> str:
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{self._language}" lang="{self._language}">\n'
+            f"<head><meta charset=\"utf-8\"/><title>{html_lib.escape(title)}</title></head>\n<body>\n"
+        )
+
+    def _nav(self) -> str:
+        items = "".join(
+            f'      <li><a href="{name}">{html_lib.escape(title)}</a></li>\n' for name, title in self._chapters
+        )
+        return (
+            self._xhtml_head(self._title).replace("<html ", '<html xmlns:epub="http://www.idpf.org/2007/ops" ', 1)
+            + f'<nav epub:type="toc" id="toc">\n  <h1>{html_lib.escape(self._title)}</h1>\n  <ol>\n{items}  </ol>\n</nav>\n'
+            + "</body>\n</html>\n"
+        )
+
+    def _ncx(self) -> str:
+        points = "".join(
+            f'    <navPoint id="nav-{number}" playOrder="{number}"><navLabel><text>{html_lib.escape(title)}</text>'
+            f'</navLabel><content src="{name}"/></navPoint>\n'
+            for number, (name, title) in enumerate(self._chapters, start=1)
+        )
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+            f'  <head><meta name="dtb:uid" content="{html_lib.escape(self._identifier)}"/></head>\n'
+            f"  <docTitle><text>{html_lib.escape(self._title)}</text></docTitle>\n"
+            f"  <navMap>\n{points}  </navMap>\n</ncx>\n"
+        )
+
+    def _package(self) -> str:
+        manifest = "".join(
+            f'    <item id="{name[:-6]}" href="{name}" media-type="application/xhtml+xml"/>\n'
+            for name, _title in self._chapters
+        )
+        spine = "".join(f'    <itemref idref="{name[:-6]}"/>\n' for name, _title in self._chapters)
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" '
+            f'xml:lang="{self._language}">\n'
+            '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'    <dc:identifier id="book-id">{html_lib.escape(self._identifier)}</dc:identifier>\n'
+            f"    <dc:title>{html_lib.escape(self._title)}</dc:title>\n"
+            f"    <dc:language>{self._language}</dc:language>\n"
+            f'    <meta property="dcterms:modified">{modified}</meta>\n'
+            "  </metadata>\n"
+            "  <manifest>\n"
+            '    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            '    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n'
+            f"{manifest}  </manifest>\n"
+            f'  <spine toc="ncx">\n{spine}  </spine>\n'
+            "</package>\n"
+        )
+
+
+class HtmlSaver:
+    """Persist output to disk, streaming it chunk by chunk through an optional compressor."""
+
+    def __init__(
+        self,
+        compression: Optional[str] = None,
+        postprocessor: Optional[ComponentPostProcessor] = None,
+    ) -> None:
+        self._compression = compression
+        self._postprocessor = postprocessor or ComponentPostProcessor(workers=1)
+
+    def save(self, html: str, output_file: Path) -> None:
+        self.save_chunks([html], output_file)
+
+    def save_snapshot(
+        self,
+        snapshot: DocumentSnapshot,
+        output_format: str,
+        output_file: Path,
+        source_url: Optional[str] = None,
+    ) -> int:
+        """Write ``snapshot`` one chapter at a time and return the uncompressed byte count."""
+        if output_format == "epub":
+            return self.save_epub(snapshot, output_file, source_url or output_file.stem)
+        return self.save_chunks(snapshot.chunks(output_format), output_file)
+
+    def save_epub(self, snapshot: DocumentSnapshot, output_file: Path, source_url: str) -> int:
+        """Sanitize chapters in parallel and add each to the EPUB as soon as it is ready, in TOC order.
+
+        Chapters are read from the snapshot one at a time. A chapter's label is
+        its TOC label, else its first heading.
+        """
+        if compression_for(output_file, self._compression) is not None:
+            raise RuntimeError("EPUB output is already a zip container and cannot be compressed")
+        titles = snapshot.titles
+        with EpubWriter(output_file, title=epub_title_for(source_url), identifier=source_url) as writer:
+            for number, (body, heading) in enumerate(self._postprocessor.map(chapter_xhtml, snapshot.html_chunks)):
+                label = titles[number] if number < len(titles) else ""
+                writer.add_chapter(body, label or heading)
+        return writer.bytes_written
+
+    def save_chunks(self, chunks: Iterable[str], output_file: Path) -> int:
+        with OutputWriter(output_file, compression_for(output_file, self._compression)) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        return writer.bytes_written
+
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    context TEXT,
+    content_hash TEXT NOT NULL,
+    chapters INTEGER NOT NULL,
+    chars INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    UNIQUE (book_id, position)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    stamp TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chapter_text USING fts5(
+    title, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+_INDEX_SUFFIXES = {".html": "html", ".htm": "html", ".txt": "text", ".epub": "epub"}
+_HTML_DOCUMENT_END_RE = re.compile(r"</html\s*>", re.IGNORECASE)
+_EPUB_CHAPTER_RE = re.compile(r"OEBPS/chapter-\d+\.xhtml")
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    url: str
+    title: str
+    chapter: int
+    chapter_title: str
+    snippet: str
+    score: float
+
+
+def output_format_of(path: Path) -> Optional[str]:
+    """``html``, ``text`` or ``epub`` from an output file name such as ``book.txt.gz``; ``None`` otherwise."""
+    if path.suffix.lower() in _COMPRESSION_SUFFIXES:
+        path = path.with_suffix("")
+    return _INDEX_SUFFIXES.get(path.suffix.lower())
+
+
+def read_output(path: Path) -> str:
+    """Read a ``.html`` or ``.txt`` output file, decompressing it by its suffix."""
+    data = path.read_bytes()
+    compression = _COMPRESSION_SUFFIXES.get(path.suffix.lower())
+    if compression == "gzip":
+        data = gzip.decompress(data)
+    elif compression == "xz":
+        data = lzma.decompress(data)
+    elif compression == "zstd":
+        if zstd is None:
+            raise RuntimeError("Reading zstd output needs Python 3.14 or newer")
+        data = zstd.decompress(data)
+    return data.decode("utf-8")
+
+
+def output_chapters(path: Path) -> tuple[Optional[str], Optional[str], list[str]]:
+    """Return ``(url, title, chapter_texts)`` recovered from an output file.
+
+    EPUB files keep their chapters and record the source URL and title. HTML
+    output is split at each component's ``</html>``. Text output has no
+    chapter boundaries and is returned as one chapter.
+    """
+    output_format = output_format_of(path)
+    if output_format == "epub":
+        with zipfile.ZipFile(path) as archive:
+            package = archive.read("OEBPS/content.opf").decode("utf-8")
+            names = sorted(name for name in archive.namelist() if _EPUB_CHAPTER_RE.fullmatch(name))
+            chapters = [extract_text(archive.read(name).decode("utf-8")) for name in names]
+        identifier = re.search(r"<dc:identifier[^>]*>(.*?)</dc:identifier>", package, re.DOTALL)
+        title = re.search(r"<dc:title>(.*?)</dc:title>", package, re.DOTALL)
+        return (
+            html_lib.unescape(identifier.group(1)) if identifier else None,
+            html_lib.unescape(title.group(1)) if title else None,
+            chapters,
+        )
+    content = read_output(path)
+    if output_format == "text":
+        return None, None, [content]
+    documents = _HTML_DOCUMENT_END_RE.split(content)
+    return None, None, [text for text in map(extract_text, documents) if text]
+
+
+def _chapter_title(text: str) -> str:
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()[:120]
+    return ""
+
+
+def _file_source_stamp(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
 
-    def _best_text_from_html(self, html: str) -> str:
-        return self._extract_text_with_fallback(html)
-
-    def _extract_text_with_fallback(self, html: str) -> str:
-        body_match = re.search(r"<body[^>]*>(.*)</body>", html, flags=re.IGNORECASE | re.DOTALL)
-        source = body_match.group(1) if body_match else html
-        source = re.sub(r"<script\b[^>]*>.*?</script>", "", source, flags=re.IGNORECASE | re.DOTALL)
-        source = re.sub(r"<style\b[^>]*>.*?</style>", "", source, flags=re.IGNORECASE | re.DOTALL)
-        source = re.sub(r"<br\s*/?>", "\n", source, flags=re.IGNORECASE)
-        source = re.sub(r"</(p|div|h1|h2|h3|h4|h5|h6|li|tr|section|article|header|footer)>", "\n", source, flags=re.IGNORECASE)
-        source = re.sub(r"<[^>]+>", "", source)
-        source = re.sub(r"&nbsp;", " ", source, flags=re.IGNORECASE)
-        source = re.sub(r"\s+\n", "\n", source)
-        source = re.sub(r"\n\s+", "\n", source)
-        source = re.sub(r"(?m)^\s*\d{1,4}\s*$\n?", "", source)
-        source = re.sub(r"\n{3,}", "\n\n", source)
-        source = re.sub(r"[ \t]{2,}", " ", source)
-        return source.strip()
 
-    def _activate_book_content_view(self, driver: webdriver.Chrome) -> None:
-        activated = bool(
-            driver.execute_script(
-                """
-                const click = (node) => {
-                    if (!node) return false;
-                    node.dispatchEvent(new MouseEvent('click', { bubbles: true, cancelable: true }));
-                    return true;
-                };
+class BookIndex:
+    """SQLite FTS5 index of fetched books: one row per chapter, one per output file, updated incrementally."""
 
-                click(document.querySelector('#toc-nav'));
+    def __init__(self, path: Path) -> None:
+        import sqlite3
 
-                const chapterItems = Array.from(document.querySelectorAll('#toc-view li[data-chapter]'));
-                if (chapterItems.length === 0) return false;
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._sqlite3 = sqlite3
+        self._db: sqlite3.Connection = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_INDEX_SCHEMA)
 
-                const score = (item) => {
-                    const chapter = (item.getAttribute('data-chapter') || '').toLowerCase();
-                    let value = 0;
-                    if (chapter.includes('szerzoseg')) value -= 100;
-                    if (chapter.includes('krasznahorkai00014')) value += 40;
-                    if (chapter.includes('-00020')) value += 30;
-                    if (item.classList.contains('single-chapter')) value += 10;
-                    const text = (item.innerText || '').toLowerCase();
-                    if (text.includes('rendkívüli állapotok') || text.includes('rendkivuli allapotok')) value += 20;
-                    if (text.includes('bevezetés') || text.includes('bevezetes')) value += 10;
-                    return value;
-                };
+    def __enter__(self) -> BookIndex:
+        return self
 
-                let best = chapterItems[0];
-                let bestScore = score(best);
-                for (const item of chapterItems) {
-                    const currentScore = score(item);
-                    if (currentScore > bestScore) {
-                        bestScore = currentScore;
-                        best = item;
-                    }
-                }
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
 
-                const clickable = best.querySelector('span') || best;
-                click(best);
-                click(clickable);
-                return true;
-                """
-            )
-        )
-        if activated:
-            LOG.info("Activated book chapter from table of contents")
+    def close(self) -> None:
+        self._db.close()
 
-    def _collect_frame_snapshots(
+    def add(
         self,
-        driver: webdriver.Chrome,
-        context: str = "top",
-        depth: int = 0,
-        max_depth: int = 4,
-    ) -> list[DocumentSnapshot]:
-        if depth >= max_depth:
-            return []
-
-        snapshots: list[DocumentSnapshot] = []
-        frames = driver.find_elements(By.TAG_NAME, "iframe")
-        for index, frame in enumerate(frames):
-            frame_context = f"{context}/iframe[{index}]"
-            try:
-                driver.switch_to.frame(frame)
-                snapshots.append(self._snapshot_current_document(driver, frame_context))
-                snapshots.extend(
-                    self._collect_frame_snapshots(
-                        driver,
-                        context=frame_context,
-                        depth=depth + 1,
-                        max_depth=max_depth,
-                    )
+        url: str,
+        chapters: Sequence[str],
+        title: Optional[str] = None,
+        context: Optional[str] = None,
+        source: Optional[str] = None,
+        source_stamp: Optional[str] = None,
+    ) -> str:
+        """Index one book's chapter texts, read one at a time; return ``added``, ``updated`` or ``unchanged``."""
+        hashes = [hashlib.sha256(chapter.encode("utf-8")).hexdigest() for chapter in chapters]
+        book_hash = hashlib.sha256("\n".join(hashes).encode("ascii")).hexdigest()
+        chars = sum(len(chapter) for chapter in chapters)
+        with self._db:
+            row = self._db.execute("SELECT id, content_hash FROM books WHERE url = ?", (url,)).fetchone()
+            if row is not None and row[1] == book_hash:
+                self._record_source(row[0], source, source_stamp)
+                return "unchanged"
+            values = (title or epub_title_for(url), context, book_hash, len(chapters), chars)
+            if row is None:
+                book_id = self._db.execute(
+                    "INSERT INTO books (title, context, content_hash, chapters, chars, indexed_at, url) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*values, time.time(), url),
+                ).lastrowid
+                existing: dict[int, tuple[int, str]] = {}
+            else:
+                book_id = row[0]
+                self._db.execute(
+                    "UPDATE books SET title = ?, context = ?, content_hash = ?, chapters = ?, chars = ?, "
+                    "indexed_at = ? WHERE id = ?",
+                    (*values, time.time(), book_id),
                 )
-            except Exception as exc:
-                LOG.debug("Failed to inspect frame %s: %s", frame_context, exc)
-            finally:
-                try:
-                    driver.switch_to.parent_frame()
-                except Exception:
-                    driver.switch_to.default_content()
+                existing = {
+                    position: (chapter_id, digest)
+                    for chapter_id, position, digest in self._db.execute(
+                        "SELECT id, position, content_hash FROM chapters WHERE book_id = ?", (book_id,)
+                    )
+                }
+            for position, (text, digest) in enumerate(zip(chapters, hashes), start=1):
+                chapter_title = _chapter_title(text)
+                current = existing.pop(position, None)
+                if current is None:
+                    chapter_id = self._db.execute(
+                        "INSERT INTO chapters (book_id, position, title, content_hash) VALUES (?, ?, ?, ?)",
+                        (book_id, position, chapter_title, digest),
+                    ).lastrowid
+                    self._db.execute(
+                        "INSERT INTO chapter_text (rowid, title, body) VALUES (?, ?, ?)",
+                        (chapter_id, chapter_title, text),
+                    )
+                elif current[1] != digest:
+                    self._db.execute(
+                        "UPDATE chapters SET title = ?, content_hash = ? WHERE id = ?",
+                        (chapter_title, digest, current[0]),
+                    )
+                    self._db.execute(
+                        "UPDATE chapter_text SET title = ?, body = ? WHERE rowid = ?",
+                        (chapter_title, text, current[0]),
+                    )
+            for chapter_id, _digest in existing.values():
+                self._db.execute("DELETE FROM chapter_text WHERE rowid = ?", (chapter_id,))
+                self._db.execute("DELETE FROM chapters WHERE id = ?", (chapter_id,))
+            self._record_source(book_id, source, source_stamp)
+        return "added" if row is None else "updated"
 
-        return snapshots
+    def _record_source(self, book_id: int, source: Optional[str], stamp: Optional[str]) -> None:
+        if source is not None:
+            self._db.execute(
+                "INSERT INTO sources (path, book_id, stamp) VALUES (?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET book_id = excluded.book_id, stamp = excluded.stamp",
+                (source, book_id, stamp),
+            )
 
-    def _build_options(self) -> Options:
-        options = Options()
-        options.add_argument("--headless=new")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        if self._user_agent:
-            options.add_argument(f"--user-agent={self._user_agent}")
-        return options
+    def add_snapshot(self, url: str, snapshot: DocumentSnapshot, source: Optional[Path] = None) -> str:
+        """Index the cleaned chapter texts of a fetched snapshot."""
+        return self.add(
+            url,
+            snapshot.text_chunks,
+            context=snapshot.context,
+            source=str(source.resolve()) if source is not None else None,
+            source_stamp=_file_source_stamp(source) if source is not None and source.exists() else None,
+        )
 
+    def add_file(self, path: Path, url: Optional[str] = None, context: Optional[str] = None) -> str:
+        """Index an output file, skipping it without reading when its size and mtime are unchanged."""
+        source = str(path.resolve())
+        stamp = _file_source_stamp(path)
+        row = self._db.execute("SELECT stamp FROM sources WHERE path = ?", (source,)).fetchone()
+        if row is not None and row[0] == stamp:
+            return "unchanged"
+        file_url, title, chapters = output_chapters(path)
+        return self.add(
+            url or file_url or path.resolve().as_uri(),
+            chapters,
+            title=title,
+            context=context,
+            source=source,
+            source_stamp=stamp,
+        )
 
-class HtmlSaver:
-    """Persist HTML to disk."""
+    def search(self, query: str, limit: int = 10, snippet_tokens: int = 16) -> list[SearchHit]:
+        """Rank chapters matching an FTS5 ``query`` by BM25; plain words are retried quoted on a syntax error."""
+        sql = (
+            "SELECT books.url, books.title, chapters.position, chapters.title, "
+            "snippet(chapter_text, 1, '[', ']', '…', ?), bm25(chapter_text, 5.0, 1.0) AS rank "
+            "FROM chapter_text JOIN chapters ON chapters.id = chapter_text.rowid "
+            "JOIN books ON books.id = chapters.book_id "
+            "WHERE chapter_text MATCH ? ORDER BY rank LIMIT ?"
+        )
+        try:
+            rows = self._db.execute(sql, (snippet_tokens, query, limit)).fetchall()
+        except self._sqlite3.OperationalError:
+            quoted = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+            if not quoted:
+                return []
+            rows = self._db.execute(sql, (snippet_tokens, quoted, limit)).fetchall()
+        return [
+            SearchHit(url=url, title=title, chapter=position, chapter_title=chapter_title, snippet=snippet, score=-rank)
+            for url, title, position, chapter_title, snippet, rank in rows
+        ]
 
-    def save(self, html: str, output_file: Path) -> None:
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        output_file.write_text(html, encoding="utf-8")
+    def sources(self) -> set[str]:
+        """Absolute paths of every output file recorded in the index."""
+        return {path for (path,) in self._db.execute("SELECT path FROM sources")}
 
+    def stats(self) -> dict[str, int]:
+        books, chars = self._db.execute("SELECT COUNT(*), COALESCE(SUM(chars), 0) FROM books").fetchone()
+        (chapters,) = self._db.execute("SELECT COUNT(*) FROM chapters").fetchone()
+        return {"books": books, "chapters": chapters, "chars": chars}
 
-def parse_args(argv: Optional[list[str]] = None) -> FetchConfig:
-    parser = argparse.ArgumentParser(
-        prog="dget",
-        description="Fetch rendered HTML from a JavaScript-driven page.",
-    )
-    parser.add_argument("url", help="Target URL to fetch")
-    parser.add_argument("-o", "--output", required=True, help="Output HTML file")
+
+def _add_fetch_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "--timeout",
         type=int,
@@ -479,19 +4045,316 @@ def parse_args(argv: Optional[list[str]] = None) -> FetchConfig:
     )
     parser.add_argument(
         "--format",
-        choices=["html", "text"],
+        choices=["html", "text", "epub"],
         default="html",
-        help="Output format: rendered HTML or visible rendered text",
+        help="Output format: rendered HTML, visible rendered text, or an EPUB built from the chapter components",
+    )
+    parser.add_argument(
+        "--max-components",
+        type=int,
+        default=None,
+        help="Fetch at most this many chapter components (default: the whole book)",
+    )
+    parser.add_argument(
+        "--component-concurrency",
+        type=int,
+        default=4,
+        help="Chapter components fetched in parallel",
+    )
+    parser.add_argument(
+        "--component-retries",
+        type=int,
+        default=2,
+        help="Retries per chapter component after a failed request",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["selenium", "http"],
+        default="selenium",
+        help="Fetch engine: render with Chrome, or try plain HTTP first and fall back to Chrome",
+    )
+    parser.add_argument(
+        "--clean-in-browser",
+        action="store_true",
+        help="Remove page-number artifacts from chapter components in the browser DOM",
+    )
+    parser.add_argument(
+        "--component-min-chars",
+        type=int,
+        default=None,
+        help="Use the chapter component text without inspecting frames once it has this many "
+        "characters (default: --min-text-chars)",
+    )
+    parser.add_argument(
+        "--capture-network",
+        action="store_true",
+        help="Reuse chapter components the reader already downloaded, read from Chrome's network log",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Lean browser profile: block images, fonts, media and analytics, load pages eagerly",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for a persistent cache of TOCs, chapter components and extracted text",
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=168.0,
+        help="Hours a cached entry is used without revalidating it with the server",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        help="Evict least recently used cache entries beyond this size",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        metavar="FILE",
+        help="Append per-fetch phase timings and resource usage as JSON lines to FILE ('-' for stderr)",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=0.0,
+        help="Requests per second allowed to each host, shared by all workers (default: unlimited)",
+    )
+    parser.add_argument(
+        "--cpu-workers",
+        type=int,
+        default=None,
+        help="Processes that clean chapter components and extract their text for large books "
+        "(default: in-process for single fetches, one per CPU for batch and serve; 1 keeps it in-process)",
+    )
+    parser.add_argument(
+        "--driver-cache",
+        default=None,
+        metavar="FILE",
+        help="File caching the chromedriver and Chrome paths resolved by Selenium Manager "
+        "(default: $XDG_CACHE_HOME/dget/chrome-paths.json)",
+    )
+    parser.add_argument(
+        "--no-driver-cache",
+        action="store_true",
+        help="Let Selenium Manager resolve chromedriver and Chrome for every browser start",
+    )
+
+
+def _add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Checkpoint each chapter component next to the output and reuse finished ones on a rerun",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=["none", "gzip", "zstd", "xz"],
+        default=None,
+        help="Compress the output file (default: from the output suffix .gz, .zst or .xz)",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        default=None,
+        metavar="FILE",
+        help="Also write the phases as a Chrome trace-event file (chrome://tracing, Perfetto)",
+    )
+    parser.add_argument(
+        "--index",
+        default=None,
+        metavar="DB",
+        help="Add each fetched book to this full-text index (see 'dget index --help')",
+    )
+
+
+def _check_output_format(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.format == "epub" and args.compress not in (None, "none"):
+        parser.error("--compress does not apply to --format epub, which is already a zip container")
+
+
+def _fetch_settings(args: argparse.Namespace) -> dict[str, object]:
+    return {
+        "timeout_seconds": args.timeout,
+        "user_agent": args.user_agent,
+        "min_text_chars": args.min_text_chars,
+        "output_format": args.format,
+        "max_components": args.max_components,
+        "component_concurrency": args.component_concurrency,
+        "component_retries": args.component_retries,
+        "engine": args.engine,
+        "clean_in_browser": args.clean_in_browser,
+        "component_min_chars": args.component_min_chars,
+        "capture_network": args.capture_network,
+        "lean": args.lean,
+        "cache_dir": Path(args.cache_dir) if args.cache_dir else None,
+        "cache_ttl_hours": args.cache_ttl_hours,
+        "cache_max_mb": args.cache_max_mb,
+        "profile": args.profile,
+        "max_rps": args.max_rps,
+        "cpu_workers": args.cpu_workers,
+        "driver_cache": None
+        if args.no_driver_cache
+        else Path(args.driver_cache) if args.driver_cache else default_driver_cache_file(),
+    }
+
+
+def _output_settings(args: argparse.Namespace) -> dict[str, object]:
+    return {
+        "resume": args.resume,
+        "compression": args.compress,
+        "profile_trace": Path(args.profile_trace) if args.profile_trace else None,
+        "index": Path(args.index) if args.index else None,
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> FetchConfig:
+    parser = argparse.ArgumentParser(
+        prog="dget",
+        description="Fetch rendered HTML from a JavaScript-driven page.",
+        epilog="Run 'dget batch --help' to fetch many URLs with warm Chrome sessions, "
+        "'dget serve --help' to keep a warm pool behind a local API, "
+        "or 'dget index --help' to search fetched books.",
     )
+    parser.add_argument("url", help="Target URL to fetch")
+    parser.add_argument("-o", "--output", required=True, help="Output HTML file")
+    _add_fetch_arguments(parser)
+    _add_output_arguments(parser)
     args = parser.parse_args(argv)
+    _check_output_format(parser, args)
 
     return FetchConfig(
         url=args.url,
         output_file=Path(args.output),
-        timeout_seconds=args.timeout,
-        user_agent=args.user_agent,
-        min_text_chars=args.min_text_chars,
-        output_format=args.format,
+        **_fetch_settings(args),
+        **_output_settings(args),
+    )
+
+
+def parse_batch_args(argv: Optional[list[str]] = None) -> BatchConfig:
+    parser = argparse.ArgumentParser(
+        prog="dget batch",
+        description="Fetch many rendered pages, reusing warm Chrome sessions.",
+    )
+    parser.add_argument(
+        "input",
+        help="File with one URL per line, or '-' to read URLs from stdin",
+    )
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for output files")
+    _add_fetch_arguments(parser)
+    _add_output_arguments(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of Chrome drivers kept alive in the pool",
+    )
+    parser.add_argument(
+        "--restart-after",
+        type=int,
+        default=50,
+        help="Restart a Chrome driver after this many pages",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=None,
+        help="Books fetched at once from one host (default: --workers)",
+    )
+    parser.add_argument(
+        "--book-retries",
+        type=int,
+        default=1,
+        help="Retries per failed book, with jittered exponential backoff",
+    )
+    args = parser.parse_args(argv)
+    _check_output_format(parser, args)
+
+    return BatchConfig(
+        input_source=args.input,
+        output_dir=Path(args.output_dir),
+        workers=args.workers,
+        restart_after=args.restart_after,
+        per_host=args.per_host,
+        book_retries=args.book_retries,
+        **_fetch_settings(args),
+        **_output_settings(args),
+    )
+
+
+def parse_serve_args(argv: Optional[list[str]] = None) -> ServeConfig:
+    parser = argparse.ArgumentParser(
+        prog="dget serve",
+        description="Serve fetches from a warm Chrome pool over a local HTTP or Unix-socket API.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Listen on this Unix socket instead of TCP",
+    )
+    _add_fetch_arguments(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Number of Chrome drivers kept warm in the pool",
+    )
+    parser.add_argument(
+        "--restart-after",
+        type=int,
+        default=50,
+        help="Restart a Chrome driver after this many pages",
+    )
+    args = parser.parse_args(argv)
+    if args.format == "epub":
+        parser.error("serve streams html or text; --format epub is only available for files")
+
+    return ServeConfig(
+        host=args.host,
+        port=args.port,
+        socket_path=Path(args.socket) if args.socket else None,
+        workers=args.workers,
+        restart_after=args.restart_after,
+        **_fetch_settings(args),
+    )
+
+
+def parse_index_args(argv: Optional[list[str]] = None) -> IndexConfig:
+    parser = argparse.ArgumentParser(
+        prog="dget index",
+        description="Build and search a SQLite full-text index of fetched books, one entry per chapter.",
+    )
+    actions = parser.add_subparsers(dest="action", required=True)
+    add = actions.add_parser(
+        "add",
+        help="Index output files (.html, .txt, .epub, optionally compressed) or directories of them",
+    )
+    add.add_argument("paths", nargs="+", help="Output files or directories (searched recursively)")
+    search = actions.add_parser("search", help="Search the index, best matches first")
+    search.add_argument("query", help="Words to find, or an SQLite FTS5 query such as 'vonat NEAR(állomás)'")
+    search.add_argument("--limit", type=int, default=10, help="Maximum number of chapters to list")
+    search.add_argument("--json", action="store_true", help="Print one JSON object per match")
+    stats = actions.add_parser("stats", help="Print the number of indexed books, chapters and characters")
+    for subparser in (add, search, stats):
+        subparser.add_argument(
+            "--db",
+            default="dget-index.sqlite",
+            help="Index database file (default: dget-index.sqlite)",
+        )
+    args = parser.parse_args(argv)
+
+    return IndexConfig(
+        action=args.action,
+        db_path=Path(args.db),
+        paths=tuple(Path(path) for path in getattr(args, "paths", ())),
+        query=getattr(args, "query", ""),
+        limit=getattr(args, "limit", 10),
+        json_output=getattr(args, "json", False),
     )
 
 
@@ -502,26 +4365,381 @@ def configure_logging() -> None:
     )
 
 
-def run(config: FetchConfig) -> None:
-    fetcher = HtmlFetcher(
+def build_fetcher(config: FetchConfig | BatchConfig | ServeConfig) -> HtmlFetcher:
+    cache = None
+    if config.cache_dir is not None:
+        cache = ComponentCache(
+            config.cache_dir,
+            ttl_seconds=config.cache_ttl_hours * 3600,
+            max_bytes=config.cache_max_mb * 1024 * 1024,
+        )
+    return HtmlFetcher(
         timeout_seconds=config.timeout_seconds,
         user_agent=config.user_agent,
         min_text_chars=config.min_text_chars,
+        max_components=config.max_components,
+        component_concurrency=config.component_concurrency,
+        component_retries=config.component_retries,
+        engine=config.engine,
+        clean_in_browser=config.clean_in_browser,
+        component_min_chars=config.component_min_chars,
+        capture_network=config.capture_network,
+        lean=config.lean,
+        cache=cache,
+        rate_limiter=HostRateLimiter(config.max_rps) if config.max_rps > 0 else None,
+        cpu_workers=_cpu_workers(config),
+        driver_cache=ChromeResolver(config.driver_cache) if config.driver_cache is not None else None,
+        keep_formats=_snapshot_formats(config),
     )
-    saver = HtmlSaver()
+
+
+def _cpu_workers(config: FetchConfig | BatchConfig | ServeConfig) -> Optional[int]:
+    """Batch and serve default to one post-processing process per CPU; single fetches stay in-process."""
+    if config.cpu_workers is not None or isinstance(config, FetchConfig):
+        return config.cpu_workers
+    return os.cpu_count() or 1
+
+
+def _snapshot_formats(config: FetchConfig | BatchConfig | ServeConfig) -> tuple[str, ...]:
+    """The chunk formats the output needs: EPUB is built from HTML, and ``--index`` needs the text."""
+    if isinstance(config, ServeConfig):
+        return ("html", "text")
+    formats = ("text",) if config.output_format == "text" else ("html",)
+    return formats + ("text",) if config.index is not None and "text" not in formats else formats
+
+
+def run(config: FetchConfig) -> None:
+    fetcher = build_fetcher(config)
+    saver = HtmlSaver(config.compression, fetcher.postprocessor)
+
+    checkpoint = BookCheckpoint(config.output_file, config.url) if config.resume else None
+    profiling = config.profile is not None or config.profile_trace is not None
+    metrics = FetchMetrics(config.url) if profiling else None
 
     LOG.info("Fetching HTML from %s", config.url)
-    snapshot = fetcher.fetch(config.url)
-    content = snapshot.html if config.output_format == "html" else snapshot.text
+    try:
+        snapshot = fetcher.fetch(config.url, checkpoint=checkpoint, metrics=metrics)
 
-    LOG.info("Saving %s to %s", config.output_format.upper(), config.output_file)
-    saver.save(content, config.output_file)
+        LOG.info("Saving %s to %s", config.output_format.upper(), config.output_file)
+        with metrics.phase("save") if metrics is not None else nullcontext({}) as phase:
+            phase["bytes"] = saver.save_snapshot(snapshot, config.output_format, config.output_file, config.url)
+        if config.index is not None:
+            with metrics.phase("index") if metrics is not None else nullcontext({}) as phase:
+                with BookIndex(config.index) as index:
+                    phase["status"] = index.add_snapshot(config.url, snapshot, config.output_file)
+            LOG.info("Indexed %s in %s (%s)", config.url, config.index, phase["status"])
+        if checkpoint is not None:
+            checkpoint.finish()
+    except Exception as exc:
+        if metrics is not None:
+            metrics.finish(error=str(exc) or type(exc).__name__)
+        raise
+    else:
+        if metrics is not None:
+            metrics.finish()
+    finally:
+        fetcher.close()
+        if metrics is not None:
+            _write_profile(config, [metrics])
+    if fetcher.cache is not None:
+        LOG.info("Cache: %s", fetcher.cache.summary())
     LOG.info("Done")
 
 
+def _write_profile(config: FetchConfig | BatchConfig, metrics: list[FetchMetrics]) -> None:
+    if config.profile is not None:
+        for item in metrics:
+            write_metrics_line(config.profile, item)
+    if config.profile_trace is not None:
+        write_trace_file(config.profile_trace, metrics)
+        LOG.info("Wrote trace events to %s", config.profile_trace)
+
+
+def read_jobs(input_source: str) -> list[BookJob]:
+    """Read one URL per line, optionally followed by an integer priority (higher runs first)."""
+    if input_source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(input_source).read_text(encoding="utf-8").splitlines()
+    jobs: list[BookJob] = []
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        priority = int(fields[1]) if len(fields) > 1 and re.fullmatch(r"[+-]?\d+", fields[1]) else 0
+        jobs.append(BookJob(index=len(jobs), url=fields[0], priority=priority))
+    return jobs
+
+
+_FORMAT_SUFFIXES = {"html": ".html", "text": ".txt", "epub": ".epub"}
+
+
+def output_name_for(url: str, index: int, output_format: str, compression: Optional[str] = None) -> str:
+    segment = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+    slug = re.sub(r"[^\w.-]+", "_", segment).strip("._") or f"document-{index}"
+    suffix = _FORMAT_SUFFIXES[output_format]
+    compressed_suffixes = {name: extension for extension, name in _COMPRESSION_SUFFIXES.items()}
+    return f"{slug}{suffix}{compressed_suffixes.get(compression, '')}"
+
+
+def _save_batch_result(
+    result: BatchResult,
+    saver: HtmlSaver,
+    output_format: str,
+    output_file: Path,
+    index: Optional[BookIndex],
+) -> Optional[str]:
+    """Save (and index) one fetched book; return the error instead of raising so the batch goes on."""
+    assert result.snapshot is not None
+    try:
+        with result.metrics.phase("save") if result.metrics is not None else nullcontext({}) as phase:
+            phase["bytes"] = saver.save_snapshot(result.snapshot, output_format, output_file, result.url)
+        if index is not None:
+            with result.metrics.phase("index") if result.metrics is not None else nullcontext({}) as phase:
+                phase["status"] = index.add_snapshot(result.url, result.snapshot, output_file)
+    except Exception as exc:
+        LOG.error("Failed to save %s to %s: %s", result.url, output_file, exc)
+        error = str(exc) or type(exc).__name__
+        if result.metrics is not None:
+            result.metrics.set("error", error)
+        return error
+    return None
+
+
+def run_batch(config: BatchConfig) -> dict[str, object]:
+    jobs = read_jobs(config.input_source)
+    urls = [job.url for job in jobs]
+    fetcher = build_fetcher(config)
+    saver = HtmlSaver(config.compression, fetcher.postprocessor)
+
+    names: dict[int, str] = {}
+    seen: set[str] = set()
+    format_suffix = _FORMAT_SUFFIXES[config.output_format]
+    for index, url in enumerate(urls):
+        name = output_name_for(url, index, config.output_format, config.compression)
+        if name in seen:
+            stem, _, compressed_suffix = name.rpartition(format_suffix)
+            name = f"{stem}-{index}{format_suffix}{compressed_suffix}"
+        seen.add(name)
+        names[index] = name
+
+    checkpoints: dict[int, BookCheckpoint] = {}
+    if config.resume:
+        checkpoints = {
+            index: BookCheckpoint(config.output_dir / names[index], url) for index, url in enumerate(urls)
+        }
+
+    index = BookIndex(config.index) if config.index is not None else None
+    LOG.info("Fetching %d URL(s) with %d worker(s)", len(urls), config.workers)
+    started = time.monotonic()
+    results: list[dict[str, object]] = []
+    profiled: list[FetchMetrics] = []
+    scheduler = BookScheduler(
+        fetcher,
+        workers=config.workers,
+        restart_after=config.restart_after,
+        per_host=config.per_host,
+        retries=config.book_retries,
+        checkpoints=checkpoints,
+        profile=config.profile is not None or config.profile_trace is not None,
+    )
+    batch_results = scheduler.results(jobs)
+    try:
+        for result in batch_results:
+            entry: dict[str, object] = {
+                "index": result.index,
+                "url": result.url,
+                "seconds": round(result.elapsed_seconds, 3),
+            }
+            output_file = config.output_dir / names[result.index]
+            if result.snapshot is None:
+                error = result.error
+            else:
+                error = _save_batch_result(result, saver, config.output_format, output_file, index)
+            if result.snapshot is None or error is not None:
+                entry.update(status="failed", error=error)
+            else:
+                if result.index in checkpoints:
+                    checkpoints[result.index].finish()
+                entry.update(
+                    status="ok",
+                    output=str(output_file),
+                    context=result.snapshot.context,
+                    text_chars=result.snapshot.text_length,
+                )
+                LOG.info("Saved %s (%d/%d)", output_file, len(results) + 1, len(urls))
+            if result.metrics is not None:
+                result.metrics.finish()
+                profiled.append(result.metrics)
+                if config.profile is not None:
+                    write_metrics_line(config.profile, result.metrics)
+            results.append(entry)
+    finally:
+        batch_results.close()
+        fetcher.close()
+        if index is not None:
+            index.close()
+
+    elapsed = time.monotonic() - started
+    succeeded = sum(1 for entry in results if entry["status"] == "ok")
+    books_per_minute = succeeded / elapsed * 60 if elapsed > 0 else 0.0
+    summary: dict[str, object] = {
+        "books": len(urls),
+        "succeeded": succeeded,
+        "failed": len(urls) - succeeded,
+        "elapsed_seconds": round(elapsed, 3),
+        "books_per_minute": round(books_per_minute, 2),
+        "results": sorted(results, key=lambda entry: int(entry["index"])),
+    }
+    summary_file = config.output_dir / "summary.json"
+    HtmlSaver().save(json.dumps(summary, ensure_ascii=False, indent=2), summary_file)
+    LOG.info(
+        "Fetched %d/%d book(s) in %.1fs (%.2f books/min), summary in %s",
+        succeeded,
+        len(urls),
+        elapsed,
+        books_per_minute,
+        summary_file,
+    )
+    if config.profile_trace is not None:
+        write_trace_file(config.profile_trace, profiled)
+        LOG.info("Wrote trace events to %s", config.profile_trace)
+    if fetcher.cache is not None:
+        LOG.info("Cache: %s", fetcher.cache.summary())
+    return summary
+
+
+def _index_files(paths: Iterable[Path], indexed: set[str]) -> Iterator[tuple[Path, dict[str, object]]]:
+    """Yield output files under ``paths`` with their batch ``summary.json`` entry.
+
+    Files named explicitly are always yielded. Directory scans only pick up
+    files listed in a ``summary.json`` or already recorded in the index (by
+    ``--index``), so stray ``.txt`` and ``.html`` files such as URL lists are
+    left alone. Temporary files and ``.parts`` checkpoint directories are skipped.
+    """
+    metadata: dict[Path, dict[str, dict[str, object]]] = {}
+
+    def entry_for(path: Path) -> Optional[dict[str, object]]:
+        if path.parent not in metadata:
+            metadata[path.parent] = _batch_metadata(path.parent)
+        return metadata[path.parent].get(path.name)
+
+    for path in paths:
+        if not path.is_dir():
+            yield path, entry_for(path) or {}
+            continue
+        for candidate in sorted(path.rglob("*")):
+            hidden = any(part.startswith(".") or part.endswith(".parts") for part in candidate.relative_to(path).parts)
+            if hidden or not candidate.is_file() or output_format_of(candidate) is None:
+                continue
+            entry = entry_for(candidate)
+            if entry is not None or str(candidate.resolve()) in indexed:
+                yield candidate, entry or {}
+
+
+def _batch_metadata(directory: Path) -> dict[str, dict[str, object]]:
+    """Map output file names to their ``summary.json`` entries (URL, context) from a batch run."""
+    try:
+        summary = json.loads((directory / "summary.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {
+        Path(str(entry["output"])).name: entry
+        for entry in summary.get("results", [])
+        if entry.get("status") == "ok" and entry.get("output")
+    }
+
+
+def run_index(config: IndexConfig) -> int:
+    with BookIndex(config.db_path) as index:
+        if config.action == "search":
+            for hit in index.search(config.query, limit=config.limit):
+                if config.json_output:
+                    print(json.dumps(asdict(hit), ensure_ascii=False))
+                else:
+                    print(f"{hit.score:7.2f}  {hit.title}, chapter {hit.chapter}: {hit.chapter_title}")
+                    print(f"         {hit.url}")
+                    print(f"         {' '.join(hit.snippet.split())}")
+            return 0
+        if config.action == "stats":
+            print(json.dumps(index.stats()))
+            return 0
+
+        started = time.monotonic()
+        counts: dict[str, int] = {}
+        indexed_bytes = 0
+        for path, entry in _index_files(config.paths, index.sources()):
+            url, context = entry.get("url"), entry.get("context")
+            try:
+                status = index.add_file(path, url=str(url) if url else None, context=str(context) if context else None)
+            except Exception as exc:
+                LOG.warning("Failed to index %s: %s", path, exc)
+                status = "failed"
+            else:
+                if status != "unchanged":
+                    indexed_bytes += path.stat().st_size
+            counts[status] = counts.get(status, 0) + 1
+            LOG.debug("%s %s", status, path)
+        elapsed = time.monotonic() - started
+        LOG.info(
+            "Indexed %d file(s) in %.1fs (%.1f MiB/s): %s",
+            sum(counts.values()),
+            elapsed,
+            indexed_bytes / 2**20 / elapsed if elapsed > 0 else 0.0,
+            ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "nothing to do",
+        )
+        return 1 if counts.get("failed") else 0
+
+
+def serve(config: ServeConfig) -> None:
+    """Serve fetch jobs until interrupted or sent SIGTERM."""
+    fetcher = build_fetcher(config)
+    with fetcher.driver_pool(size=config.workers, max_pages_per_driver=config.restart_after) as pool:
+        if config.engine == "selenium":
+            LOG.info("Starting %d Chrome driver(s)", config.workers)
+            pool.warm()
+
+        server: _TcpServer | _UnixServer
+        if config.socket_path is not None:
+            config.socket_path.unlink(missing_ok=True)
+            server = _UnixServer(str(config.socket_path), _ServeHandler)
+            address = str(config.socket_path)
+        else:
+            server = _TcpServer((config.host, config.port), _ServeHandler)
+            address = f"http://{config.host}:{server.server_address[1]}"
+        server.service = FetchService(fetcher, pool, profile=config.profile)
+        server.default_format = config.output_format
+
+        def stop(_signum: int, _frame: object) -> None:
+            threading.Thread(target=server.shutdown, name="dget-shutdown").start()
+
+        previous = signal.signal(signal.SIGTERM, stop)
+        LOG.info("Serving on %s", address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            server.server_close()
+            fetcher.close()
+            if config.socket_path is not None:
+                config.socket_path.unlink(missing_ok=True)
+            LOG.info("Stopped serving on %s", address)
+
+
 def main(argv: Optional[list[str]] = None) -> int:
     configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
     try:
+        if argv[:1] == ["batch"]:
+            summary = run_batch(parse_batch_args(argv[1:]))
+            return 0 if summary["failed"] == 0 else 1
+        if argv[:1] == ["serve"]:
+            serve(parse_serve_args(argv[1:]))
+            return 0
+        if argv[:1] == ["index"]:
+            return run_index(parse_index_args(argv[1:]))
         config = parse_args(argv)
         run(config)
     except Exception as exc:  # pragma: no cover - CLI surface
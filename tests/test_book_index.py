@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import src.dget as dget
+from src.dget import BookIndex, IndexConfig, run_index
+
+
+URL = "https://reader.dia.hu/document/Konyv-1"
+
+
+def write_book(path: Path, *chapters: str) -> Path:
+    path.write_text("".join(f"<html><body><p>{chapter}</p></body></html>" for chapter in chapters), encoding="utf-8")
+    return path
+
+
+def test_two_files_for_the_same_url_share_one_book(tmp_path: Path) -> None:
+    first = write_book(tmp_path / "Konyv-1.html", "Első fejezet vasutas", "Második fejezet")
+    second = write_book(tmp_path / "Konyv-1.copy.html", "Első fejezet vasutas", "Második fejezet")
+    with BookIndex(tmp_path / "index.sqlite") as index:
+        assert index.add_file(first, url=URL) == "added"
+        assert index.add_file(second, url=URL) == "unchanged"
+        assert index.sources() == {str(first.resolve()), str(second.resolve())}
+        assert index.stats()["books"] == 1
+        assert [hit.url for hit in index.search("vasutas")] == [URL]
+
+
+def test_unchanged_file_is_skipped_without_reading(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = write_book(tmp_path / "Konyv-1.html", "Első fejezet")
+    with BookIndex(tmp_path / "index.sqlite") as index:
+        assert index.add_file(path, url=URL) == "added"
+
+        def unexpected_read(_path: Path) -> None:
+            raise AssertionError("unchanged file was read")
+
+        monkeypatch.setattr(dget, "output_chapters", unexpected_read)
+        assert index.add_file(path, url=URL) == "unchanged"
+
+
+def test_directory_scan_skips_files_missing_from_summary(tmp_path: Path) -> None:
+    books = tmp_path / "books"
+    books.mkdir()
+    listed = write_book(books / "Konyv-1.html", "Első fejezet vasutas")
+    write_book(books / "stray.html", "Nem könyv vasutas")
+    (books / "urls.txt").write_text(URL + "\n", encoding="utf-8")
+    (books / "Konyv-2.html.parts").mkdir()
+    write_book(books / "Konyv-2.html.parts" / "00000.html", "Félkész vasutas")
+    summary = {"results": [{"url": URL, "status": "ok", "output": str(listed), "context": "component-http"}]}
+    (books / "summary.json").write_text(json.dumps(summary), encoding="utf-8")
+
+    db = tmp_path / "index.sqlite"
+    assert run_index(IndexConfig(action="add", db_path=db, paths=(books,))) == 0
+    with BookIndex(db) as index:
+        assert index.sources() == {str(listed.resolve())}
+        assert [(hit.url, hit.chapter) for hit in index.search("vasutas")] == [(URL, 1)]
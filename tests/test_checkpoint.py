@@ -0,0 +1,90 @@
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from bench.fake_reader import BookShape, FakeReader
+from src.dget import BookCheckpoint, ComponentCache, DocumentSnapshot, HtmlFetcher
+
+
+SHAPE = BookShape(chapters=6, chapter_bytes=4096, runtime_delay_ms=0)
+
+
+def fetch(url: str, output: Path, cache: Optional[ComponentCache] = None) -> DocumentSnapshot:
+    fetcher = HtmlFetcher(engine="http", component_retries=0, cache=cache)
+    try:
+        return fetcher.fetch(url, checkpoint=BookCheckpoint(output, url))
+    finally:
+        fetcher.close()
+
+
+def manifest_path(output: Path) -> Path:
+    return output.with_name(f"{output.name}.parts") / "manifest.json"
+
+
+def test_interrupted_manifest_reuses_finished_components(tmp_path: Path) -> None:
+    output = tmp_path / "book.html"
+    with FakeReader(SHAPE) as reader:
+        url = reader.document_url()
+        first = fetch(url, output)
+        manifest = json.loads(manifest_path(output).read_text(encoding="utf-8"))
+        for path in list(manifest["components"])[:2]:
+            del manifest["components"][path]
+        manifest_path(output).write_text(json.dumps(manifest), encoding="utf-8")
+
+        before = reader.requests
+        resumed = fetch(url, output)
+        # The document page plus the two components the interrupted run never finished.
+        assert reader.requests - before == 3
+    assert list(resumed.text_chunks) == list(first.text_chunks)
+
+
+def test_damaged_part_file_is_fetched_again(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    output = tmp_path / "book.html"
+    with FakeReader(SHAPE) as reader:
+        url = reader.document_url()
+        first = fetch(url, output)
+        record = next(iter(json.loads(manifest_path(output).read_text(encoding="utf-8"))["components"].values()))
+        (manifest_path(output).parent / record["file"]).write_text("<p>truncated", encoding="utf-8")
+
+        before = reader.requests
+        with caplog.at_level(logging.WARNING, logger="dget"):
+            resumed = fetch(url, output)
+        assert reader.requests - before == 2
+    assert "is damaged, fetching it again" in caplog.text
+    assert list(resumed.text_chunks) == list(first.text_chunks)
+
+
+def test_complete_manifest_revalidates_with_conditional_requests(tmp_path: Path) -> None:
+    output = tmp_path / "book.html"
+    with FakeReader(SHAPE) as reader:
+        url = reader.document_url()
+        first = fetch(url, output)
+        BookCheckpoint(output, url).finish()
+
+        before = reader.statuses
+        again = fetch(url, output)
+        after = reader.statuses
+    assert after.get(304, 0) - before.get(304, 0) == SHAPE.chapters
+    # Only the document page is sent in full.
+    assert after[200] - before[200] == 1
+    assert list(again.text_chunks) == list(first.text_chunks)
+    assert json.loads(manifest_path(output).read_text(encoding="utf-8"))["complete"] is True
+
+
+def test_stale_cache_with_checkpoint_revalidates_instead_of_refetching(tmp_path: Path) -> None:
+    output = tmp_path / "book.html"
+    cache = ComponentCache(tmp_path / "cache", ttl_seconds=0)
+    with FakeReader(SHAPE) as reader:
+        url = reader.document_url()
+        first = fetch(url, output, cache)
+
+        before = reader.statuses
+        again = fetch(url, output, cache)
+        after = reader.statuses
+    assert after.get(304, 0) - before.get(304, 0) == SHAPE.chapters
+    assert after[200] - before[200] == 1
+    assert list(again.text_chunks) == list(first.text_chunks)
+    assert list(again.html_chunks) == list(first.html_chunks)
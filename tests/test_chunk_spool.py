@@ -0,0 +1,49 @@
+import threading
+
+from src.dget import ChunkSpool, ComponentPart, ComponentPostProcessor
+
+
+def test_returns_chunks_in_append_order() -> None:
+    with ChunkSpool() as spool:
+        chunks = ["első", "", "<p>második</p>" * 1000, "harmadik ő"]
+        positions = [spool.append(chunk) for chunk in chunks]
+        assert positions == [0, 1, 2, 3]
+        assert list(spool) == chunks
+        assert spool[2] == chunks[2]
+        assert spool.size(3) == len("harmadik ő".encode("utf-8"))
+        assert spool.nbytes == sum(len(chunk.encode("utf-8")) for chunk in chunks)
+
+
+def test_concurrent_appends_keep_every_chunk() -> None:
+    with ChunkSpool() as spool:
+        positions: dict[int, str] = {}
+
+        def append(worker: int) -> None:
+            for number in range(200):
+                text = f"{worker}:{number}:" + "x" * number
+                positions[spool.append(text)] = text
+
+        threads = [threading.Thread(target=append, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(spool) == 800
+        assert all(spool[position] == text for position, text in positions.items())
+
+
+def test_spilled_part_reads_html_and_text_back() -> None:
+    with ChunkSpool() as spool:
+        part = ComponentPart(index=0, path="c.html", html="<p>a</p>", cleaned=True, text="a").spilled(spool)
+        assert (part.html, part.text) == ("", None)
+        assert (part.content(), part.extracted_text(), part.has_text) == ("<p>a</p>", "a", True)
+        assert part.spilled(spool) is part
+
+
+def test_post_processing_reads_spilled_parts() -> None:
+    html = '<html><body><p>szöveg<span class="oldaltores">12</span> vége</p></body></html>'
+    with ChunkSpool() as spool:
+        parts = [ComponentPart(index=index, path=f"{index}.html", html=html).spilled(spool) for index in range(3)]
+        results = ComponentPostProcessor().process(parts)
+    assert results == ComponentPostProcessor().process([ComponentPart(index=0, path="0.html", html=html)]) * 3
+    assert results[0][1] == "szöveg vége"
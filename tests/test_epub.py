@@ -0,0 +1,58 @@
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from bench.fake_reader import BookShape, FakeReader
+from src.dget import HtmlFetcher, HtmlSaver, chapter_toc_from_html, chapter_xhtml
+
+
+def well_formed(body: str) -> ET.Element:
+    return ET.fromstring(f"<body>{body}</body>")
+
+
+def test_repeated_attribute_keeps_the_first_value() -> None:
+    body, _title = chapter_xhtml('<p class="a" class="b" id="x" ID="y">t</p>')
+    assert body == '<p class="a" id="x">t</p>'
+    well_formed(body)
+
+
+@pytest.mark.parametrize(
+    ("html", "expected"),
+    [
+        ("<html><head><title>T</title><meta charset=utf-8><h1>Cím</h1><p>szöveg</p>", "<h1>Cím</h1><p>szöveg</p>"),
+        ("<head><title>T</title><style>p{}</style><body><p>x</p>", "<p>x</p>"),
+        ("<head><title>T</title>szöveg<p>x</p>", "szöveg<p>x</p>"),
+    ],
+    ids=["heading", "body", "text"],
+)
+def test_head_without_end_tag_ends_at_body_content(html: str, expected: str) -> None:
+    body, _title = chapter_xhtml(html)
+    assert body == expected
+    well_formed(body)
+
+
+def test_toc_labels_skip_nested_lists() -> None:
+    html = """<div id="toc-view" style="display: none"><ul>
+        <li data-chapter="a.html"><span>Első  rész</span>
+            <ul><li data-chapter="b.html">Alfejezet</li></ul>
+        </li>
+        <li data-chapter="c.html"></li>
+    </ul></div>"""
+    assert chapter_toc_from_html(html) == (["a.html", "b.html", "c.html"], {"a.html": "Első rész", "b.html": "Alfejezet"})
+
+
+def test_navigation_uses_toc_labels(tmp_path: Path) -> None:
+    output = tmp_path / "book.epub"
+    with FakeReader(BookShape(chapters=3, chapter_bytes=4096, runtime_delay_ms=0)) as reader:
+        fetcher = HtmlFetcher(engine="http", keep_formats=("html",))
+        try:
+            snapshot = fetcher.fetch(reader.document_url())
+        finally:
+            fetcher.close()
+    HtmlSaver().save_snapshot(snapshot, "epub", output, reader.document_url())
+    with zipfile.ZipFile(output) as archive:
+        nav = ET.fromstring(archive.read("OEBPS/nav.xhtml"))
+    labels = [link.text for link in nav.iter("{http://www.w3.org/1999/xhtml}a")]
+    assert labels == ["Fejezet 1", "Fejezet 2", "Fejezet 3"]
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from bench.bench_extract import book_html, legacy_extract_text
+from src.dget import extract_text
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "extract"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", ["chapter.html", "fragment.html"])
+def test_matches_legacy_chain(name: str) -> None:
+    html = fixture(name)
+    assert extract_text(html) == legacy_extract_text(html)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_legacy_chain_on_generated_books(seed: int) -> None:
+    html = book_html(64 * 1024, seed=seed)
+    assert extract_text(html) == legacy_extract_text(html)
+
+
+# Deliberate differences from the legacy chain; the expected text is pinned in the .txt fixture.
+@pytest.mark.parametrize(
+    "name",
+    [
+        "entities.html",  # every entity is decoded, not only &nbsp;
+        "spaced_end_tag.html",  # </p > ends a line like </p>
+        "comments.html",  # comment content is dropped, even when it contains tags
+        "unclosed_body.html",  # text before <body> is dropped even without </body>
+    ],
+)
+def test_deliberate_differences(name: str) -> None:
+    html = fixture(name)
+    expected = fixture(name.replace(".html", ".txt")).rstrip("\n")
+    assert extract_text(html) == expected
+    assert legacy_extract_text(html) != expected
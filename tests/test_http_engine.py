@@ -0,0 +1,117 @@
+import logging
+
+import pytest
+
+from bench.fake_reader import BookShape, FakeReader, chapter_page, document_page
+from src.dget import HtmlFetcher, HttpComponentClient, chapter_toc_from_html, extract_text, strip_page_markers
+
+
+SLUG = "Fake_Konyv-1083"
+SHAPE = BookShape(chapters=6, chapter_bytes=4096, runtime_delay_ms=0)
+
+
+def chapter_text(index: int, shape: BookShape = SHAPE) -> str:
+    html = chapter_page(SLUG, f"chapter-{index:05d}", shape.chapter_bytes).decode("utf-8")
+    return extract_text(strip_page_markers(html))
+
+
+def http_fetcher(**options: object) -> HtmlFetcher:
+    options = {"engine": "http", "component_retries": 0, **options}
+    return HtmlFetcher(**options)  # type: ignore[arg-type]
+
+
+def test_toc_parsing_keeps_order_and_labels() -> None:
+    paths, labels = chapter_toc_from_html(document_page(SLUG, SHAPE))
+    assert paths == [f"rest/{SLUG}/szerzoseg.html"] + [f"rest/{SLUG}/chapter-{n:05d}.html" for n in range(1, 7)]
+    assert labels[f"rest/{SLUG}/chapter-00003.html"] == "Fejezet 3"
+
+
+def test_toc_parsing_falls_back_to_items_outside_toc_view() -> None:
+    html = '<ul><li data-chapter="rest/b/one.html">One</li><li data-chapter="rest/b/two.html">Two</li></ul>'
+    paths, labels = chapter_toc_from_html(html)
+    assert paths == ["rest/b/one.html", "rest/b/two.html"]
+    assert labels == {"rest/b/one.html": "One", "rest/b/two.html": "Two"}
+
+
+def test_components_keep_toc_order() -> None:
+    fetcher = http_fetcher(component_concurrency=4)
+    with FakeReader(SHAPE) as reader:
+        try:
+            snapshot = fetcher.fetch(reader.document_url(SLUG))
+        finally:
+            fetcher.close()
+    assert snapshot.context == "component-http"
+    assert list(snapshot.text_chunks) == [chapter_text(n) for n in range(1, 7)]
+    assert snapshot.titles == tuple(f"Fejezet {n}" for n in range(1, 7))
+
+
+def test_partial_component_failure_keeps_the_other_chapters(caplog: pytest.LogCaptureFixture) -> None:
+    shape = BookShape(chapters=6, chapter_bytes=4096, runtime_delay_ms=0, failing_chapters=(2, 5))
+    fetcher = http_fetcher()
+    with caplog.at_level(logging.WARNING, logger="dget"), FakeReader(shape) as reader:
+        try:
+            snapshot = fetcher.fetch(reader.document_url(SLUG))
+        finally:
+            fetcher.close()
+    assert list(snapshot.text_chunks) == [chapter_text(n, shape) for n in (1, 3, 4, 6)]
+    assert "Failed to fetch 2 of 6 chapter component(s)" in caplog.text
+
+
+def test_short_text_falls_back_to_selenium(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    def no_browser(self: HtmlFetcher) -> None:
+        raise RuntimeError("no browser here")
+
+    monkeypatch.setattr(HtmlFetcher, "_start_driver", no_browser)
+    fetcher = http_fetcher(min_text_chars=10**9, component_min_chars=0)
+    with caplog.at_level(logging.INFO, logger="dget"), FakeReader(SHAPE) as reader:
+        try:
+            with pytest.raises(RuntimeError, match="no browser here"):
+                fetcher.fetch(reader.document_url(SLUG))
+        finally:
+            fetcher.close()
+    assert "HTTP engine returned only" in caplog.text
+    assert "falling back to Selenium" in caplog.text
+
+
+def test_cookies_are_scoped_by_domain_and_path() -> None:
+    client = HttpComponentClient(retries=0)
+    with FakeReader(SHAPE) as reader:
+        try:
+            document_url, paths, _labels = client.fetch_document(reader.document_url(SLUG))
+            client.fetch_components(document_url, paths[1:3])
+        finally:
+            client.close()
+        cookies = reader.cookies
+    assert cookies[f"/document/{SLUG}"] is None
+    for name in ("chapter-00001", "chapter-00002"):
+        sent = cookies[f"/document/rest/{SLUG}/{name}.html"]
+        assert sent is not None
+        assert sorted(sent.split("; ")) == ["component_token=t1", f"reader_session={SLUG}"]
+
+
+def test_gzip_bodies_are_decoded() -> None:
+    client = HttpComponentClient(retries=0)
+    with FakeReader(SHAPE) as reader:
+        try:
+            response = client.get(f"{reader.base_url}/rest/{SLUG}/chapter-00001.html")
+        finally:
+            client.close()
+        sent = reader.bytes_sent
+    raw = chapter_page(SLUG, "chapter-00001", SHAPE.chapter_bytes)
+    assert response.body == raw.decode("utf-8")
+    assert sent < len(raw)
+
+
+def test_redirects_are_followed_and_components_resolve_against_the_final_url() -> None:
+    fetcher = http_fetcher()
+    client = HttpComponentClient(retries=0)
+    with FakeReader(SHAPE) as reader:
+        try:
+            document_url, paths, _labels = client.fetch_document(reader.redirect_url(SLUG))
+            snapshot = fetcher.fetch(reader.redirect_url(SLUG))
+        finally:
+            client.close()
+            fetcher.close()
+    assert document_url == reader.document_url(SLUG)
+    assert len(paths) == 7
+    assert list(snapshot.text_chunks) == [chapter_text(n) for n in range(1, 7)]
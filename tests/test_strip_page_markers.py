@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from src.dget import strip_page_markers
+
+
+@pytest.mark.parametrize(
+    ("html", "expected"),
+    [
+        ('<p>a<span class="oldaltores">46</span>b</p>', "<p>ab</p>"),
+        ("<p>a<span class='oldaltores'>46</span>b</p>", "<p>ab</p>"),
+        ("<p>a<span class=oldaltores>46</span>b</p>", "<p>ab</p>"),
+        ('<p>a<span CLASS="page oldaltores">46</span>b</p>', "<p>ab</p>"),
+        ('<p>a<div class="oldaltores"><span>4</span><b>6</b></div>b</p>', "<p>ab</p>"),
+    ],
+)
+def test_removes_page_number_elements(html: str, expected: str) -> None:
+    assert strip_page_markers(html) == expected
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        '<span title="class=oldaltores">keep</span>',
+        "<span title='x class=oldaltores'>keep</span>",
+        '<span data-class="oldaltores">keep</span>',
+        '<span class="oldaltoresek">keep</span>',
+        "<p>oldaltores</p>",
+    ],
+)
+def test_keeps_elements_that_only_mention_the_class(html: str) -> None:
+    assert strip_page_markers(html) == html
+
+
+def test_first_class_attribute_wins() -> None:
+    html = '<span class="text" class="oldaltores">keep</span>'
+    assert strip_page_markers(html) == html
+
+
+def test_unclosed_marker_ends_at_parent_closing_tag() -> None:
+    html = '<div><p>a<span class="oldaltores">46</div><p>b</p>'
+    assert strip_page_markers(html) == "<div><p>a</div><p>b</p>"
+
+
+def test_mismatched_closing_tag_inside_marker() -> None:
+    html = '<p>a<span class="oldaltores"><b>46</span> after</p><p>more</p>'
+    assert strip_page_markers(html) == "<p>a after</p><p>more</p>"
+
+
+def test_marker_without_any_closing_tag_drops_the_rest() -> None:
+    assert strip_page_markers('a<span class="oldaltores">46') == "a"
+
+
+def test_removes_self_closing_diapage_anchor() -> None:
+    assert strip_page_markers('<p>x<a name="DIAPage1"/>y</p>') == "<p>xy</p>"
+
+
+def test_removes_empty_diapage_anchor() -> None:
+    assert strip_page_markers('<p>x<a name="DIAPage1"></a>y</p>') == "<p>xy</p>"
+
+
+def test_keeps_content_of_diapage_anchor() -> None:
+    html = '<p><a name="DIAPage5">text <b>bold</b></a> <a href="#x">link</a></p>'
+    assert strip_page_markers(html) == '<p>text <b>bold</b> <a href="#x">link</a></p>'
+
+
+def test_keeps_anchor_that_only_mentions_diapage() -> None:
+    html = '<a href="#x" title="name=DIAPage1">link</a>'
+    assert strip_page_markers(html) == html
+
+
+def test_ignores_markers_in_comments_and_scripts() -> None:
+    html = '<!-- <span class="oldaltores">1</span> --><script>"<span class=oldaltores>"</script><p>x</p>'
+    assert strip_page_markers(html) == html
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<p>" + "".join(f'<span class="oldaltores">{n} szöveg ' for n in range(20000)) + "</p>",
+        "<section>"
+        + "".join(f'<div class="oldaltores">{n}<span>szöveg</span><i>{n}</i></p>' for n in range(20000))
+        + "</section>",
+        "<p>" + '<a name="DIAPage1">' * 20000 + "</p>",
+    ],
+    ids=["unclosed", "mismatched", "unclosed-anchors"],
+)
+def test_adversarial_markers_run_in_linear_time(html: str) -> None:
+    started = time.perf_counter()
+    strip_page_markers(html)
+    assert time.perf_counter() - started < 2.0